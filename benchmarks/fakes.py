@@ -0,0 +1,234 @@
+"""Offline stand-ins for the services behind src/clients, used by the benchmarks.
+
+install_fakes() points the config at a scratch directory, selects the local vector backend and installs
+deterministic OpenAI and mongomock clients in the client registry, so ingestion and /query run without
+network access. It must run before any src.service module is imported, because services read their
+settings into module constants at import time.
+"""
+import hashlib
+import re
+import threading
+import time
+import types
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+BENCHMARK_VERSION: str = 'kjv'
+BOOKS: List[str] = ['Genesis', 'Exodus', 'Leviticus', 'Numbers', 'Deuteronomy']
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    """A unit vector seeded by the text, so equal texts always embed identically."""
+    seed: int = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector: np.ndarray = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeRawResponse:
+    """Stands in for the SDK's raw response: headers (no rate-limit headers, so the configured budgets apply) and parse()."""
+
+    def __init__(self, parsed: Any):
+        self.headers: Dict[str, str] = {}
+        self._parsed = parsed
+
+    def parse(self) -> Any:
+        return self._parsed
+
+
+class FakeRawResponses:
+    """Stands in for a resource's with_raw_response accessor."""
+
+    def __init__(self, resource: Any):
+        self._resource = resource
+
+    def create(self, **kwargs: Any) -> FakeRawResponse:
+        return FakeRawResponse(self._resource.create(**kwargs))
+
+
+class FakeEmbeddings:
+    """Stands in for client.embeddings, returning objects shaped like CreateEmbeddingResponse."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.inputs = 0
+        self.with_raw_response = FakeRawResponses(self)
+        self._lock = threading.Lock()
+
+    def create(self, model: str, input: Any, dimensions: int, **kwargs: Any):
+        texts: List[str] = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.calls += 1
+            self.inputs += len(texts)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        tokens: int = sum(len(text.split()) for text in texts)
+        # Plain attribute objects: constructing openai models converts every float and would dominate the timings
+        return types.SimpleNamespace(
+            data=[
+                types.SimpleNamespace(embedding=fake_embedding(text, dimensions), index=index, object='embedding')
+                for index, text in enumerate(texts)
+            ],
+            model=model,
+            object='list',
+            usage=types.SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens)
+        )
+
+
+class FakeChatCompletions:
+    """Stands in for client.chat.completions with a short fixed answer, streamed word by word when asked."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.with_raw_response = FakeRawResponses(self)
+        self._lock = threading.Lock()
+
+    def create(self, model: str, messages: List[Dict], max_tokens: int, stream: bool = False, **kwargs: Any):
+        with self._lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        answer: str = f"In the passages provided, {messages[-1]['content'][-60:]}"
+        usage = types.SimpleNamespace(prompt_tokens=len(str(messages)) // 4, completion_tokens=len(answer) // 4)
+        if not stream:
+            message = types.SimpleNamespace(role='assistant', content=answer)
+            return types.SimpleNamespace(model=model, usage=usage, choices=[types.SimpleNamespace(index=0, finish_reason='stop', message=message)])
+
+        def iter_chunks() -> Iterator[types.SimpleNamespace]:
+            for word in answer.split(' '):
+                delta = types.SimpleNamespace(content=word + ' ')
+                yield types.SimpleNamespace(model=model, usage=None, choices=[types.SimpleNamespace(index=0, finish_reason=None, delta=delta)])
+            yield types.SimpleNamespace(model=model, usage=usage, choices=[])
+        return iter_chunks()
+
+
+class FakeOpenAI:
+    """The subset of the OpenAI client the app uses."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.embeddings = FakeEmbeddings(latency_seconds=latency_seconds)
+        self.chat = types.SimpleNamespace(completions=FakeChatCompletions(latency_seconds=latency_seconds))
+        self.models = types.SimpleNamespace(retrieve=lambda model: None)
+
+    def with_options(self, **kwargs: Any) -> "FakeOpenAI":
+        return self
+
+
+class FakeEncoding:
+    """Word and punctuation tokenizer used when the tiktoken encoding files cannot be downloaded."""
+
+    def encode(self, text: str, disallowed_special: Any = ()) -> List[int]:
+        return [hash(token) & 0xFFFFF for token in TOKEN_PATTERN.findall(text)]
+
+
+def patch_mongomock_bulk_sort():
+    """pymongo 4.11+ passes `sort` to replace/update bulk operations, which mongomock does not accept yet."""
+    import mongomock.collection
+
+    for name in ('add_replace', 'add_update'):
+        original = getattr(mongomock.collection.BulkOperationBuilder, name)
+
+        def without_sort(self, *args, _original=original, **kwargs):
+            kwargs.pop('sort', None)
+            return _original(self, *args, **kwargs)
+        setattr(mongomock.collection.BulkOperationBuilder, name, without_sort)
+
+
+def install_fakes(workdir: str, latency_seconds: float = 0.0, tokenizer: str = 'auto') -> Dict[str, Any]:
+    """Point the app at local stand-ins and return them along with the tokenizer actually used."""
+    try:
+        import mongomock
+    except ImportError as e:
+        raise RuntimeError("The offline benchmarks need mongomock: pip install mongomock") from e
+    from src import config
+
+    env_config = config.env_config
+    env_config.BIBLE_VERSION = BENCHMARK_VERSION
+    env_config.DB_NAME = 'bible_rag_benchmark'
+    env_config.OPEN_AI_API_KEY = 'offline'
+    env_config.OPEN_AI_MODEL = env_config.OPEN_AI_MODEL or 'gpt-4o-mini'
+    env_config.OPEN_AI_EMBEDDING_MODEL = env_config.OPEN_AI_EMBEDDING_MODEL or 'text-embedding-3-small'
+    env_config.VECTOR_BACKEND = 'local'
+    env_config.LOCAL_VECTOR_STORE_DIR = f"{workdir}/vectors"
+    env_config.LEXICAL_INDEX_DIR = f"{workdir}/lexical"
+    env_config.EMBEDDING_CACHE_DIR = f"{workdir}/embeddings"
+    env_config.EMBEDDING_CACHE_ENABLED = False
+    env_config.ANSWER_CACHE_ENABLED = False
+    env_config.LOG_LOCATION = f"{workdir}/logs"
+    env_config.WARMUP_CLIENTS = []
+
+    patch_mongomock_bulk_sort()
+    from src.clients.client_registry import registry
+
+    openai_client: FakeOpenAI = FakeOpenAI(latency_seconds=latency_seconds)
+    registry.set("openai", openai_client)
+    registry.set("mongo", mongomock.MongoClient())
+    return {"openai": openai_client, "tokenizer": install_tokenizer(tokenizer=tokenizer)}
+
+
+def install_tokenizer(tokenizer: str) -> str:
+    """Use tiktoken when its encoding loads ('auto' falls back to FakeEncoding offline) and report which was used."""
+    import src.service.token_service as token_service
+
+    if tokenizer in ('auto', 'tiktoken'):
+        try:
+            token_service.get_encoding(token_service.EMBEDDING_MODEL)
+            return 'tiktoken'
+        except Exception:
+            if tokenizer == 'tiktoken':
+                raise
+    token_service.tiktoken = types.SimpleNamespace(
+        encoding_for_model=lambda model: FakeEncoding(),
+        get_encoding=lambda name: FakeEncoding()
+    )
+    token_service.get_encoding.cache_clear()
+    return 'fake'
+
+
+def make_bible_pdf(pages: int, first_book_page: int, verses_per_page: int = 12, label: str = "") -> bytes:
+    """Build a PDF laid out like the KJV source: front matter, then pages of numbered verses under
+    chapter headings with a "<page> <book> <chapter>" footer. Four pages make a chapter, 40 chapters a book.
+    A label is written into every verse, so text can be traced back to the file it came from.
+    """
+    import pymupdf
+
+    document = pymupdf.open()
+    for page_index in range(first_book_page):
+        document.new_page().insert_text((72, 72), f"Front matter page {page_index + 1}")
+    for index in range(pages):
+        book: str = BOOKS[(index // 160) % len(BOOKS)]
+        chapter: int = (index // 4) % 40 + 1
+        lines: List[str] = [f"Chapter {chapter}"] if index % 4 == 0 else []
+        for offset in range(verses_per_page):
+            verse: int = (index % 4) * verses_per_page + offset + 1
+            lines.append(f"{verse} {label + ' ' if label else ''}And it came to pass that {book.lower()} spake of mercy, covenant and the law, verse {verse}.")
+        lines.append(f"{first_book_page + index + 1} {book} {chapter}")
+        document.new_page().insert_textbox(pymupdf.Rect(36, 36, 576, 800), "\n".join(lines), fontsize=8)
+    pdf_bytes: bytes = document.tobytes()
+    document.close()
+    return pdf_bytes
+
+
+def make_queries(count: int) -> List[Dict[str, Any]]:
+    """Distinct /query bodies, so each request embeds and retrieves instead of hitting a cache."""
+    topics: List[str] = ['mercy', 'covenant', 'the law', 'forgiveness', 'faith', 'the flood', 'the exodus', 'sacrifice']
+    return [
+        {
+            "version": BENCHMARK_VERSION,
+            "query": f"What do these books teach about {topics[index % len(topics)]}? ({index})",
+            "bible_references": [{"book": BOOKS[index % len(BOOKS)]}]
+        }
+        for index in range(count)
+    ]
+
+
+def count_calls(openai_client: FakeOpenAI) -> Dict[str, int]:
+    return {
+        "embedding_requests": openai_client.embeddings.calls,
+        "embedding_inputs": openai_client.embeddings.inputs,
+        "chat_requests": openai_client.chat.completions.calls
+    }
+
@@ -0,0 +1,338 @@
+"""Offline benchmark of the ingestion and query hot paths.
+
+Runs against the stand-ins in benchmarks/fakes.py (deterministic OpenAI fakes, mongomock, the local NumPy
+vector store and BM25 index), so no network service is needed. Times each stage on a synthetic Bible PDF
+(extraction, tagging, chunking, embedding batching, embedding, storage, retrieval, prompt assembly), then
+measures end-to-end POST /query throughput at increasing concurrency. Finally it runs the whole ingestion
+pipeline on several labelled PDFs, checking every page arrives once and is attributed to its own file,
+and writes the results as JSON.
+
+    python -m benchmarks.stage_benchmark --pages 400 --output benchmarks/results/stages.json
+    python -m benchmarks.stage_benchmark --compare benchmarks/results/stages.json --max-slowdown 1.3
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fakes import BENCHMARK_VERSION, count_calls, install_fakes, make_bible_pdf, make_queries
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_stage(function: Callable[[], Any], items: int, repeat: int) -> Dict[str, Any]:
+    """Run a stage `repeat` times and report the median and best wall time with its throughput."""
+    timings: List[float] = []
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    median_seconds: float = statistics.median(timings)
+    return {
+        "items": items,
+        "median_seconds": median_seconds,
+        "min_seconds": min(timings),
+        "items_per_second": items / median_seconds if median_seconds else None
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered: List[float] = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def tag_pages(page_texts: List[str], first_page_number: int) -> List:
+    """Tag extracted page texts the way document_service.iter_extracted_pages does, carrying context between pages."""
+    from src.models import RawDocument
+    from src.service.document_service import tag_raw_document_with_metadata
+
+    raw_pages: List[RawDocument] = []
+    prev_book, prev_chapter, prev_verse = "Genesis", 1, None
+    for offset, text in enumerate(page_texts):
+        raw_page: RawDocument = RawDocument(doc_id=first_page_number + offset, doc_data=text)
+        tag_raw_document_with_metadata(raw_bible_page=raw_page, prev_book=prev_book, prev_chapter=prev_chapter, prev_verse=prev_verse)
+        if raw_page.verse_segments:
+            last_segment = raw_page.verse_segments[-1]
+            prev_book, prev_chapter, prev_verse = last_segment.book, last_segment.chapter, last_segment.verse
+        else:
+            prev_book, prev_chapter = raw_page.metadata.get('book'), raw_page.metadata.get('chapter')
+        raw_pages.append(raw_page)
+    return raw_pages
+
+
+def benchmark_stages(pages: int, queries: int, repeat: int, workers: int) -> Dict[str, Dict]:
+    """Time every ingestion stage on a synthetic PDF, then retrieval and prompt assembly on the stored nodes."""
+    from src import config
+    from src.models import BibleReference, BibleRequest
+    from src.service.extraction_service import extract_page_texts
+    from src.service.indexing_service import chunk_all_documents, store_bible_nodes_in_lexical_index, persist_lexical_index
+    from src.service.postprocessing_service import chunk_ceiling_exceeding_nodes, identify_ceiling_exceeding_nodes
+    from src.service.embedding_service import (
+        attach_stored_embeddings, embed_bible_nodes, pack_embedding_batches, store_embedded_bible_nodes_in_vector_db
+    )
+    from src.service.document_service import upsert_bible_nodes_in_document_db, upsert_verse_index_in_document_db
+    from src.service.retrieval_service import (
+        build_chat_messages, get_query_embedding, retrieve_lexical_query_results, retrieve_top_k_query_results
+    )
+    from src.service.context_service import assemble_context
+
+    first_page: int = config.env_config.PDF_FIRST_BOOK_PAGE_INDEX
+    pdf_bytes: bytes = make_bible_pdf(pages=pages, first_book_page=first_page)
+    stages: Dict[str, Dict] = {}
+    state: Dict[str, Any] = {}
+
+    def extract():
+        state["texts"] = extract_page_texts(pdf_bytes=pdf_bytes, first_page=first_page, last_page=first_page + pages, workers=workers)
+    stages["extraction"] = time_stage(extract, items=pages, repeat=repeat)
+
+    def tag():
+        state["raw_pages"] = tag_pages(page_texts=state["texts"], first_page_number=first_page + 1)
+    stages["tagging"] = time_stage(tag, items=pages, repeat=repeat)
+
+    def chunk():
+        nodes = chunk_all_documents(raw_bible=state["raw_pages"], version=BENCHMARK_VERSION)
+        exceeding, within = identify_ceiling_exceeding_nodes(nodes=nodes, version=BENCHMARK_VERSION)
+        state["nodes"] = within + chunk_ceiling_exceeding_nodes(nodes=exceeding, version=BENCHMARK_VERSION)
+    stages["chunking"] = time_stage(chunk, items=pages, repeat=repeat)
+    nodes = state["nodes"]
+
+    stages["embedding_batching"] = time_stage(lambda: pack_embedding_batches(nodes=nodes), items=len(nodes), repeat=repeat)
+    stages["embedding"] = time_stage(lambda: embed_bible_nodes(processed_bible_nodes=nodes, version=BENCHMARK_VERSION), items=len(nodes), repeat=repeat)
+    stages["storage_documents"] = time_stage(
+        lambda: upsert_bible_nodes_in_document_db(processed_bible_nodes=nodes, version=BENCHMARK_VERSION), items=len(nodes), repeat=repeat
+    )
+    stages["storage_verse_index"] = time_stage(
+        lambda: upsert_verse_index_in_document_db(raw_pages=state["raw_pages"], version=BENCHMARK_VERSION), items=pages, repeat=repeat
+    )
+    stages["storage_vectors"] = time_stage(
+        lambda: store_embedded_bible_nodes_in_vector_db(processed_bible_nodes=nodes, version=BENCHMARK_VERSION), items=len(nodes), repeat=repeat
+    )
+
+    def index_lexically():
+        store_bible_nodes_in_lexical_index(processed_bible_nodes=nodes, version=BENCHMARK_VERSION)
+        persist_lexical_index(version=BENCHMARK_VERSION)
+    stages["storage_lexical"] = time_stage(index_lexically, items=len(nodes), repeat=repeat)
+
+    requests: List[BibleRequest] = [
+        BibleRequest(
+            version=body["version"], query=body["query"], session_id=None,
+            bible_references=[BibleReference(**reference) for reference in body["bible_references"]]
+        )
+        for body in make_queries(count=queries)
+    ]
+    embeddings: List[List[float]] = [get_query_embedding(query=bible_request.query) for bible_request in requests]
+
+    def retrieve_vector():
+        state["results"] = [
+            retrieve_top_k_query_results(bible_request=bible_request, query_embedding=embedding)
+            for bible_request, embedding in zip(requests, embeddings)
+        ]
+    stages["retrieval_vector"] = time_stage(retrieve_vector, items=queries, repeat=repeat)
+    stages["retrieval_lexical"] = time_stage(
+        lambda: [retrieve_lexical_query_results(bible_request=bible_request) for bible_request in requests], items=queries, repeat=repeat
+    )
+
+    prompts: Dict[str, Dict] = {"ROLE_PROMPT": {"value": "You are a Bible scholar."}, "SYSTEM_PROMPT": {"value": "Answer from the scripture given."}}
+
+    def assemble_prompts():
+        for bible_request, embedding, result in zip(requests, embeddings, state["results"]):
+            attach_stored_embeddings(nodes=list(result.nodes or []), version=BENCHMARK_VERSION)
+            context = assemble_context(query_result=result, query_embedding=embedding)
+            list(build_chat_messages(bible_request=bible_request, chunks=context.nodes, chat_history=[], prompts=prompts))
+    stages["prompt_assembly"] = time_stage(assemble_prompts, items=queries, repeat=repeat)
+    return stages
+
+
+def benchmark_query_throughput(queries: int, concurrency_levels: List[int]) -> List[Dict[str, Any]]:
+    """POST /query through the Flask app at each concurrency level and report throughput and latency percentiles."""
+    from src.main import create_app
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.WARNING)
+    bodies: List[Dict] = make_queries(count=queries * (len(concurrency_levels) + 1))
+    url: str = f"/{BENCHMARK_VERSION}/query"
+
+    def post(body: Dict) -> float:
+        started: float = time.perf_counter()
+        response = app.test_client().post(url, json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"/query returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return time.perf_counter() - started
+
+    # One untimed pass loads the query-path modules and fills the per-chapter and prompt caches
+    for body in bodies[:min(queries, 8)]:
+        post(body)
+
+    results: List[Dict[str, Any]] = []
+    for level, concurrency in enumerate(concurrency_levels, start=1):
+        level_bodies: List[Dict] = bodies[level * queries:(level + 1) * queries]
+        latencies: List[float] = []
+        errors: int = 0
+        started: float = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(post, body) for body in level_bodies]:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    errors += 1
+                    logging.getLogger(__name__).warning(str(e))
+        elapsed: float = time.perf_counter() - started
+        results.append({
+            "concurrency": concurrency,
+            "requests": len(level_bodies),
+            "errors": errors,
+            "seconds": elapsed,
+            "requests_per_second": len(latencies) / elapsed if elapsed else None,
+            "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+            "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None
+        })
+    return results
+
+
+def benchmark_ingestion_pipeline(pages: int, files: int) -> Dict[str, Any]:
+    """Time run_ingestion_pipeline over `files` labelled PDFs uploaded together, then check that every page was
+    extracted exactly once and that extracted pages and stored nodes carry the source_file whose label is in their text.
+    """
+    import io
+    from werkzeug.datastructures import FileStorage
+    from src import config
+    from src.models import BibleRequest, RawDocument
+    from src.clients.mongo_client import get_bible_rag_db
+    from src.service.ingestion_service import run_ingestion_pipeline
+
+    # A version of its own, so the nodes used by the retrieval and /query benchmarks are left alone
+    version: str = f"{BENCHMARK_VERSION}-ingest"
+    first_page: int = config.env_config.PDF_FIRST_BOOK_PAGE_INDEX
+    pages_per_file: int = max(pages // files, 1)
+    labels: Dict[str, str] = {f"part{index + 1}.pdf": f"scroll{index + 1}" for index in range(files)}
+    pdfs: Dict[str, bytes] = {
+        filename: make_bible_pdf(pages=pages_per_file, first_book_page=first_page, label=label) for filename, label in labels.items()
+    }
+    bible_request: BibleRequest = BibleRequest(
+        version=version, query=None, session_id=None, bible_references=None, qna=False, retrieval_mode=None,
+        files=[FileStorage(stream=io.BytesIO(pdf_bytes), filename=filename) for filename, pdf_bytes in pdfs.items()]
+    )
+
+    extracted_pages: List[RawDocument] = []
+
+    def observe(stage_name: str, item: Any, seconds: float):
+        if stage_name == "extract":
+            extracted_pages.extend(item)
+
+    timing: Dict[str, Any] = time_stage(
+        lambda: run_ingestion_pipeline(bible_request=bible_request, observer=observe), items=pages_per_file * files, repeat=1
+    )
+
+    errors: List[str] = []
+    for filename, label in labels.items():
+        file_pages: List[RawDocument] = [page for page in extracted_pages if page.metadata.get("source_file") == filename]
+        if sorted(page.doc_id for page in file_pages) != list(range(first_page + 1, first_page + pages_per_file + 1)):
+            errors.append(f"{filename}: extracted {len(file_pages)} pages, expected pages {first_page + 1}-{first_page + pages_per_file} once each")
+        misattributed: List[int] = [page.doc_id for page in file_pages if label not in page.doc_data]
+        if misattributed:
+            errors.append(f"{filename}: pages {misattributed[:10]} hold another file's text")
+    if len(extracted_pages) != pages_per_file * files:
+        errors.append(f"extracted {len(extracted_pages)} pages in total, expected {pages_per_file * files}")
+
+    stored_nodes: List[Dict] = list(get_bible_rag_db()[version].find({}, {"_id": 0, "node_id": 1, "text": 1, "metadata": 1}))
+    misattributed_nodes: List[str] = [
+        node["node_id"] for node in stored_nodes
+        if node["metadata"].get("source_file") not in labels or labels[node["metadata"]["source_file"]] not in node["text"]
+    ]
+    if misattributed_nodes:
+        errors.append(f"{len(misattributed_nodes)} stored nodes are attributed to the wrong file, e.g. {misattributed_nodes[:5]}")
+    if errors:
+        raise RuntimeError("Ingestion pipeline benchmark failed its checks: " + "; ".join(errors))
+    return {**timing, "files": files, "nodes": len(stored_nodes)}
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(results: Dict, baseline: Dict, max_slowdown: Optional[float]) -> List[str]:
+    """Print each stage's and concurrency level's change against a baseline; return the regressions beyond max_slowdown."""
+    regressions: List[str] = []
+    for stage, result in results["stages"].items():
+        previous: Optional[Dict] = baseline.get("stages", {}).get(stage)
+        if not previous or not previous["median_seconds"]:
+            continue
+        ratio: float = result["median_seconds"] / previous["median_seconds"]
+        print(f"{stage:24s} {previous['median_seconds'] * 1000:10.2f}ms -> {result['median_seconds'] * 1000:10.2f}ms  x{ratio:.2f}", file=sys.stderr)
+        if max_slowdown and ratio > max_slowdown:
+            regressions.append(f"{stage} is {ratio:.2f}x slower")
+    previous_levels: Dict[int, Dict] = {level["concurrency"]: level for level in baseline.get("query_throughput", [])}
+    for level in results["query_throughput"]:
+        previous = previous_levels.get(level["concurrency"])
+        if not previous or not previous["requests_per_second"] or not level["requests_per_second"]:
+            continue
+        ratio = previous["requests_per_second"] / level["requests_per_second"]
+        print(f"query x{level['concurrency']:<16d} {previous['requests_per_second']:10.1f}/s -> {level['requests_per_second']:10.1f}/s  x{ratio:.2f}", file=sys.stderr)
+        if max_slowdown and ratio > max_slowdown:
+            regressions.append(f"/query at concurrency {level['concurrency']} is {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=400, help="Bible pages in the synthetic PDF")
+    parser.add_argument('--queries', type=int, default=200, help="queries per retrieval stage and per concurrency level")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage; the median is reported")
+    parser.add_argument('--extraction-workers', type=int, default=1)
+    parser.add_argument('--ingest-files', type=int, default=3, help="PDFs the --pages are split across for the ingestion pipeline run")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="simulated latency of each fake OpenAI call")
+    parser.add_argument('--tokenizer', choices=('auto', 'tiktoken', 'fake'), default='auto')
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="print the change against a previous results file")
+    parser.add_argument('--max-slowdown', type=float, help="with --compare, fail when a stage or throughput level is this many times slower")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix='bible-rag-benchmark-') as workdir:
+        fakes: Dict[str, Any] = install_fakes(workdir=workdir, latency_seconds=args.latency_ms / 1000, tokenizer=args.tokenizer)
+        stages: Dict[str, Dict] = benchmark_stages(pages=args.pages, queries=args.queries, repeat=args.repeat, workers=args.extraction_workers)
+        throughput: List[Dict] = benchmark_query_throughput(queries=args.queries, concurrency_levels=args.concurrency)
+        stages["ingestion_pipeline"] = benchmark_ingestion_pipeline(pages=args.pages, files=args.ingest_files)
+
+    results: Dict[str, Any] = {
+        "commit": get_git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "settings": {**vars(args), "tokenizer": fakes["tokenizer"]},
+        "stages": stages,
+        "query_throughput": throughput,
+        "fake_calls": count_calls(fakes["openai"])
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as baseline_file:
+            regressions = compare_results(results=results, baseline=json.load(baseline_file), max_slowdown=args.max_slowdown)
+    for regression in regressions:
+        print(f"FAIL {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
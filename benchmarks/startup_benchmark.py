@@ -0,0 +1,169 @@
+"""Cold-start benchmark for the Flask app.
+
+Starts a fresh interpreter per run and role with `python -X importtime`, builds the app with create_app and
+serves one request to the health route. Reports process wall time, time to create the app, time to the first
+response, total import time and the slowest top-level imports, and fails when a role imports modules it must
+not load at startup or when a run regresses against a saved baseline.
+
+    python benchmarks/startup_benchmark.py --runs 5 --output benchmarks/results/startup.json
+    python benchmarks/startup_benchmark.py --baseline benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROLES: Tuple[str, ...] = ('all', 'query', 'ingest')
+
+# Heavy dependencies every role must defer until a request needs them
+STARTUP_FORBIDDEN_MODULES: Tuple[str, ...] = ('llama_index.core', 'openai', 'pymupdf', 'opensearchpy', 'tiktoken')
+# Modules that belong to the other role and must not load at startup
+ROLE_FORBIDDEN_MODULES: Dict[str, Tuple[str, ...]] = {
+    'all': (),
+    'query': ('src.routes.ingestion_routes', 'src.service.job_service', 'src.service.ingestion_service', 'src.service.document_service'),
+    'ingest': ('src.routes.rag_routes', 'src.service.retrieval_service', 'src.service.context_service')
+}
+
+CHILD_SCRIPT: str = '''
+import json, sys, time
+started = time.perf_counter()
+from flask import url_for
+from src.main import create_app
+app = create_app()
+created = time.perf_counter()
+with app.test_request_context():
+    health_url = url_for('health.get_health')
+response = app.test_client().get(health_url)
+first_response = time.perf_counter()
+print(json.dumps({
+    "create_app_seconds": created - started,
+    "first_request_seconds": first_response - started,
+    "status_code": response.status_code,
+    "modules": sorted(sys.modules)
+}))
+'''
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse `-X importtime` lines into {module, self_us, cumulative_us, depth} records."""
+    imports: List[Dict] = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2
+        })
+    return imports
+
+
+def run_once(role: str) -> Dict:
+    """Start a fresh interpreter for one role and measure its startup."""
+    env: Dict[str, str] = dict(os.environ, APP_ROLE=role, PYTHONDONTWRITEBYTECODE='1')
+    started: float = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    wall_seconds: float = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup of role '{role}' failed:\n{completed.stderr[-2000:]}")
+
+    child: Dict = json.loads(completed.stdout.strip().splitlines()[-1])
+    imports: List[Dict] = parse_importtime(completed.stderr)
+    return {
+        "wall_seconds": wall_seconds,
+        "create_app_seconds": child["create_app_seconds"],
+        "first_request_seconds": child["first_request_seconds"],
+        "status_code": child["status_code"],
+        "import_seconds": sum(record["self_us"] for record in imports) / 1e6,
+        "imports": imports,
+        "modules": child["modules"]
+    }
+
+
+def benchmark_role(role: str, runs: int, top: int) -> Dict:
+    """Run a role several times and summarise the medians, the slowest imports and forbidden modules."""
+    samples: List[Dict] = [run_once(role=role) for _ in range(runs)]
+    slowest: Dict[str, int] = {}
+    for record in samples[-1]["imports"]:
+        if record["depth"] == 0:
+            slowest[record["module"]] = record["cumulative_us"]
+    loaded: set = set(samples[-1]["modules"])
+    forbidden: List[str] = [
+        module for module in STARTUP_FORBIDDEN_MODULES + ROLE_FORBIDDEN_MODULES[role] if module in loaded
+    ]
+    return {
+        "runs": runs,
+        "status_code": samples[-1]["status_code"],
+        "wall_seconds": statistics.median(sample["wall_seconds"] for sample in samples),
+        "create_app_seconds": statistics.median(sample["create_app_seconds"] for sample in samples),
+        "first_request_seconds": statistics.median(sample["first_request_seconds"] for sample in samples),
+        "import_seconds": statistics.median(sample["import_seconds"] for sample in samples),
+        "module_count": len(loaded),
+        "slowest_imports_ms": {
+            module: round(cumulative_us / 1000, 2)
+            for module, cumulative_us in sorted(slowest.items(), key=lambda item: -item[1])[:top]
+        },
+        "forbidden_modules": forbidden
+    }
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, slack_seconds: float) -> List[str]:
+    """Compare timings with a baseline, allowing a relative tolerance plus a fixed slack for timer noise."""
+    regressions: List[str] = []
+    for role, result in results.items():
+        if role not in baseline:
+            continue
+        for metric in ("first_request_seconds", "import_seconds"):
+            limit: float = baseline[role][metric] * tolerance + slack_seconds
+            if result[metric] > limit:
+                regressions.append(f"{role}.{metric}: {result[metric]:.3f}s exceeds {limit:.3f}s (baseline {baseline[role][metric]:.3f}s)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--roles', nargs='+', choices=ROLES, default=list(ROLES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="slowest top-level imports to report per role")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="fail when timings regress against this results file")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--slack-seconds', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict] = {role: benchmark_role(role=role, runs=args.runs, top=args.top) for role in args.roles}
+    report: Dict = {"python": sys.version.split()[0], "roles": results}
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    failures: List[str] = [
+        f"{role}: imported {', '.join(result['forbidden_modules'])} at startup"
+        for role, result in results.items() if result["forbidden_modules"]
+    ]
+    failures += [f"{role}: health check returned {result['status_code']}" for role, result in results.items() if result["status_code"] != 200]
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline: Dict[str, Dict] = json.load(baseline_file)["roles"]
+        failures += find_regressions(results=results, baseline=baseline, tolerance=args.tolerance, slack_seconds=args.slack_seconds)
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
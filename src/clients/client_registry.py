@@ -0,0 +1,86 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+LOG = logging.getLogger(__name__)
+
+# Module that registers each client, imported on first use so warmup works before any route has loaded it
+CLIENT_MODULES: Dict[str, str] = {
+    "openai": "src.clients.llm_client",
+    "mongo": "src.clients.mongo_client",
+    "opensearch": "src.clients.vector_client",
+    "opensearch_vector": "src.clients.vector_client",
+    "local_vector_store": "src.clients.vector_client",
+    "lexical_index": "src.clients.vector_client"
+}
+
+
+class ClientRegistry:
+    """Builds shared clients on first use and hands every caller the same instance.
+
+    Client modules register a factory (and optionally a warmup probe) at import time, so importing
+    a module never opens a connection. warmup() builds the named clients and runs their probes, so
+    the connection pool and TLS session are ready before the first request arrives.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Callable[[Any], Any]] = {}
+        self._clients: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            if warmup is not None:
+                self._warmups[name] = warmup
+
+    def get(self, name: str) -> Any:
+        client: Any = self._clients.get(name)
+        if client is not None:
+            return client
+        if name not in self._factories and name in CLIENT_MODULES:
+            importlib.import_module(CLIENT_MODULES[name])
+        if name not in self._factories:
+            raise KeyError(f"No client registered as '{name}'")
+        # One lock per client, so a slow connection does not hold up unrelated clients
+        with self._locks[name]:
+            client = self._clients.get(name)
+            if client is None:
+                LOG.info(f"Building client '{name}'")
+                client = self._clients[name] = self._factories[name]()
+        return client
+
+    def set(self, name: str, client: Any):
+        """Install a prebuilt client, e.g. a fake in benchmarks."""
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._clients[name] = client
+
+    def reset(self, name: str):
+        """Forget a built client so the next get() builds a fresh one."""
+        with self._lock:
+            self._clients.pop(name, None)
+
+    def warmup(self, names: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Build and probe the named clients, returning seconds taken per client (None when it failed)."""
+        timings: Dict[str, Optional[float]] = {}
+        for name in names:
+            started: float = time.perf_counter()
+            try:
+                client: Any = self.get(name)
+                if name in self._warmups:
+                    self._warmups[name](client)
+                timings[name] = time.perf_counter() - started
+                LOG.info(f"Warmed up client '{name}' in {timings[name]:.3f}s")
+            except Exception as e:
+                timings[name] = None
+                LOG.warning(f"Warmup of client '{name}' failed: {str(e)}")
+        return timings
+
+
+registry: ClientRegistry = ClientRegistry()
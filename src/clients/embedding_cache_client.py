@@ -0,0 +1,311 @@
+import atexit
+import logging
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from src import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so run single-process there
+    fcntl = None
+
+LOG = logging.getLogger(__name__)
+
+CACHE_ENABLED: bool = config.env_config.EMBEDDING_CACHE_ENABLED
+CACHE_DIR: str = config.env_config.EMBEDDING_CACHE_DIR
+CACHE_MAX_ENTRIES: int = config.env_config.EMBEDDING_CACHE_MAX_ENTRIES
+CACHE_FLUSH_SECONDS: float = config.env_config.EMBEDDING_CACHE_FLUSH_SECONDS
+CACHE_REFRESH_SECONDS: float = config.env_config.EMBEDDING_CACHE_REFRESH_SECONDS
+APP_ROLE: str = config.env_config.APP_ROLE
+EMBEDDING_MODEL: str = config.env_config.OPEN_AI_EMBEDDING_MODEL
+EMBEDDING_DIMENSIONS: int = config.env_config.OPEN_AI_EMBEDDING_DIMENSIONS
+INITIAL_CAPACITY: int = 1024
+KEY_BYTES: int = hashlib.sha256().digest_size
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk embedding cache.
+
+    Vectors are rows of a float32 memory-mapped file. An append-only index log maps each
+    key to its row; it is replayed on load and compacted when it grows stale.
+    Entries are evicted least recently used first once max_entries is reached.
+
+    Only one process writes: the first to take the writer lock file. Every other process opens
+    the cache read-only, replays the writer's index log when it changes, and checks each row's
+    key digest before and after copying the vector, so a row the writer has reused reads as a miss.
+    """
+
+    def __init__(self, directory: str, model: str, dimensions: int, max_entries: int, writable: bool = True):
+        self.model = model
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()  # key -> row, least recently used first
+        self._free_slots: List[int] = []
+        self._capacity: int = 0
+        self._log_lines: int = 0
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None  # sha256 digest of the key owning each row
+        self._index_file = None
+        self._index_stat: Optional[Tuple[int, int]] = None
+        self._checked_at: float = 0.0
+        self._dirty: bool = False
+
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path: str = os.path.join(directory, f"vectors-{dimensions}.f32")
+        self._keys_path: str = os.path.join(directory, f"keys-{dimensions}.bin")
+        self._index_path: str = os.path.join(directory, f"index-{dimensions}.log")
+        self._writer_lock_file = self._acquire_writer_lock(os.path.join(directory, f"writer-{dimensions}.lock")) if writable else None
+        self.read_only: bool = self._writer_lock_file is None
+        self._load()
+        if not self.read_only:
+            self._index_file = open(self._index_path, "a", encoding="utf-8")
+
+    def make_key(self, text: str) -> str:
+        """Hash normalized text together with the embedding model and dimensions."""
+        normalized_text: str = unicodedata.normalize("NFC", " ".join(text.split()))
+        payload: str = f"{self.model}\0{self.dimensions}\0{normalized_text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return a copy of the cached vector for each key, or None on a miss."""
+        with self._lock:
+            if self.read_only:
+                self._refresh()
+            results: List[Optional[np.ndarray]] = []
+            for key in keys:
+                slot: Optional[int] = self._slots.get(key)
+                if slot is None:
+                    results.append(None)
+                    continue
+                if self.read_only:
+                    results.append(self._read_verified(key=key, slot=slot))
+                    continue
+                self._slots.move_to_end(key)
+                results.append(np.array(self._vectors[slot]))
+            return results
+
+    def put(self, key: str, embedding: Sequence[float]):
+        self.put_many({key: embedding})
+
+    def put_many(self, embeddings: Dict[str, Sequence[float]]):
+        """Store vectors by key, evicting the least recently used entries when full. A no-op when read-only."""
+        if self.read_only:
+            return
+        with self._lock:
+            for key, embedding in embeddings.items():
+                slot: Optional[int] = self._slots.get(key)
+                if slot is None:
+                    slot = self._claim_slot()
+                # Clear the row's owner first so readers never pair this key with a half-written vector
+                self._keys[slot] = 0
+                self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+                self._keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self._index_file.write(f"{key} {slot}\n")
+                self._log_lines += 1
+            self._dirty = True
+            if self._log_lines > 2 * len(self._slots) + INITIAL_CAPACITY:
+                self._compact_index()
+
+    def flush(self):
+        """Persist vectors before the index so the log never points at unwritten rows."""
+        if self.read_only:
+            return
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._keys.flush()
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+            self._dirty = False
+
+    def flush_if_dirty(self):
+        if self._dirty:
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @staticmethod
+    def _acquire_writer_lock(lock_path: str):
+        """Hold an exclusive lock on lock_path for the life of the process, or return None if another process has it."""
+        lock_file = open(lock_path, "a+")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            LOG.info(f"Embedding cache at {lock_path} is written by another process; opening it read-only")
+            return None
+        return lock_file
+
+    def _read_verified(self, key: str, slot: int) -> Optional[np.ndarray]:
+        """Copy a row only if it belongs to key both before and after the copy; otherwise drop the stale mapping."""
+        digest: bytes = bytes.fromhex(key)
+        if slot < self._capacity and self._keys[slot].tobytes() == digest:
+            vector: np.ndarray = np.array(self._vectors[slot])
+            if self._keys[slot].tobytes() == digest:
+                return vector
+        self._slots.pop(key, None)
+        return None
+
+    def _refresh(self):
+        """Replay the index log again if the writer has appended to, compacted or created it since it was loaded."""
+        now: float = time.monotonic()
+        if now - self._checked_at < CACHE_REFRESH_SECONDS:
+            return
+        self._checked_at = now
+        if self._stat_index() == self._index_stat:
+            return
+        self._slots.clear()
+        self._log_lines = 0
+        self._load()
+
+    def _stat_index(self) -> Optional[Tuple[int, int]]:
+        try:
+            index_stat: os.stat_result = os.stat(self._index_path)
+        except FileNotFoundError:
+            return None
+        return index_stat.st_ino, index_stat.st_size
+
+    def _claim_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._capacity < self.max_entries:
+            self._grow(min(max(self._capacity * 2, INITIAL_CAPACITY), self.max_entries))
+            return self._free_slots.pop()
+        evicted_key, slot = self._slots.popitem(last=False)
+        LOG.debug(f"Evicting embedding cache entry {evicted_key}")
+        return slot
+
+    def _grow(self, new_capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._keys.flush()
+            self._vectors = None
+            self._keys = None
+        self._map_files(capacity=new_capacity)
+        self._free_slots.extend(reversed(range(self._capacity, new_capacity)))
+        self._capacity = new_capacity
+
+    def _map_files(self, capacity: int):
+        """Map the vector and key rows, sizing both files to capacity first when writing."""
+        mode: str = "r" if self.read_only else "r+"
+        if not self.read_only:
+            for path, row_bytes in ((self._vectors_path, self.dimensions * np.dtype(np.float32).itemsize), (self._keys_path, KEY_BYTES)):
+                with open(path, "ab") as rows_file:
+                    rows_file.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dimensions))
+        self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES))
+
+    def _load(self):
+        """Map the vectors file and replay the index log."""
+        self._index_stat = self._stat_index()
+        row_bytes: int = self.dimensions * np.dtype(np.float32).itemsize
+        self._capacity = 0
+        self._vectors = None
+        self._keys = None
+        if os.path.exists(self._vectors_path):
+            self._capacity = min(os.path.getsize(self._vectors_path) // row_bytes, self.max_entries)
+        if self.read_only:
+            # Rows without a key file (or not yet covered by it) cannot be verified
+            key_rows: int = os.path.getsize(self._keys_path) // KEY_BYTES if os.path.exists(self._keys_path) else 0
+            self._capacity = min(self._capacity, key_rows)
+        if self._capacity:
+            self._map_files(capacity=self._capacity)
+
+        slot_owners: Dict[int, str] = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as index_file:
+                for line in index_file:
+                    self._log_lines += 1
+                    parts: List[str] = line.split()
+                    if len(parts) != 2 or len(parts[0]) != 2 * KEY_BYTES or not parts[1].isdigit() or int(parts[1]) >= self._capacity:
+                        continue  # torn write or a row beyond the mapped file
+                    key, slot = parts[0], int(parts[1])
+                    previous_owner: Optional[str] = slot_owners.get(slot)
+                    if previous_owner is not None and previous_owner != key:
+                        self._slots.pop(previous_owner, None)
+                    previous_slot: Optional[int] = self._slots.pop(key, None)
+                    if previous_slot is not None and previous_slot != slot:
+                        slot_owners.pop(previous_slot, None)
+                    self._slots[key] = slot
+                    slot_owners[slot] = key
+
+        if self.read_only:
+            LOG.debug(f"Loaded {len(self._slots)} embedding cache entries read-only from {self._index_path}")
+            return
+        self._free_slots = [slot for slot in reversed(range(self._capacity)) if slot not in slot_owners]
+        for key, slot in self._slots.items():
+            # Caches written before rows carried their key get them filled in here
+            self._keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+        if self._slots:
+            self._compact_index()
+        LOG.info(f"Loaded embedding cache with {len(self._slots)} entries from {self._index_path}")
+
+    def _compact_index(self):
+        """Rewrite the index log with one line per live entry, in LRU order."""
+        temp_path: str = self._index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as temp_file:
+            for key, slot in self._slots.items():
+                temp_file.write(f"{key} {slot}\n")
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._keys.flush()
+        index_file = self._index_file
+        if index_file is not None:
+            index_file.close()
+        os.replace(temp_path, self._index_path)
+        self._log_lines = len(self._slots)
+        if index_file is not None:
+            self._index_file = open(self._index_path, "a", encoding="utf-8")
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def flush_periodically(cache: EmbeddingCache):
+    """Write new entries to disk in the background so cache misses on the request path never wait on fsync."""
+    while True:
+        time.sleep(CACHE_FLUSH_SECONDS)
+        try:
+            cache.flush_if_dirty()
+        except Exception as e:
+            LOG.error(f"Error flushing embedding cache: {str(e)}")
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get the shared embedding cache, or None when caching is disabled.
+
+    Query-only processes open it read-only; elsewhere the first process to take the writer lock writes.
+    """
+    global _embedding_cache
+    if not CACHE_ENABLED:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            LOG.info(f"Initializing embedding cache at {CACHE_DIR}")
+            _embedding_cache = EmbeddingCache(
+                directory=CACHE_DIR,
+                model=EMBEDDING_MODEL,
+                dimensions=EMBEDDING_DIMENSIONS,
+                max_entries=CACHE_MAX_ENTRIES,
+                writable=APP_ROLE != "query"
+            )
+            if not _embedding_cache.read_only:
+                threading.Thread(target=flush_periodically, args=(_embedding_cache,), name="embedding-cache-flush", daemon=True).start()
+                atexit.register(_embedding_cache.flush_if_dirty)
+    return _embedding_cache
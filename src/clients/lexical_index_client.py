@@ -0,0 +1,254 @@
+import logging
+import json
+import os
+import re
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.vector_stores.types import MetadataFilters, VectorStoreQueryResult
+from src.clients.local_vector_client import IndexManifest, MetadataMasks
+
+LOG = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "if", "in", "into", "is", "it",
+    "its", "of", "on", "or", "so", "such", "that", "the", "their", "then", "there", "these", "they", "this",
+    "to", "was", "were", "what", "when", "which", "who", "will", "with"
+))
+MAX_TERM_COUNT: int = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word and number tokens with common English stopwords removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """In-process BM25 index over node text, stored as compact NumPy arrays.
+
+    Each node keeps its term ids and counts (int32/uint16). The term-major postings used by queries
+    (CSR offsets, doc ids, term frequencies) plus idf and length normalisation are rebuilt lazily
+    with a single argsort after the index changes. A query touches only the postings of its terms,
+    then takes an argpartition top-k over rows allowed by the metadata filters.
+
+    add() and delete_nodes() only change the index in memory; persist() writes it once, as a new
+    generation named by the manifest, at the end of an ingest. Other processes check the manifest
+    before each query and reload when a new generation has been published.
+    """
+
+    def __init__(self, directory: str, index: str, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._directory: str = directory
+        self._index: str = index
+        self._legacy_arrays_path: str = os.path.join(directory, f"{index}.bm25.npz")
+        self._legacy_nodes_path: str = os.path.join(directory, f"{index}.bm25.json")
+        self._manifest: IndexManifest = IndexManifest(path=os.path.join(directory, f"{index}.bm25.manifest.json"))
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._generation: int = 0
+        self._dirty: bool = False  # changed in memory since the last persist()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._terms: List[str] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._doc_term_ids: List[np.ndarray] = []
+        self._doc_term_counts: List[np.ndarray] = []
+        self._postings: Optional[Dict[str, np.ndarray]] = None
+        self._masks: MetadataMasks = MetadataMasks(metadata=[])
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """Insert or replace nodes by node id in memory; call persist() once the batch of changes is complete."""
+        with self._lock:
+            self._refresh()
+            rows: Dict[str, int] = {node_id: row for row, node_id in enumerate(self._ids)}
+            for node in nodes:
+                term_ids, term_counts = self._count_terms(node.get_content())
+                row: Optional[int] = rows.get(node.node_id)
+                if row is None:
+                    rows[node.node_id] = len(self._ids)
+                    self._ids.append(node.node_id)
+                    self._texts.append(node.get_content())
+                    self._metadata.append(dict(node.metadata))
+                    self._doc_term_ids.append(term_ids)
+                    self._doc_term_counts.append(term_counts)
+                else:
+                    self._texts[row] = node.get_content()
+                    self._metadata[row] = dict(node.metadata)
+                    self._doc_term_ids[row] = term_ids
+                    self._doc_term_counts[row] = term_counts
+            self._changed()
+            return [node.node_id for node in nodes]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, **delete_kwargs: Any) -> None:
+        with self._lock:
+            self._refresh()
+            removed_ids = set(node_ids or [])
+            keep: List[int] = [row for row, node_id in enumerate(self._ids) if node_id not in removed_ids]
+            if len(keep) == len(self._ids):
+                return
+            self._ids = [self._ids[row] for row in keep]
+            self._texts = [self._texts[row] for row in keep]
+            self._metadata = [self._metadata[row] for row in keep]
+            self._doc_term_ids = [self._doc_term_ids[row] for row in keep]
+            self._doc_term_counts = [self._doc_term_counts[row] for row in keep]
+            self._changed()
+
+    def persist(self):
+        """Write the index as the next generation and publish it to every process through the manifest."""
+        with self._lock, self._manifest.locked():
+            if not self._dirty:
+                return
+            previous_generation: int = self._generation
+            self._generation = max(previous_generation, (self._manifest.read() or {}).get("generation", 0)) + 1
+            self._write(arrays_path=self._generation_path("npz"), nodes_path=self._generation_path("json"))
+            self._manifest.write({"generation": self._generation})
+            self._signature = self._manifest.signature()
+            self._dirty = False
+            stale_paths: List[str] = [self._legacy_arrays_path, self._legacy_nodes_path]
+            if previous_generation:
+                stale_paths += [self._generation_path(extension, generation=previous_generation) for extension in ("npz", "json")]
+            for path in stale_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            LOG.info(f"Wrote lexical index generation {self._generation} with {len(self._ids)} documents")
+
+    def query(self, query_str: str, similarity_top_k: int, filters: Optional[MetadataFilters] = None) -> VectorStoreQueryResult:
+        """Return the top-k nodes by BM25 score among rows matching the filters."""
+        with self._lock:
+            self._refresh()
+            if self._postings is None:
+                self._postings = self._build_postings()
+            postings, ids, texts, metadata = self._postings, self._ids, self._texts, self._metadata
+            mask: Optional[np.ndarray] = self._masks.evaluate(filters) if filters else None
+            query_term_ids: List[int] = sorted({self._vocabulary[term] for term in tokenize(query_str) if term in self._vocabulary})
+
+        scores: np.ndarray = np.zeros(len(ids), dtype=np.float32)
+        offsets: np.ndarray = postings["offsets"]
+        for term_id in query_term_ids:
+            start, end = offsets[term_id], offsets[term_id + 1]
+            docs: np.ndarray = postings["docs"][start:end]
+            frequencies: np.ndarray = postings["frequencies"][start:end]
+            scores[docs] += postings["idf"][term_id] * frequencies * (self.k1 + 1) / (frequencies + postings["norms"][docs])
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        candidates: np.ndarray = np.flatnonzero(scores > 0)
+        top_k: int = min(similarity_top_k, len(candidates))
+        if top_k == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        best: np.ndarray = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        rows: np.ndarray = candidates[best[np.argsort(-scores[candidates][best])]]
+
+        nodes: List[TextNode] = [TextNode(id_=ids[row], text=texts[row], metadata=metadata[row]) for row in rows]
+        return VectorStoreQueryResult(nodes=nodes, similarities=scores[rows].tolist(), ids=[ids[row] for row in rows])
+
+    def _count_terms(self, text: str):
+        term_ids: List[int] = []
+        for term in tokenize(text):
+            term_id: Optional[int] = self._vocabulary.get(term)
+            if term_id is None:
+                term_id = self._vocabulary[term] = len(self._terms)
+                self._terms.append(term)
+            term_ids.append(term_id)
+        unique_ids, counts = np.unique(np.asarray(term_ids, dtype=np.int32), return_counts=True)
+        return unique_ids.astype(np.int32), np.minimum(counts, MAX_TERM_COUNT).astype(np.uint16)
+
+    def _build_postings(self) -> Dict[str, np.ndarray]:
+        """Invert the per-node term arrays into CSR postings ordered by term id."""
+        doc_count: int = len(self._ids)
+        lengths: np.ndarray = np.fromiter((len(term_ids) for term_ids in self._doc_term_ids), dtype=np.int64, count=doc_count)
+        term_ids: np.ndarray = np.concatenate(self._doc_term_ids) if doc_count else np.zeros(0, dtype=np.int32)
+        term_counts: np.ndarray = np.concatenate(self._doc_term_counts) if doc_count else np.zeros(0, dtype=np.uint16)
+        doc_ids: np.ndarray = np.repeat(np.arange(doc_count, dtype=np.int32), lengths)
+
+        order: np.ndarray = np.argsort(term_ids, kind="stable")
+        document_frequencies: np.ndarray = np.bincount(term_ids, minlength=len(self._terms))
+        offsets: np.ndarray = np.zeros(len(self._terms) + 1, dtype=np.int64)
+        np.cumsum(document_frequencies, out=offsets[1:])
+
+        doc_lengths: np.ndarray = np.zeros(doc_count, dtype=np.float32)
+        np.add.at(doc_lengths, doc_ids, term_counts.astype(np.float32))
+        average_length: float = float(doc_lengths.mean()) if doc_count and doc_lengths.mean() > 0 else 1.0
+        return {
+            "offsets": offsets,
+            "docs": doc_ids[order],
+            "frequencies": term_counts[order].astype(np.float32),
+            "idf": np.log1p((doc_count - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32),
+            "norms": (self.k1 * (1 - self.b + self.b * doc_lengths / average_length)).astype(np.float32)
+        }
+
+    def _changed(self):
+        self._dirty = True
+        self._postings = None
+        self._masks = MetadataMasks(metadata=self._metadata)
+
+    def _generation_path(self, extension: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self._directory, f"{self._index}.bm25-{self._generation if generation is None else generation}.{extension}")
+
+    def _write(self, arrays_path: str, nodes_path: str):
+        """Write the term arrays and node table atomically."""
+        lengths: List[int] = [len(term_ids) for term_ids in self._doc_term_ids]
+        temp_arrays_path: str = arrays_path + ".tmp"
+        temp_nodes_path: str = nodes_path + ".tmp"
+        with open(temp_arrays_path, "wb") as arrays_file:
+            np.savez(
+                arrays_file,
+                doc_offsets=np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64),
+                term_ids=np.concatenate(self._doc_term_ids) if lengths else np.zeros(0, dtype=np.int32),
+                term_counts=np.concatenate(self._doc_term_counts) if lengths else np.zeros(0, dtype=np.uint16)
+            )
+        with open(temp_nodes_path, "w", encoding="utf-8") as nodes_file:
+            json.dump({"ids": self._ids, "texts": self._texts, "metadata": self._metadata, "terms": self._terms}, nodes_file)
+        os.replace(temp_arrays_path, arrays_path)
+        os.replace(temp_nodes_path, nodes_path)
+
+    def _refresh(self):
+        """Reload the index if another process has published a newer generation; unpersisted changes are kept."""
+        signature: Optional[Tuple[int, int, int]] = self._manifest.signature()
+        if signature is None or signature == self._signature or self._dirty:
+            return
+        manifest: Optional[Dict[str, Any]] = self._manifest.read()
+        if manifest is None:
+            return
+        if manifest["generation"] != self._generation:
+            try:
+                self._read(
+                    arrays_path=self._generation_path("npz", generation=manifest["generation"]),
+                    nodes_path=self._generation_path("json", generation=manifest["generation"])
+                )
+            except FileNotFoundError:
+                return  # replaced again since the manifest was read; caught up on the next call
+            self._generation = manifest["generation"]
+            LOG.info(f"Loaded {len(self._ids)} documents from lexical index generation {self._generation}")
+        self._signature = signature
+
+    def _read(self, arrays_path: str, nodes_path: str):
+        with open(nodes_path, "r", encoding="utf-8") as nodes_file:
+            stored: Dict[str, Any] = json.load(nodes_file)
+        with np.load(arrays_path) as arrays:
+            doc_offsets, term_ids, term_counts = arrays["doc_offsets"], arrays["term_ids"], arrays["term_counts"]
+        self._ids, self._texts, self._metadata, self._terms = stored["ids"], stored["texts"], stored["metadata"], stored["terms"]
+        self._vocabulary = {term: term_id for term_id, term in enumerate(self._terms)}
+        self._doc_term_ids = np.split(term_ids, doc_offsets[1:-1]) if self._ids else []
+        self._doc_term_counts = np.split(term_counts, doc_offsets[1:-1]) if self._ids else []
+        self._postings = None
+        self._masks = MetadataMasks(metadata=self._metadata)
+
+    def _load(self):
+        if self._manifest.signature() is not None:
+            self._refresh()
+            return
+        # Indexes written before generations are read as they are; the next persist() replaces them
+        if not os.path.exists(self._legacy_nodes_path) or not os.path.exists(self._legacy_arrays_path):
+            return
+        self._read(arrays_path=self._legacy_arrays_path, nodes_path=self._legacy_nodes_path)
+        LOG.info(f"Loaded {len(self._ids)} documents into the lexical index from {self._legacy_arrays_path}")
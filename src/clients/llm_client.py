@@ -1,42 +1,164 @@
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
-from typing import Iterable, List
-from openai import OpenAI
+import random
+import time
+import httpx
+from typing import Any, Callable, Iterable, Iterator, List
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
 from openai.types import chat, CreateEmbeddingResponse
 from src import config
+from src.clients.client_registry import registry
+from src.clients.rate_limiter import RateLimiter, RateLimitPermit
 
 LOG = logging.getLogger(__name__)
 response_model: str = config.env_config.OPEN_AI_MODEL
 embedding_model: str = config.env_config.OPEN_AI_EMBEDDING_MODEL
+embedding_dimensions: int = config.env_config.OPEN_AI_EMBEDDING_DIMENSIONS
+RATE_LIMIT_MAX_ATTEMPTS: int = config.env_config.OPEN_AI_RATE_LIMIT_MAX_ATTEMPTS
+CHARACTERS_PER_TOKEN: int = 4  # OpenAI's rule of thumb; the rate-limit headers correct any drift
+
+embedding_rate_limiter: RateLimiter = RateLimiter(
+    name="embeddings",
+    requests_per_minute=config.env_config.OPEN_AI_EMBEDDING_REQUESTS_PER_MINUTE,
+    tokens_per_minute=config.env_config.OPEN_AI_EMBEDDING_TOKENS_PER_MINUTE,
+    initial_concurrency=config.env_config.EMBEDDING_INITIAL_CONCURRENCY,
+    max_concurrency=config.env_config.EMBEDDING_BATCH_WORKERS,
+    headroom=config.env_config.OPEN_AI_RATE_LIMIT_HEADROOM
+)
+chat_rate_limiter: RateLimiter = RateLimiter(
+    name="chat",
+    requests_per_minute=config.env_config.OPEN_AI_CHAT_REQUESTS_PER_MINUTE,
+    tokens_per_minute=config.env_config.OPEN_AI_CHAT_TOKENS_PER_MINUTE,
+    initial_concurrency=config.env_config.CHAT_INITIAL_CONCURRENCY,
+    max_concurrency=config.env_config.CHAT_MAX_CONCURRENCY,
+    headroom=config.env_config.OPEN_AI_RATE_LIMIT_HEADROOM
+)
 
 
 def initialize_openai_client() -> OpenAI:
-    """Initialize the OpenAI client with the provided API key."""
+    """Initialize the OpenAI client with the provided API key and a pooled, keep-alive HTTP client."""
     LOG.info("Initializing OpenAI client")
     api_key: str = config.env_config.OPEN_AI_API_KEY
-    return OpenAI(api_key=api_key)
+    http_client: httpx.Client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=config.env_config.OPEN_AI_MAX_CONNECTIONS,
+            max_keepalive_connections=config.env_config.OPEN_AI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.env_config.OPEN_AI_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=config.env_config.OPEN_AI_TIMEOUT_SECONDS
+    )
+    return OpenAI(
+        api_key=api_key,
+        timeout=config.env_config.OPEN_AI_TIMEOUT_SECONDS,
+        max_retries=config.env_config.OPEN_AI_MAX_RETRIES,
+        http_client=http_client
+    )
+
+
+def get_openai_client() -> OpenAI:
+    """Get the shared OpenAI client, building it on first use."""
+    return registry.get("openai")
+
+
+def warm_openai_client(client: OpenAI):
+    """Open a pooled connection to the API with a lightweight model lookup."""
+    client.models.retrieve(response_model)
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    return sum(len(text) for text in texts) // CHARACTERS_PER_TOKEN + 1
+
+
+def send_rate_limited(limiter: RateLimiter, tokens: int, request: Callable[[OpenAI], Any]) -> Any:
+    """Send a raw-response request through the limiter and return the raw response.
+    The SDK's own retries are disabled so every attempt is paced: a 429 backs off the limiter and
+    retries after the server's retry-after, connection errors and 5xx retry with jittered backoff,
+    and other errors (including an exhausted quota) are raised at once.
+    """
+    client: OpenAI = get_openai_client().with_options(max_retries=0)
+    for attempt in range(1, RATE_LIMIT_MAX_ATTEMPTS + 1):
+        permit: RateLimitPermit = limiter.acquire(tokens=tokens)
+        try:
+            raw_response: Any = request(client)
+        except RateLimitError as e:
+            if e.code == "insufficient_quota" or attempt == RATE_LIMIT_MAX_ATTEMPTS:
+                limiter.abandon(permit)
+                raise
+            limiter.throttle(permit, headers=e.response.headers)
+            LOG.warning(f"OpenAI {limiter.name} request rate limited (attempt {attempt} of {RATE_LIMIT_MAX_ATTEMPTS})")
+        except (APIConnectionError, InternalServerError) as e:
+            limiter.abandon(permit)
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS:
+                raise
+            LOG.warning(f"OpenAI {limiter.name} request failed (attempt {attempt} of {RATE_LIMIT_MAX_ATTEMPTS}): {str(e)}")
+            time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.0))
+        except Exception:
+            limiter.abandon(permit)
+            raise
+        else:
+            limiter.complete(permit, headers=raw_response.headers)
+            return raw_response
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=3))
 def get_text_embedding(text: str) -> CreateEmbeddingResponse:
     """Get embedding for the provided text using the OpenAI client.
         Response: CreateEmbeddingResponse with the List[float] embedding data located at response.data[0].embedding.
     """
-    response: CreateEmbeddingResponse = client.embeddings.create(
-        model=embedding_model,
-        input=text,
-        dimensions=1536
+    return get_batch_text_embeddings(texts=[text])
+
+
+def get_batch_text_embeddings(texts: List[str]) -> CreateEmbeddingResponse:
+    """Get embeddings for a batch of texts in a single request.
+        Response: CreateEmbeddingResponse where response.data[i].index is the position of the input in texts.
+    """
+    raw_response: Any = send_rate_limited(
+        limiter=embedding_rate_limiter,
+        tokens=estimate_tokens(texts),
+        request=lambda client: client.embeddings.with_raw_response.create(
+            model=embedding_model,
+            input=texts,
+            dimensions=embedding_dimensions
+        )
     )
-    return response
+    return raw_response.parse()
 
 
 def get_chat_response(chat_messages: Iterable[chat.ChatCompletionMessageParam], max_tokens: int = 2000) -> chat.ChatCompletion:
     """Get chat response from OpenAI using the provided messages."""
-    return client.chat.completions.create(
-        model=response_model,
-        messages=chat_messages,
-        max_tokens=max_tokens
+    chat_messages = list(chat_messages)
+    raw_response: Any = send_rate_limited(
+        limiter=chat_rate_limiter,
+        tokens=estimate_chat_tokens(chat_messages=chat_messages, max_tokens=max_tokens),
+        request=lambda client: client.chat.completions.with_raw_response.create(
+            model=response_model,
+            messages=chat_messages,
+            max_tokens=max_tokens
+        )
+    )
+    return raw_response.parse()
+
+
+def stream_chat_response(chat_messages: Iterable[chat.ChatCompletionMessageParam], max_tokens: int = 2000) -> Iterator[chat.ChatCompletionChunk]:
+    """Stream a chat response from OpenAI, yielding completion chunks as tokens are generated.
+    The limiter's permit is released once the response headers arrive, so an abandoned stream cannot hold it.
+    """
+    chat_messages = list(chat_messages)
+    raw_response: Any = send_rate_limited(
+        limiter=chat_rate_limiter,
+        tokens=estimate_chat_tokens(chat_messages=chat_messages, max_tokens=max_tokens),
+        request=lambda client: client.chat.completions.with_raw_response.create(
+            model=response_model,
+            messages=chat_messages,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
     )
+    return raw_response.parse()
+
+
+def estimate_chat_tokens(chat_messages: List[chat.ChatCompletionMessageParam], max_tokens: int) -> int:
+    """Tokens a chat request counts against the tokens-per-minute limit: its prompt plus max_tokens."""
+    return estimate_tokens(str(message.get("content") or "") for message in chat_messages) + max_tokens
 
 
-client: OpenAI = initialize_openai_client()
\ No newline at end of file
+registry.register("openai", initialize_openai_client, warmup=warm_openai_client)
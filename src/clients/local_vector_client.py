@@ -0,0 +1,374 @@
+import logging
+import json
+import os
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.vector_stores.types import (
+    FilterCondition, FilterOperator, MetadataFilter, MetadataFilters,
+    VectorStoreQuery, VectorStoreQueryResult
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so run a single writer there
+    fcntl = None
+
+LOG = logging.getLogger(__name__)
+
+INDEXED_METADATA_KEYS: Tuple[str, ...] = ("book", "chapter")
+COMPACT_MIN_DEAD_ROWS: int = 1024
+
+
+class LocalVectorStore:
+    """In-process vector store backed by a normalized float32 matrix memory-mapped from disk.
+
+    Queries are a single matrix-vector product followed by an argpartition top-k. Metadata
+    filters are evaluated as boolean row masks (see MetadataMasks), rebuilt lazily after the index changes.
+
+    Each write appends new rows to the matrix (replaced rows are overwritten in place) and their
+    node records to a JSON-lines journal, then publishes the new row and journal length in the
+    manifest. Deleted rows are only marked dead until they outnumber the live ones, when the files
+    are rewritten compactly as a new generation. Other processes check the manifest before every
+    query and replay just the journal records they have not seen.
+    """
+
+    def __init__(self, directory: str, index: str, dim: int):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._directory: str = directory
+        self._index: str = index
+        self._legacy_matrix_path: str = os.path.join(directory, f"{index}.f32")
+        self._legacy_nodes_path: str = os.path.join(directory, f"{index}.json")
+        self._manifest: IndexManifest = IndexManifest(path=os.path.join(directory, f"{index}.manifest.json"))
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._generation: int = 0  # 0 until the first write in this format
+        self._journal_bytes: int = 0
+        self._row_count: int = 0  # rows written to the matrix file
+        self._matrix: np.ndarray = np.zeros((0, dim), dtype=np.float32)
+        self._ids: List[Optional[str]] = []  # None marks a deleted row
+        self._rows: Dict[str, int] = {}
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._dead_rows: int = 0
+        self._masks: Optional[MetadataMasks] = None
+        self._live: Optional[np.ndarray] = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """Insert or replace nodes by node id and persist the changed rows."""
+        with self._lock, self._manifest.locked():
+            self._refresh()
+            if self._generation == 0:
+                self._rewrite()
+            records: List[Dict[str, Any]] = []
+            replaced_vectors: Dict[int, np.ndarray] = {}
+            new_vectors: List[np.ndarray] = []
+            for node in nodes:
+                vector: np.ndarray = normalize_rows(np.asarray(node.get_embedding(), dtype=np.float32)[None, :])[0]
+                row: int = self._rows.get(node.node_id, len(self._ids))
+                record: Dict[str, Any] = {"id": node.node_id, "row": row, "text": node.get_content(), "metadata": dict(node.metadata)}
+                self._apply_record(record)
+                records.append(record)
+                if row < self._row_count:
+                    replaced_vectors[row] = vector
+                elif row - self._row_count < len(new_vectors):
+                    new_vectors[row - self._row_count] = vector
+                else:
+                    new_vectors.append(vector)
+
+            row_bytes: int = self.dim * np.dtype(np.float32).itemsize
+            with open(self._generation_path("f32"), "r+b") as matrix_file:
+                for row, vector in replaced_vectors.items():
+                    matrix_file.seek(row * row_bytes)
+                    matrix_file.write(vector.tobytes())
+                if new_vectors:
+                    matrix_file.seek(self._row_count * row_bytes)
+                    matrix_file.write(np.stack(new_vectors).astype(np.float32).tobytes())
+            self._row_count = len(self._ids)
+            self._append_journal(records)
+            self._publish()
+            return [node.node_id for node in nodes]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, **delete_kwargs: Any) -> None:
+        with self._lock, self._manifest.locked():
+            self._refresh()
+            removed_ids: List[str] = sorted(set(node_ids or []).intersection(self._rows))
+            if not removed_ids:
+                return
+            if self._generation == 0:
+                self._rewrite()
+            record: Dict[str, Any] = {"deleted": removed_ids}
+            self._apply_record(record)
+            if self._dead_rows > max(len(self._rows), COMPACT_MIN_DEAD_ROWS):
+                self._rewrite()
+            else:
+                self._append_journal([record])
+                self._publish()
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def existing_ids(self, node_ids: List[str]) -> Set[str]:
+        with self._lock:
+            self._refresh()
+            return set(node_ids).intersection(self._rows)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Return the top-k nodes by cosine similarity among rows matching the query filters."""
+        with self._lock:
+            self._refresh()
+            if self._masks is None:
+                self._masks = MetadataMasks(metadata=self._metadata)
+                self._live = np.fromiter((node_id is not None for node_id in self._ids), dtype=bool, count=len(self._ids))
+            matrix, ids, texts, metadata = self._matrix, self._ids, self._texts, self._metadata
+            mask: Optional[np.ndarray] = self._masks.evaluate(query.filters) if query.filters else None
+            if self._dead_rows:
+                mask = self._live if mask is None else mask & self._live
+
+        candidates: np.ndarray = np.flatnonzero(mask) if mask is not None else np.arange(len(ids))
+        top_k: int = min(query.similarity_top_k, len(candidates))
+        if top_k == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        query_vector: np.ndarray = normalize_rows(np.asarray(query.query_embedding, dtype=np.float32)[None, :])[0]
+        scores: np.ndarray = matrix[candidates] @ query_vector if mask is not None else matrix @ query_vector
+        best: np.ndarray = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        rows: np.ndarray = candidates[best]
+
+        nodes: List[TextNode] = [
+            TextNode(id_=ids[row], text=texts[row], metadata=metadata[row], embedding=matrix[row].tolist())
+            for row in rows
+        ]
+        return VectorStoreQueryResult(nodes=nodes, similarities=scores[best].tolist(), ids=[ids[row] for row in rows])
+
+    def _generation_path(self, extension: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self._directory, f"{self._index}-{self._generation if generation is None else generation}.{extension}")
+
+    def _apply_record(self, record: Dict[str, Any]):
+        """Apply one journal record: a node written to a row, or a list of deleted node ids."""
+        if "deleted" in record:
+            for node_id in record["deleted"]:
+                row: Optional[int] = self._rows.pop(node_id, None)
+                if row is not None:
+                    self._ids[row], self._texts[row], self._metadata[row] = None, "", {}
+                    self._dead_rows += 1
+            return
+        row = record["row"]
+        if row == len(self._ids):
+            self._ids.append(None)
+            self._texts.append("")
+            self._metadata.append({})
+        self._ids[row], self._texts[row], self._metadata[row] = record["id"], record["text"], record["metadata"]
+        self._rows[record["id"]] = row
+
+    def _append_journal(self, records: List[Dict[str, Any]]):
+        payload: bytes = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self._generation_path("jsonl"), "ab") as journal_file:
+            journal_file.write(payload)
+        self._journal_bytes += len(payload)
+
+    def _publish(self):
+        """Point the manifest at the rows and journal records just written, then re-map the matrix."""
+        self._manifest.write({
+            "dim": self.dim, "generation": self._generation, "rows": self._row_count, "journal_bytes": self._journal_bytes
+        })
+        self._signature = self._manifest.signature()
+        self._matrix = self._map_matrix(path=self._generation_path("f32"), rows=self._row_count)
+        self._masks = None
+
+    def _rewrite(self):
+        """Write the live rows compactly as the next generation and remove the previous generation's files."""
+        live_rows: List[int] = [row for row, node_id in enumerate(self._ids) if node_id is not None]
+        previous_generation: int = self._generation
+        matrix: np.ndarray = np.array(self._matrix[live_rows], dtype=np.float32) if live_rows else np.zeros((0, self.dim), dtype=np.float32)
+        records: List[Dict[str, Any]] = [
+            {"id": self._ids[row], "row": new_row, "text": self._texts[row], "metadata": self._metadata[row]}
+            for new_row, row in enumerate(live_rows)
+        ]
+
+        self._generation = previous_generation + 1
+        matrix.tofile(self._generation_path("f32"))
+        open(self._generation_path("jsonl"), "wb").close()
+        self._ids, self._rows, self._texts, self._metadata, self._dead_rows = [], {}, [], [], 0
+        self._journal_bytes = 0
+        for record in records:
+            self._apply_record(record)
+        self._row_count = len(self._ids)
+        self._append_journal(records)
+        self._publish()
+
+        stale_paths: List[str] = [self._legacy_matrix_path, self._legacy_nodes_path] if previous_generation == 0 else [
+            self._generation_path("f32", generation=previous_generation), self._generation_path("jsonl", generation=previous_generation)
+        ]
+        for path in stale_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        LOG.info(f"Wrote local vector index generation {self._generation} with {self._row_count} vectors")
+
+    def _refresh(self):
+        """Catch up with writes published by any process since the manifest was last read."""
+        signature: Optional[Tuple[int, int, int]] = self._manifest.signature()
+        if signature is None or signature == self._signature:
+            return
+        manifest: Optional[Dict[str, Any]] = self._manifest.read()
+        if manifest is None:
+            return
+        if manifest.get("dim") != self.dim:
+            LOG.warning(f"Ignoring local vector index {self._manifest.path} built for dim {manifest.get('dim')}")
+            self._signature = signature
+            return
+        generation: int = manifest["generation"]
+        start: int = self._journal_bytes if generation == self._generation else 0
+        try:
+            journal: bytes = self._read_journal(generation=generation, start=start, end=manifest["journal_bytes"])
+            matrix: np.ndarray = self._map_matrix(path=self._generation_path("f32", generation=generation), rows=manifest["rows"])
+        except FileNotFoundError:
+            return  # compacted again since the manifest was read; caught up on the next call
+        if generation != self._generation:
+            self._ids, self._rows, self._texts, self._metadata, self._dead_rows = [], {}, [], [], 0
+            self._generation = generation
+        for line in journal.splitlines():
+            self._apply_record(json.loads(line))
+        self._journal_bytes = manifest["journal_bytes"]
+        self._row_count = manifest["rows"]
+        self._matrix = matrix
+        self._masks = None
+        self._signature = signature
+        LOG.debug(f"Local vector index at generation {self._generation} with {len(self._rows)} vectors")
+
+    def _read_journal(self, generation: int, start: int, end: int) -> bytes:
+        with open(self._generation_path("jsonl", generation=generation), "rb") as journal_file:
+            journal_file.seek(start)
+            return journal_file.read(end - start)
+
+    def _load(self):
+        if self._manifest.signature() is not None:
+            self._refresh()
+            LOG.info(f"Loaded {len(self._rows)} vectors from generation {self._generation} of {self._manifest.path}")
+            return
+        # Indexes written before the journal format are read whole; the first write converts them
+        if not os.path.exists(self._legacy_nodes_path) or not os.path.exists(self._legacy_matrix_path):
+            return
+        with open(self._legacy_nodes_path, "r", encoding="utf-8") as nodes_file:
+            stored: Dict[str, Any] = json.load(nodes_file)
+        if stored.get("dim") != self.dim:
+            LOG.warning(f"Ignoring local vector index {self._legacy_nodes_path} built for dim {stored.get('dim')}")
+            return
+        self._ids, self._texts, self._metadata = stored["ids"], stored["texts"], stored["metadata"]
+        self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._row_count = len(self._ids)
+        self._matrix = self._map_matrix(path=self._legacy_matrix_path, rows=self._row_count)
+        LOG.info(f"Loaded {len(self._ids)} vectors from {self._legacy_matrix_path}")
+
+    def _map_matrix(self, path: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+
+class IndexManifest:
+    """A small JSON file naming the current state of an on-disk index, replaced atomically on each write.
+
+    Readers compare its stat signature (inode, mtime, size) before reading the index and reload
+    only when it changed. Writers in any process serialize through an exclusive lock file beside it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path: str = path + ".lock"
+
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            manifest_stat: os.stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return manifest_stat.st_ino, manifest_stat.st_mtime_ns, manifest_stat.st_size
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+
+    def write(self, manifest: Dict[str, Any]):
+        temp_path: str = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temp_path, self.path)
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        with open(self._lock_path, "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class MetadataMasks:
+    """Evaluates llama_index MetadataFilters as boolean masks over the rows of a node table.
+    Masks for book and chapter values are built once up front; other keys are scanned per filter.
+    """
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        self._metadata = metadata
+        self._masks: Dict[Tuple[str, Hashable], np.ndarray] = {}
+        for key in INDEXED_METADATA_KEYS:
+            for row, row_metadata in enumerate(metadata):
+                value = row_metadata.get(key)
+                if value is None:
+                    continue
+                if (key, value) not in self._masks:
+                    self._masks[(key, value)] = np.zeros(len(metadata), dtype=bool)
+                self._masks[(key, value)][row] = True
+
+    def evaluate(self, filters: MetadataFilters) -> np.ndarray:
+        masks: List[np.ndarray] = [
+            self.evaluate(metadata_filter) if isinstance(metadata_filter, MetadataFilters)
+            else self._evaluate_filter(metadata_filter)
+            for metadata_filter in filters.filters
+        ]
+        if not masks:
+            return np.ones(len(self._metadata), dtype=bool)
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        if filters.condition == FilterCondition.NOT:
+            return ~np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+    def _evaluate_filter(self, metadata_filter: MetadataFilter) -> np.ndarray:
+        operator: FilterOperator = metadata_filter.operator
+        if operator in (FilterOperator.EQ, FilterOperator.NE):
+            mask: np.ndarray = self._value_mask(metadata_filter.key, metadata_filter.value)
+            return mask if operator == FilterOperator.EQ else ~mask
+        if operator in (FilterOperator.IN, FilterOperator.NIN):
+            mask = np.zeros(len(self._metadata), dtype=bool)
+            for value in metadata_filter.value:
+                mask |= self._value_mask(metadata_filter.key, value)
+            return mask if operator == FilterOperator.IN else ~mask
+        raise ValueError(f"Unsupported metadata filter operator for local indexes: {operator}")
+
+    def _value_mask(self, key: str, value: Any) -> np.ndarray:
+        mask: Optional[np.ndarray] = self._masks.get((key, value))
+        if mask is not None:
+            return mask
+        if key in INDEXED_METADATA_KEYS:
+            return np.zeros(len(self._metadata), dtype=bool)
+        return np.fromiter((metadata.get(key) == value for metadata in self._metadata), dtype=bool, count=len(self._metadata))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms: np.ndarray = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
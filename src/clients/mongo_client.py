@@ -1,8 +1,10 @@
 import logging
+import threading
 from src import config
-from pymongo import MongoClient, database
+from src.clients.client_registry import registry
+from pymongo import ASCENDING, MongoClient, database
 from pymongo.collection import Collection
-from llama_index.storage.chat_store.mongo import MongoChatStore
+from pymongo.errors import OperationFailure
 
 LOG = logging.getLogger(__name__)
 
@@ -12,28 +14,68 @@ DB_NAME = config.env_config.DB_NAME
 MONGO_URI = config.env_config.MONGO_URI
 MONGO_CHAT_COLLECTION = config.env_config.MONGO_CHAT_COLLECTION
 MONGO_PROMPT_COLLECTION = config.env_config.MONGO_PROMPT_COLLECTION
+MONGO_PROMPT_STAMP_COLLECTION = config.env_config.MONGO_PROMPT_STAMP_COLLECTION
+MONGO_JOB_COLLECTION = config.env_config.MONGO_JOB_COLLECTION
 
 
 def initiate_mongo_client() -> MongoClient:
-    """Initialize the MongoDB client with the provided URI and options."""
+    """Initialize the MongoDB client with the provided URI, pool sizing and timeouts."""
     LOG.info("Initializing MongoDB client")
     client = MongoClient(
         MONGO_URI,
         tls=True,
-        tlsCertificateKeyFile=CERT_PATH
+        tlsCertificateKeyFile=CERT_PATH,
+        maxPoolSize=config.env_config.MONGO_MAX_POOL_SIZE,
+        minPoolSize=config.env_config.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=config.env_config.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=config.env_config.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=config.env_config.MONGO_SOCKET_TIMEOUT_MS,
+        serverSelectionTimeoutMS=config.env_config.MONGO_SERVER_SELECTION_TIMEOUT_MS
         )
     return client
 
 
+def get_mongo_client() -> MongoClient:
+    """Get the shared MongoDB client, building it on first use."""
+    return registry.get("mongo")
+
+
+def warm_mongo_client(client: MongoClient):
+    """Complete server selection and the TLS handshake with a ping."""
+    client.admin.command("ping")
+
+
 def get_bible_rag_db() -> database.Database:
     """Get the Bible RAG database."""
-    LOG.info("Connecting to MongoDB at %s", MONGO_URI)
-    db: database.Database = mongo_client[DB_NAME]
+    db: database.Database = get_mongo_client()[DB_NAME]
     return db
 
 
-def get_mongo_chat_store() -> MongoChatStore:
-    return MongoChatStore(mongo_client=mongo_client, db_name=DB_NAME, collection_name=MONGO_CHAT_COLLECTION)
+def get_mongo_job_collection() -> Collection:
+    db: database.Database = get_bible_rag_db()
+    return db[MONGO_JOB_COLLECTION]
+
+
+def get_mongo_chat_collection() -> Collection:
+    """Get the chat history collection, creating its session index on first use."""
+    global _chat_indexes_ready
+    collection: Collection = get_bible_rag_db()[MONGO_CHAT_COLLECTION]
+    if not _chat_indexes_ready:
+        with _chat_indexes_lock:
+            if not _chat_indexes_ready:
+                ensure_chat_indexes(collection=collection)
+                _chat_indexes_ready = True
+    return collection
+
+
+def ensure_chat_indexes(collection: Collection):
+    """Index chat messages by (session_id, index); unique so concurrent appends cannot share a slot."""
+    keys = [("session_id", ASCENDING), ("index", ASCENDING)]
+    try:
+        collection.create_index(keys, name="session_id_index", unique=True)
+    except OperationFailure as e:
+        LOG.warning(f"Unable to create unique chat index, falling back to non-unique index: {e}")
+        collection.create_index(keys, name="session_id_index_non_unique")
 
 
 def get_mongo_prompt_collection() -> Collection:
@@ -41,4 +83,11 @@ def get_mongo_prompt_collection() -> Collection:
     return db[MONGO_PROMPT_COLLECTION]
 
 
-mongo_client: MongoClient = initiate_mongo_client()
\ No newline at end of file
+def get_mongo_prompt_stamp_collection() -> Collection:
+    db: database.Database = get_bible_rag_db()
+    return db[MONGO_PROMPT_STAMP_COLLECTION]
+
+
+_chat_indexes_ready: bool = False
+_chat_indexes_lock = threading.Lock()
+registry.register("mongo", initiate_mongo_client, warmup=warm_mongo_client)
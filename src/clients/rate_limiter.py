@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PAUSE_SECONDS: float = 1.0
+
+
+def parse_number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """A per-minute budget (requests or tokens) refilled continuously; callers hold the limiter's lock."""
+
+    def __init__(self, per_minute: float):
+        self.capacity: float = float(per_minute)
+        self._available: float = float(per_minute)
+        self._updated: float = time.monotonic()
+
+    def _refill(self, now: float):
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_seconds(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available; a request larger than the whole budget waits for a full bucket."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self._available >= amount:
+            return 0.0
+        return (amount - self._available) * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        self._available -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Adopt the limit and remaining budget the server reported, never assuming more than we already track."""
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self._available = min(self._available, limit)
+        if remaining is not None:
+            self._available = min(self._available, remaining)
+
+    def remaining_fraction(self) -> float:
+        return max(self._available, 0.0) / self.capacity
+
+
+class RateLimitPermit:
+    """Budget held by one call between RateLimiter.acquire() and complete(), throttle() or abandon()."""
+
+    def __init__(self, tokens: int, started: float):
+        self.tokens = tokens
+        self.started = started
+
+
+class RateLimiter:
+    """Paces calls to one rate-limited API with requests- and tokens-per-minute buckets and an AIMD concurrency limit.
+
+    acquire() blocks until both buckets hold enough budget and fewer than `limit` calls are in flight.
+    Each success raises the limit by 1/limit, i.e. by one per round of calls (additive increase), unless
+    the x-ratelimit-remaining-* headers show less than `headroom` of either budget left. A 429 multiplies
+    the limit by `decrease_factor` (once per round, however many calls of that round fail) and pauses every
+    caller until the server's retry-after. Limits reported in x-ratelimit-limit-* headers replace the
+    configured budgets, so those only need to be a reasonable first guess.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        initial_concurrency: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        headroom: float = 0.1,
+        decrease_factor: float = 0.5
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.headroom = headroom
+        self.decrease_factor = decrease_factor
+        self.limit: float = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight: int = 0
+        self.throttled: int = 0
+        self.waited_seconds: float = 0.0
+        self._requests: TokenBucket = TokenBucket(per_minute=requests_per_minute)
+        self._tokens: TokenBucket = TokenBucket(per_minute=tokens_per_minute)
+        self._paused_until: float = 0.0
+        self._decreased_at: float = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens: int) -> RateLimitPermit:
+        requested: float = time.monotonic()
+        with self._condition:
+            while True:
+                now: float = time.monotonic()
+                wait: float = max(
+                    self._paused_until - now,
+                    self._requests.wait_seconds(1, now),
+                    self._tokens.wait_seconds(tokens, now)
+                )
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                # Woken early when a call finishes; otherwise when the budget has refilled
+                self._condition.wait(timeout=wait if wait > 0 else None)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self.in_flight += 1
+            self.waited_seconds += now - requested
+        return RateLimitPermit(tokens=tokens, started=now)
+
+    def complete(self, permit: RateLimitPermit, headers: Optional[Mapping[str, str]] = None):
+        """Release a permit after a successful call and widen the concurrency limit while budget remains."""
+        with self._condition:
+            self.in_flight -= 1
+            self._sync(headers=headers)
+            if min(self._requests.remaining_fraction(), self._tokens.remaining_fraction()) >= self.headroom:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def throttle(self, permit: RateLimitPermit, headers: Optional[Mapping[str, str]] = None):
+        """Release a permit after a 429: back off the concurrency limit and pause until the server allows calls again."""
+        with self._condition:
+            now: float = time.monotonic()
+            self.in_flight -= 1
+            self.throttled += 1
+            self._sync(headers=headers)
+            pause: float = self._pause_seconds(headers=headers)
+            self._paused_until = max(self._paused_until, now + pause)
+            # Calls sent before the last decrease saw the old limit, so their 429s do not cut it again
+            if permit.started >= self._decreased_at:
+                self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+                self._decreased_at = now
+                LOG.warning(f"Rate limited by {self.name}: concurrency limit now {int(self.limit)}, pausing {pause:.2f}s")
+            self._condition.notify_all()
+
+    def abandon(self, permit: RateLimitPermit):
+        """Release a permit after a call failed for a reason other than rate limiting."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "name": self.name,
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited_seconds, 3),
+                "requests_per_minute": self._requests.capacity,
+                "tokens_per_minute": self._tokens.capacity
+            }
+
+    def _sync(self, headers: Optional[Mapping[str, str]]):
+        if not headers:
+            return
+        now: float = time.monotonic()
+        self._requests.sync(
+            limit=parse_number(headers.get("x-ratelimit-limit-requests")),
+            remaining=parse_number(headers.get("x-ratelimit-remaining-requests")),
+            now=now
+        )
+        self._tokens.sync(
+            limit=parse_number(headers.get("x-ratelimit-limit-tokens")),
+            remaining=parse_number(headers.get("x-ratelimit-remaining-tokens")),
+            now=now
+        )
+
+    def _pause_seconds(self, headers: Optional[Mapping[str, str]]) -> float:
+        """Honour retry-after-ms or retry-after; without them the synced buckets already wait for the budget to refill.
+        (x-ratelimit-reset-* give the time until the budget is full again, which is far longer than needed.)
+        """
+        if not headers:
+            return DEFAULT_PAUSE_SECONDS
+        retry_after_ms: Optional[float] = parse_number(headers.get("retry-after-ms"))
+        if retry_after_ms is not None:
+            return retry_after_ms / 1000.0
+        retry_after: Optional[float] = parse_number(headers.get("retry-after"))
+        return retry_after if retry_after is not None else DEFAULT_PAUSE_SECONDS
@@ -1,40 +1,266 @@
 import logging
-from typing import List
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from llama_index.vector_stores.opensearch import OpensearchVectorClient, OpensearchVectorStore
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Protocol, Set
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryResult
 from src import config
+from src.clients.client_registry import registry
+from src.clients.local_vector_client import LocalVectorStore
+from src.clients.lexical_index_client import LexicalIndex
+
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
+    from llama_index.vector_stores.opensearch import OpensearchVectorClient, OpensearchVectorStore
 
 
 LOG = logging.getLogger(__name__)
 INDEX = config.env_config.BIBLE_VERSION
 OPENSEAERCH_ENDPOINT = config.env_config.OS_ENDPOINT
 OS_CREDS: List[str] = config.env_config.OS_CREDS
+EMBEDDING_DIMENSIONS: int = config.env_config.OPEN_AI_EMBEDDING_DIMENSIONS
+VECTOR_BACKEND: str = config.env_config.VECTOR_BACKEND
+LOCAL_VECTOR_STORE_DIR: str = config.env_config.LOCAL_VECTOR_STORE_DIR
+LEXICAL_INDEX_DIR: str = config.env_config.LEXICAL_INDEX_DIR
+VECTOR_BULK_MAX_CHUNK_BYTES: int = config.env_config.VECTOR_BULK_MAX_CHUNK_BYTES
+
+
+class VectorBackend(Protocol):
+    """Operations the services need from a vector store, satisfied by llama_index vector stores."""
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]: ...
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, **delete_kwargs: Any) -> None: ...
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult: ...
+
+
+class VectorBulkWriter(Protocol):
+    """Bulk-load operations on a vector index, reporting failures per node instead of per batch."""
+
+    def write(self, nodes: List[BaseNode]) -> List[str]:
+        """Index the nodes and return the ids of those that failed."""
+        ...
+
+    def existing_ids(self, node_ids: List[str]) -> Set[str]: ...
+
+    def count(self, node_ids: Optional[List[str]] = None) -> int:
+        """Number of the given nodes in the index, or of all its documents, after making every write visible.
+        The index is shared by every Bible version, so a version's nodes are counted by id.
+        """
+        ...
+
+    def begin_bulk_load(self) -> None: ...
+
+    def end_bulk_load(self) -> None: ...
+
+
+class LocalVectorBulkWriter:
+    """Bulk writer for the local vector store, where a batch is written whole or not at all."""
+
+    def __init__(self, vector_store: LocalVectorStore):
+        self.vector_store = vector_store
 
+    def write(self, nodes: List[BaseNode]) -> List[str]:
+        try:
+            self.vector_store.add(nodes=nodes)
+            return []
+        except Exception as e:
+            LOG.warning(f"Local vector store write of {len(nodes)} nodes failed: {str(e)}")
+            return [node.node_id for node in nodes]
 
-def initiate_opensearch_vector_client() -> OpensearchVectorClient:
+    def existing_ids(self, node_ids: List[str]) -> Set[str]:
+        return self.vector_store.existing_ids(node_ids=node_ids)
+
+    def count(self, node_ids: Optional[List[str]] = None) -> int:
+        if node_ids is None:
+            return self.vector_store.count()
+        return len(self.vector_store.existing_ids(node_ids=node_ids))
+
+    def begin_bulk_load(self):
+        pass
+
+    def end_bulk_load(self):
+        pass
+
+
+class OpensearchBulkWriter:
+    """Bulk writer for the OpenSearch index, writing documents in the shape OpensearchVectorStore reads.
+
+    Unlike OpensearchVectorStore.add, a failed document does not fail its whole batch and no refresh is
+    forced per batch. begin_bulk_load() turns refresh off and drops replicas for a full load; end_bulk_load()
+    restores the previous settings and refreshes once.
     """
-    Initialize the OpenSearch client with the provided configuration.
+
+    def __init__(self, os_client: 'OpenSearch', vector_client: 'OpensearchVectorClient', index: str):
+        self.os_client = os_client
+        self.vector_client = vector_client
+        self.index = index
+        self._saved_settings: Optional[Dict[str, Any]] = None
+
+    def write(self, nodes: List[BaseNode]) -> List[str]:
+        from opensearchpy.helpers import streaming_bulk
+        from llama_index.core.schema import MetadataMode
+        from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+        # Creates the index with the k-NN mapping on first use, as OpensearchVectorStore.add would
+        self.vector_client._ensure_initialized()
+        id_field: str = "id" if self.vector_client.is_aoss else "_id"
+        actions = (
+            {
+                "_op_type": "index",
+                "_index": self.index,
+                id_field: node.node_id,
+                "embedding": node.get_embedding(),
+                "content": node.get_content(metadata_mode=MetadataMode.NONE),
+                "metadata": node_to_metadata_dict(node, remove_text=True)
+            }
+            for node in nodes
+        )
+        failed_ids: List[str] = []
+        for ok, item in streaming_bulk(
+            self.os_client, actions, chunk_size=max(len(nodes), 1), max_chunk_bytes=VECTOR_BULK_MAX_CHUNK_BYTES,
+            raise_on_error=False, raise_on_exception=False
+        ):
+            if not ok:
+                result: Dict[str, Any] = next(iter(item.values()))
+                failed_ids.append(result.get("_id") or result.get("id"))
+                LOG.warning(f"Indexing node {failed_ids[-1]} failed with status {result.get('status')}: {result.get('error')}")
+        return failed_ids
+
+    def existing_ids(self, node_ids: List[str]) -> Set[str]:
+        found: Set[str] = set()
+        for i in range(0, len(node_ids), 1000):
+            response: Dict[str, Any] = self.os_client.mget(index=self.index, body={"ids": node_ids[i:i+1000]}, _source=False)
+            found.update(document["_id"] for document in response["docs"] if document.get("found"))
+        return found
+
+    def count(self, node_ids: Optional[List[str]] = None) -> int:
+        # Creates the index on first use, so a new deployment counts as empty
+        self.vector_client._ensure_initialized()
+        if not self.vector_client.is_aoss:
+            self.os_client.indices.refresh(index=self.index)
+        if node_ids is None:
+            return self.os_client.count(index=self.index)["count"]
+        return sum(
+            self.os_client.count(index=self.index, body={"query": {"ids": {"values": node_ids[i:i+10000]}}})["count"]
+            for i in range(0, len(node_ids), 10000)
+        )
+
+    def begin_bulk_load(self):
+        if self.vector_client.is_aoss:
+            return  # serverless collections manage refresh and replicas themselves
+        self.vector_client._ensure_initialized()
+        settings: Dict[str, Any] = self.os_client.indices.get_settings(
+            index=self.index, name="index.refresh_interval,index.number_of_replicas"
+        )[self.index]["settings"].get("index", {})
+        # A setting that was never set explicitly is restored to null, i.e. back to the cluster default
+        self._saved_settings = {
+            "refresh_interval": settings.get("refresh_interval"),
+            "number_of_replicas": settings.get("number_of_replicas")
+        }
+        self.os_client.indices.put_settings(index=self.index, body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+        LOG.info(f"Bulk load of {self.index}: refresh off and replicas at 0 (was {self._saved_settings})")
+
+    def end_bulk_load(self):
+        if self._saved_settings is None:
+            return
+        self.os_client.indices.put_settings(index=self.index, body={"index": self._saved_settings})
+        self.os_client.indices.refresh(index=self.index)
+        LOG.info(f"Bulk load of {self.index} finished: restored {self._saved_settings}")
+        self._saved_settings = None
+
+
+def initiate_opensearch_client() -> 'OpenSearch':
     """
+    Initialize the OpenSearch client with a pooled urllib3 connection, reusing keep-alive TLS sessions across requests.
+    """
+    # The OpenSearch stack is only imported when that backend is used
+    from opensearchpy import OpenSearch, Urllib3HttpConnection
+
     LOG.info("Initializing OpenSearch client")
-    client: OpenSearch = OpenSearch(
+    return OpenSearch(
         hosts=[{'host': OPENSEAERCH_ENDPOINT, 'port': 443}],
         http_auth=(OS_CREDS[0], OS_CREDS[1]),
         use_ssl=True,
         verify_certs=True,
         ssl_show_warn=False,
-        timeout=60,
-        max_retries=3, 
-        retry_on_timeout=True,  
-        connection_class=RequestsHttpConnection
+        timeout=config.env_config.OS_TIMEOUT_SECONDS,
+        max_retries=config.env_config.OS_MAX_RETRIES,
+        retry_on_timeout=True,
+        pool_maxsize=config.env_config.OS_POOL_MAXSIZE,
+        connection_class=Urllib3HttpConnection
     )
 
-    return OpensearchVectorClient(os_client=client, dim=1536, index=INDEX, endpoint=OPENSEAERCH_ENDPOINT)
+
+def initiate_opensearch_vector_client() -> 'OpensearchVectorClient':
+    """
+    Initialize the llama_index OpenSearch vector client on top of the shared OpenSearch client.
+    """
+    from llama_index.vector_stores.opensearch import OpensearchVectorClient
+
+    return OpensearchVectorClient(os_client=registry.get("opensearch"), dim=EMBEDDING_DIMENSIONS, index=INDEX, endpoint=OPENSEAERCH_ENDPOINT)
+
+
+def initiate_local_vector_store() -> LocalVectorStore:
+    LOG.info("Initializing local vector store at %s", LOCAL_VECTOR_STORE_DIR)
+    return LocalVectorStore(directory=LOCAL_VECTOR_STORE_DIR, index=INDEX, dim=EMBEDDING_DIMENSIONS)
 
 
-def get_opensearch_vector_store() -> OpensearchVectorStore:
+def initiate_lexical_index() -> LexicalIndex:
+    LOG.info("Initializing lexical index at %s", LEXICAL_INDEX_DIR)
+    return LexicalIndex(directory=LEXICAL_INDEX_DIR, index=INDEX)
+
+
+def warm_opensearch_client(client: 'OpenSearch'):
+    """Open a pooled connection to the cluster with a ping."""
+    client.ping()
+
+
+def get_opensearch_vector_store() -> 'OpensearchVectorStore':
     """
     Get an OpenSearch vector store instance for the specified index.
     """
-    return OpensearchVectorStore(client=os_client)
+    from llama_index.vector_stores.opensearch import OpensearchVectorStore
+
+    return OpensearchVectorStore(client=registry.get("opensearch_vector"))
+
+
+def get_local_vector_store() -> LocalVectorStore:
+    """
+    Get the in-process NumPy vector store for the configured index.
+    """
+    return registry.get("local_vector_store")
+
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    Get the in-process BM25 index for the configured index.
+    """
+    return registry.get("lexical_index")
+
+
+def get_vector_store() -> VectorBackend:
+    """
+    Get the vector store selected by the VECTOR_BACKEND setting.
+    """
+    if VECTOR_BACKEND == 'local':
+        return get_local_vector_store()
+    if VECTOR_BACKEND == 'opensearch':
+        return get_opensearch_vector_store()
+    raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+
+
+def get_vector_bulk_writer() -> VectorBulkWriter:
+    """
+    Get a bulk writer for the vector store selected by the VECTOR_BACKEND setting.
+    """
+    if VECTOR_BACKEND == 'local':
+        return LocalVectorBulkWriter(vector_store=get_local_vector_store())
+    if VECTOR_BACKEND == 'opensearch':
+        return OpensearchBulkWriter(os_client=registry.get("opensearch"), vector_client=registry.get("opensearch_vector"), index=INDEX)
+    raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+
 
-os_client: OpensearchVectorClient = initiate_opensearch_vector_client()
\ No newline at end of file
+registry.register("opensearch", initiate_opensearch_client, warmup=warm_opensearch_client)
+registry.register("opensearch_vector", initiate_opensearch_vector_client)
+registry.register("local_vector_store", initiate_local_vector_store)
+registry.register("lexical_index", initiate_lexical_index)
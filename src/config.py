@@ -4,18 +4,99 @@ import os
 class Config:
     """Base configuration class."""
     APP_NAME = 'bibleRag'
+    APP_ROLE = os.environ.get('APP_ROLE', 'all')  # 'query' serves questions and prompts, 'ingest' runs ingestion jobs, 'all' does both
     DB_NAME = ""
     LOG_LOCATION = 'src/logs'
     BIBLE_VERSION = ''
     OPEN_AI_API_KEY = ''
     OPEN_AI_MODEL = ''
     OPEN_AI_EMBEDDING_MODEL = ''
+    OPEN_AI_EMBEDDING_DIMENSIONS = 1536
+    OPEN_AI_TIMEOUT_SECONDS = 60
+    OPEN_AI_MAX_RETRIES = 2
+    OPEN_AI_MAX_CONNECTIONS = 100
+    OPEN_AI_MAX_KEEPALIVE_CONNECTIONS = 20
+    OPEN_AI_KEEPALIVE_EXPIRY_SECONDS = 30
+    OPEN_AI_EMBEDDING_REQUESTS_PER_MINUTE = 3000  # starting budgets; replaced by the x-ratelimit-limit-* response headers
+    OPEN_AI_EMBEDDING_TOKENS_PER_MINUTE = 1000000
+    OPEN_AI_CHAT_REQUESTS_PER_MINUTE = 500
+    OPEN_AI_CHAT_TOKENS_PER_MINUTE = 200000
+    OPEN_AI_RATE_LIMIT_HEADROOM = 0.1  # stop raising concurrency when less than this fraction of a budget remains
+    OPEN_AI_RATE_LIMIT_MAX_ATTEMPTS = 6
+    EMBEDDING_BATCH_MAX_INPUTS = 2048  # OpenAI limit on inputs per embeddings request
+    EMBEDDING_BATCH_MAX_TOKENS = 250000  # kept under the 300k tokens per request limit
+    EMBEDDING_MAX_INPUT_TOKENS = 8191
+    EMBEDDING_BATCH_WORKERS = 16  # most embedding requests in flight; the adaptive limit stays at or below it
+    EMBEDDING_INITIAL_CONCURRENCY = 4
+    CHAT_INITIAL_CONCURRENCY = 16
+    CHAT_MAX_CONCURRENCY = 64
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_DIR = 'src/cache/embeddings'
+    EMBEDDING_CACHE_MAX_ENTRIES = 100000
+    EMBEDDING_CACHE_FLUSH_SECONDS = 30  # the writer flushes new entries to disk at most this often, and at exit
+    EMBEDDING_CACHE_REFRESH_SECONDS = 5  # read-only processes pick up the writer's new entries at most this often
+    QUERY_EMBEDDING_CACHE_SIZE = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS = 3600
+    QUERY_EXECUTOR_WORKERS = 32
+    QUERY_STEP_TIMEOUT_SECONDS = {'chat_history': 5, 'prompts': 5, 'embedding': 10, 'retrieval': 15, 'stored_embeddings': 2}
+    DIRECT_LOOKUP_ENABLED = True  # answer explicit chapter/verse references from the verse index, skipping embedding and k-NN
+    DIRECT_LOOKUP_MAX_VERSES = 80  # larger passages fall back to semantic retrieval; smaller ones reach the prompt whole
+    VERSE_CACHE_SIZE = 1200  # chapters held in memory; the KJV has 1,189
+    VERSE_CACHE_TTL_SECONDS = 3600
+    CONTEXT_TOKEN_BUDGET = 3000  # tokens of retrieved scripture packed into the prompt
+    CONTEXT_MIN_CHUNKS = 2
+    CONTEXT_MAX_CHUNKS = 8
+    CONTEXT_RELATIVE_SCORE_FLOOR = 0.8  # keep chunks scoring at least this fraction of the best score
+    CONTEXT_MMR_LAMBDA = 0.7  # 1.0 ranks purely by relevance, lower values favour diverse chunks
+    CONTEXT_DUPLICATE_SIMILARITY = 0.97  # chunks this similar to one already chosen are dropped
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_MAX_ENTRIES = 5000
+    ANSWER_CACHE_TTL_SECONDS = 86400
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
     MONGO_CERT_PATH = ""
     MONGO_CHAT_COLLECTION = "chats"
+    CHAT_HISTORY_WRITE_BEHIND = False
     MONGO_PROMPT_COLLECTION = "prompts"
+    MONGO_PROMPT_STAMP_COLLECTION = "prompt_stamps"
+    MONGO_JOB_COLLECTION = "ingestion_jobs"
+    PROMPT_CACHE_STAMP_CHECK_SECONDS = 30
     MONGO_URI = ""
+    MONGO_MAX_POOL_SIZE = 100
+    MONGO_MIN_POOL_SIZE = 0
+    MONGO_MAX_IDLE_TIME_MS = 300000  # idle pooled connections are closed after this long
+    MONGO_CONNECT_TIMEOUT_MS = 5000
+    MONGO_SOCKET_TIMEOUT_MS = 30000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = 10000
     OS_ENDPOINT = ""
     OS_CREDS = ['', '']
+    OS_POOL_MAXSIZE = 32  # keep-alive connections per OpenSearch host; size to the query executor
+    OS_TIMEOUT_SECONDS = 60
+    OS_MAX_RETRIES = 3
+    VECTOR_BULK_BATCH_SIZE = 100  # nodes per bulk request to the vector index
+    VECTOR_BULK_WORKERS = 4  # bulk requests in flight at once
+    VECTOR_BULK_MAX_ATTEMPTS = 3  # individual retries for each node that failed in a bulk request
+    VECTOR_BULK_MAX_CHUNK_BYTES = 10 * 1024 * 1024
+    WARMUP_CLIENTS = []  # clients built and probed at startup, e.g. ['openai', 'mongo', 'opensearch']
+    PDF_EXTRACTION_WORKERS = os.cpu_count() or 1
+    INGEST_BATCH_SIZE = 64  # pages per batch flowing through the ingestion pipeline
+    INGEST_QUEUE_SIZE = 2  # batches buffered between pipeline stages
+    INGEST_JOB_WORKERS = 1
+    DOCUMENT_BULK_WRITE_BATCH_SIZE = 500
+    DOCUMENT_EMBEDDING_FORMAT = 'float32'  # 'float32' or 'int8' BSON binary vectors, 'array' of doubles, or 'none' to leave embeddings out
+    CHUNK_MAX_TOKENS = 256  # token budget when packing verses into a chunk
+    CHUNK_OVERLAP_VERSES = 0  # trailing verses repeated at the start of the next chunk in a chapter
+    CHUNK_TOKEN_CEILING = 512  # hard limit enforced by postprocessing, e.g. for a single very long verse
+    INGEST_JOB_HISTORY = 50  # finished jobs kept in memory for status lookups
+    INGEST_JOB_PERSIST_SECONDS = 2  # minimum interval between job progress writes to Mongo
+    PDF_FIRST_BOOK_PAGE_INDEX = 74  # the first book of the KJV PDF starts at this page index
+    VECTOR_BACKEND = 'opensearch'  # 'opensearch' or 'local'
+    LOCAL_VECTOR_STORE_DIR = 'src/cache/vectors'
+    LEXICAL_INDEX_DIR = 'src/cache/lexical'
+    RETRIEVAL_MODE = 'vector'  # 'vector', 'lexical' (BM25) or 'hybrid' (reciprocal rank fusion of both)
+    RETRIEVAL_RRF_K = 60
+    LEXICAL_FALLBACK_ENABLED = True  # serve BM25 results when query embedding or vector search fails
+    METRICS_ENABLED = True  # Prometheus text format at /<version>/metrics
+    SERVER_TIMING_ENABLED = False  # add a Server-Timing header with the per-stage breakdown of each request
 
 
 class LocalConfig(Config):
@@ -17,10 +17,34 @@ def create_app() -> Flask:
     flask_app: Flask = Flask(__name__, static_url_path=url_prefix + '/static', static_folder='static')
     flask_app.config.from_object(env_config)
 
-    from src.routes.rag_routes import rag
-    flask_app.register_blueprint(rag, url_prefix=url_prefix)
+    register_blueprints(flask_app=flask_app, url_prefix=url_prefix, role=env_config.APP_ROLE)
 
-    from src.routes.prompting_routes import prompting
-    flask_app.register_blueprint(prompting, url_prefix=url_prefix)
+    from src.clients.client_registry import registry
+    registry.warmup(config.env_config.WARMUP_CLIENTS)
 
-    return flask_app
\ No newline at end of file
+    return flask_app
+
+
+def register_blueprints(flask_app: Flask, url_prefix: str, role: str):
+    """Register the routes served by this role, so query workers never import ingestion code and vice versa."""
+    if role not in ('all', 'query', 'ingest'):
+        raise ValueError(f"Unknown app role: {role}")
+    LOG.info("Registering routes for app role: %s", role)
+
+    from src.routes.health_routes import health
+    flask_app.register_blueprint(health, url_prefix=url_prefix)
+
+    if config.env_config.METRICS_ENABLED:
+        from src.routes.metrics_routes import metrics
+        flask_app.register_blueprint(metrics, url_prefix=url_prefix)
+
+    if role in ('all', 'query'):
+        from src.routes.rag_routes import rag
+        flask_app.register_blueprint(rag, url_prefix=url_prefix)
+
+        from src.routes.prompting_routes import prompting
+        flask_app.register_blueprint(prompting, url_prefix=url_prefix)
+
+    if role in ('all', 'ingest'):
+        from src.routes.ingestion_routes import ingestion
+        flask_app.register_blueprint(ingestion, url_prefix=url_prefix)
@@ -1,22 +1,40 @@
+import json
 from flask import Request, Response
 from pydantic import BaseModel, Field
-from typing import Any, Optional, Dict, List
+from pydantic.dataclasses import dataclass as pydantic_dataclass
+from typing import TYPE_CHECKING, Any, Optional, Dict, List
 from werkzeug.datastructures import FileStorage
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
+if TYPE_CHECKING:
+    from llama_index.core.llms import ChatMessage
+    from llama_index.core.vector_stores.types import VectorStoreQueryResult
+
+@dataclass
+class VerseSegment:
+    """A verse, or text continued from the previous page, located by character offsets within the page text."""
+    book: Optional[str]
+    chapter: Optional[int]
+    verse: Optional[int]
+    text: str
+    start: int
+    end: int
+
+
 @dataclass
 class RawDocument:
     """Represents a raw document with its content and metadata."""
     doc_id: str = Field(..., description="Unique identifier for the document")
     doc_data: str = Field(..., description="Content of the document")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Metadata associated with the document")
+    verse_segments: List[VerseSegment] = field(default_factory=list)
 
-@dataclass
+@pydantic_dataclass
 class BibleReference:
     """Represents a reference to a Bible verse or passage."""
     book: str = Field(..., description="Book of the Bible")
-    chapter: Optional[int] = Field(..., description="Chapter number")
+    chapter: Optional[int] = Field(None, description="Chapter number")
     verse: Optional[int] = Field(None, description="Verse number (optional for ranges)")
     end_verse: Optional[int] = Field(None, description="End verse number (for ranges)")
 
@@ -30,6 +48,7 @@ class BibleRequest:
     files: Optional[List[FileStorage]] = Field(None, description="List of files to be processed")
     qna: bool = Field(False, description="Flag to indicate if the request is for a Q&A process")
     session_id: Optional[str] = Field(..., description="Session ID for tracking the request")
+    retrieval_mode: Optional[str] = Field(None, description="Retrieval mode override: 'vector', 'lexical' or 'hybrid'")
 
     @classmethod
     def from_request(cls, request: Request, qna: bool) -> 'BibleRequest':
@@ -42,15 +61,76 @@ class BibleRequest:
                 bible_references=[
                     BibleReference(**ref) for ref in data.get('bible_references', [])
                 ],
-                session_id=data.get('session_id', None)
+                session_id=data.get('session_id', None),
+                retrieval_mode=data.get('retrieval_mode', None)
             )
         else: 
             data = request.form
             return cls(
                 version=data['version'],
-                files=request.files.getlist('files') if 'files' in request.files else []
+                files=request.files.getlist('files') if 'files' in request.files else [],
+                retrieval_mode=None
             )
     
+@dataclass
+class QueryContext:
+    """Everything gathered for a query before the LLM call."""
+    chat_history: List['ChatMessage']
+    query_embedding: Optional[List[float]] = None
+    cached_answer: Optional[str] = None
+    top_k_results: Optional['VectorStoreQueryResult'] = None
+    prompts: Optional[Dict[str, Dict]] = None
+
+
+@dataclass
+class StageProgress:
+    """Items and busy time recorded for one ingestion stage."""
+    items: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class IngestionJob:
+    """Represents a background ingestion job and its progress."""
+    job_id: str
+    version: str
+    files: List[str]
+    status: str = "QUEUED"
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, StageProgress] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        """Serialize the job with elapsed time and per-stage throughput."""
+        end: float = self.finished_at or now
+        elapsed: float = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "version": self.version,
+            "files": self.files,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {
+                name: {
+                    "items": progress.items,
+                    "batches": progress.batches,
+                    "busy_seconds": round(progress.seconds, 3),
+                    "items_per_second": round(progress.items / elapsed, 2) if elapsed else 0.0
+                }
+                for name, progress in self.stages.items()
+            },
+            "pages_per_second": round(self.stages["extract"].items / elapsed, 2) if elapsed and "extract" in self.stages else 0.0,
+            "embeddings_per_second": round(self.stages["embed"].items / elapsed, 2) if elapsed and "embed" in self.stages else 0.0,
+            "errors": self.errors
+        }
+
+
 @dataclass
 class BibleResponse(Response):
     """Represents a response containing Bible-related data."""
@@ -73,14 +153,23 @@ class BibleResponse(Response):
         """Create a not foudn response."""
         return {"status": status, "message": message}, code
 
+    @staticmethod
+    def event(event: str, data: object) -> str:
+        """Format a Server-Sent Event with a JSON payload."""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 class BibleMetadata(BaseModel):
     book: Optional[str] = Field(None, description="Book of the Bible")
     chapter: Optional[int] = Field(None, description="Chapter number")
     verses: Optional[List[int]] = Field([], description="Verse numbers (optional for ranges)")
+    verse_start: Optional[int] = Field(None, description="First verse number in the chunk")
+    verse_end: Optional[int] = Field(None, description="Last verse number in the chunk")
+    token_count: Optional[int] = Field(None, description="Tokens in the chunk text")
     version: Optional[str] = Field(None, description="Bible version")
     bible_page_number: Optional[int] = Field(None, description="Page number in the Bible document")
     pdf_page_number: Optional[int] = Field(None, description="PDF page number where the text is located")
+    source_file: Optional[str] = Field(None, description="Uploaded file the page came from, set when several files are ingested together")
 
     def to_dict(self) -> Dict[str, Any]:
         return self.model_dump(exclude_none=True)
@@ -0,0 +1,15 @@
+import logging
+from flask import Blueprint
+from src import config
+from src.models import BibleResponse
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up ROUTES - {__name__}")
+
+health = Blueprint('health', __name__)
+
+
+@health.route('/health', methods=['GET'])
+def get_health() -> BibleResponse:
+    """Liveness check that touches no backing service, also used to time the first request after startup."""
+    return BibleResponse.success(status="SUCCESS", message="OK", data={"role": config.env_config.APP_ROLE})
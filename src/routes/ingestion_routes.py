@@ -0,0 +1,47 @@
+import logging
+from flask import Blueprint, request
+from typing import Dict, Optional
+from src.models import BibleRequest, BibleResponse, IngestionJob
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up ROUTES - {__name__}")
+
+ingestion = Blueprint('ingestion', __name__)
+
+
+@ingestion.route('initiate', methods=['POST'])
+def initiate_rag() -> BibleResponse:
+    """Submit a background ingestion job for the provided documents."""
+    from src.service.job_service import submit_ingestion_job
+
+    bible_request: BibleRequest = BibleRequest.from_request(request=request, qna=False)
+
+    try:
+        if not bible_request.files:
+            return BibleResponse.failure("FAILURE", "No files provided for ingestion", code=400)
+
+        job: IngestionJob = submit_ingestion_job(bible_request=bible_request)
+        return BibleResponse.success(
+            status="ACCEPTED",
+            message="RAG ingestion job submitted",
+            data={"version": bible_request.version, "job_id": job.job_id},
+            code=202
+        )
+    except Exception as e:
+        LOG.error("Error initiating RAG: %s", str(e))
+        return BibleResponse.failure("error", "Failed to initiate RAG process")
+
+
+@ingestion.route('initiate/<job_id>', methods=['GET'])
+def get_ingestion_job_status(job_id: str) -> BibleResponse:
+    """Report the status, per-stage progress, throughput and errors of an ingestion job."""
+    from src.service.job_service import get_ingestion_job
+
+    try:
+        job_status: Optional[Dict] = get_ingestion_job(job_id=job_id)
+        if job_status is None:
+            return BibleResponse.not_found(status="NOT_FOUND", message=f"No ingestion job found with id: {job_id}")
+        return BibleResponse.success(status="SUCCESS", message="Ingestion job status retrieved", data=job_status)
+    except Exception as e:
+        LOG.error("Error retrieving ingestion job %s: %s", job_id, str(e))
+        return BibleResponse.failure("error", "Failed to retrieve ingestion job status")
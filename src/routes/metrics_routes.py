@@ -0,0 +1,51 @@
+import logging
+import time
+from flask import Blueprint, Response, g, request
+from src import config
+from src.service.metrics_service import (
+    http_request_duration_seconds, http_requests_in_flight, render_metrics,
+    start_request_timings, get_request_timings, end_request_timings
+)
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up ROUTES - {__name__}")
+
+metrics = Blueprint('metrics', __name__)
+SERVER_TIMING_ENABLED: bool = config.env_config.SERVER_TIMING_ENABLED
+
+
+@metrics.route('/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    """Expose latency histograms, token counters, cache statistics and in-flight gauges in Prometheus text format."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@metrics.before_app_request
+def start_request_metrics():
+    g.metrics_endpoint = request.endpoint or "unmatched"
+    g.metrics_started = time.perf_counter()
+    g.metrics_timings_token = start_request_timings()
+    http_requests_in_flight.inc(endpoint=g.metrics_endpoint)
+
+
+@metrics.after_app_request
+def add_server_timing(response: Response) -> Response:
+    g.metrics_status = response.status_code
+    if SERVER_TIMING_ENABLED and get_request_timings() is not None:
+        response.headers["Server-Timing"] = get_request_timings().server_timing()
+    return response
+
+
+@metrics.teardown_app_request
+def finish_request_metrics(error=None):
+    """Runs once the response is complete, so streamed answers are timed to their last event."""
+    started: float = g.pop("metrics_started", None)
+    if started is None:
+        # A streamed response's context is torn down a second time once its generator finishes
+        return
+    http_requests_in_flight.dec(endpoint=g.metrics_endpoint)
+    http_request_duration_seconds.observe(
+        time.perf_counter() - started,
+        endpoint=g.metrics_endpoint, method=request.method, status=g.get("metrics_status", 500)
+    )
+    end_request_timings(g.pop("metrics_timings_token"))
@@ -2,7 +2,6 @@ import logging
 from typing import Dict
 from flask import Blueprint, request
 from src.models import BibleResponse, Prompt
-from src.service.prompting_service import store_prompts, get_prompts
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up ROUTES - {__name__}")
@@ -13,6 +12,8 @@ prompting = Blueprint('prompting', __name__)
 
 @prompting.route('/prompting/addContextPrompts', methods=['POST'])
 def add_context() -> BibleResponse:
+    from src.service.prompting_service import store_prompts
+
     try:
         store_prompts(prompts=Prompt.from_request(request=request))
         return BibleResponse.success(
@@ -29,6 +30,8 @@ def add_context() -> BibleResponse:
 
 @prompting.route('/prompting/getContextPrompts', methods=['GET'])
 def get_context_prompts() -> BibleResponse:
+    from src.service.prompting_service import get_prompts
+
     version: str = request.get_json()["version"]
 
     try:
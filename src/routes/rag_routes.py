@@ -1,78 +1,41 @@
 import logging
-import concurrent.futures
 import uuid
-from flask import Blueprint, request
-from typing import List
-from llama_index.core.schema import BaseNode, TextNode
-from llama_index.core.vector_stores.types import VectorStoreQueryResult
-from src.models import RawDocument, BibleRequest, BibleResponse
-from src.service.document_service import process_documents, store_bible_nodes_in_document_db
-from src.service.indexing_service import chunk_all_documents
-from src.service.postprocessing_service import identify_ceiling_exceeding_nodes, chunk_ceiling_exceeding_nodes
-from src.service.embedding_service import embed_bible_nodes, store_embedded_bible_nodes_in_vector_db
-from src.service.retrieval_service import retrieve_top_k_query_results, generate_response_from_chunks
+from flask import Blueprint, Response, request, stream_with_context
+from typing import Iterator, List
+from src.models import BibleRequest, BibleResponse, QueryContext
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up ROUTES - {__name__}")
 
 rag = Blueprint('rag', __name__)
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
-
-
-@rag.route('initiate', methods=['POST'])
-def initiate_rag() -> BibleResponse:
-    """Initiate a RAG process with the provided documents."""
-    bible_request: BibleRequest = BibleRequest.from_request(request=request, qna=False)
-
-    try:
-        LOG.info("preprocessing stage for Bible version: %s STARTED", bible_request.version)
-        raw_bible: List[RawDocument] = process_documents(bible_request=bible_request)
-        LOG.info("Preprocessing stage for Bible version: %s COMPLETED", bible_request.version)
-
-        LOG.info("Indexing stage for Bible version: %s STARTED", bible_request.version)
-        chunked_bible_nodes: List[TextNode] = chunk_all_documents(raw_bible=raw_bible, version=bible_request.version)
-
-        LOG.info("Postprocessing stage for Bible version: %s STARTED", bible_request.version)
-        ceiling_exceeding_nodes, chunked_bible_nodes = identify_ceiling_exceeding_nodes(nodes=chunked_bible_nodes, version=bible_request.version)
-
-        if ceiling_exceeding_nodes:
-            LOG.info("Postprocessing stage: Chunking token ceiling exceeding nodes for Bible version: %s", bible_request.version)
-            truncated_nodes: List[BaseNode] = chunk_ceiling_exceeding_nodes(nodes=ceiling_exceeding_nodes, version=bible_request.version)
-            chunked_bible_nodes.extend(truncated_nodes)
-        LOG.info("Postprocessing stage: Chunking COMPLETED for Bible version: %s", bible_request.version)  
-
-        LOG.info("Embedding stage for Bible version: %s STARTED", bible_request.version)
-        embed_bible_nodes(processed_bible_nodes=chunked_bible_nodes, version=bible_request.version)
-        LOG.info("Embedding stage for Bible version: %s COMPLETED", bible_request.version)
-        LOG.info("Indexing stage for Bible version: %s COMPLETED", bible_request.version)
-
-        LOG.info("Storing stage for Bible version: %s STARTED", bible_request.version)
-        with executor:
-            futures = [
-                executor.submit(store_embedded_bible_nodes_in_vector_db, processed_bible_nodes=chunked_bible_nodes, version=bible_request.version),
-                executor.submit(store_bible_nodes_in_document_db, processed_bible_nodes=chunked_bible_nodes, version=bible_request.version)
-            ]
-            concurrent.futures.wait(futures)
-        LOG.info("Storing stage for Bible version: %s COMPLETED", bible_request.version)
-        
-        return BibleResponse.success(status="SUCCESS", message="RAG process initiated sucessfully", data={"version": bible_request.version})
-    except Exception as e:
-        LOG.error("Error initiating RAG: %s", str(e))
-        return BibleResponse.failure("error", "Failed to initiate RAG process")
 
 
 @rag.route('/query', methods=['POST'])
 def query_rag() -> BibleResponse:
     """Query the RAG system with a Bible request."""
+    from src.service.retrieval_service import prepare_query_context, generate_response_from_chunks
+    from src.service.chat_service import record_chat_turn
+    from src.service.answer_cache_service import cache_answer
+
     try:
         bible_request = BibleRequest.from_request(request=request, qna=True)
         LOG.info("Processing RAG query for version: %s", bible_request.version)
         
-        if bible_request.session_id is None:
+        is_new_session: bool = bible_request.session_id is None
+        query_context: QueryContext = prepare_query_context(bible_request=bible_request)
+        if is_new_session:
             bible_request.session_id = str(uuid.uuid4())
 
-        top_k_results: VectorStoreQueryResult = retrieve_top_k_query_results(bible_request=bible_request)
-        if not top_k_results:
+        if query_context.cached_answer:
+            LOG.info("Semantic answer cache hit for Bible version: %s", bible_request.version)
+            record_chat_turn(session_id=bible_request.session_id, query=bible_request.query, response=query_context.cached_answer, next_index=0)
+            return BibleResponse.success(
+                status="SUCCESS",
+                message="RAG query processed",
+                data=query_context.cached_answer,
+                session_id=bible_request.session_id)
+
+        if not query_context.top_k_results:
             return BibleResponse.not_found(
                 status="FAILED",
                 message=f"No relevant scripture found for {bible_request.query}"
@@ -80,7 +43,10 @@ def query_rag() -> BibleResponse:
         LOG.info(f"Retrieval stage for bible version: {bible_request.version} COMPLETED")
 
         response_text: str = generate_response_from_chunks(
-            bible_request=bible_request, chunks=top_k_results.nodes
+            bible_request=bible_request,
+            chunks=query_context.top_k_results.nodes,
+            chat_history=query_context.chat_history,
+            prompts=query_context.prompts
         )
 
         if not response_text:
@@ -88,6 +54,9 @@ def query_rag() -> BibleResponse:
                 status="FAILURE",
                 message=f"Failed to retrieve a response for the question: {bible_request.query}"
             )
+
+        if not query_context.chat_history:
+            cache_answer(bible_request=bible_request, query_embedding=query_context.query_embedding, answer=response_text)
         
         return BibleResponse.success(
             status="SUCCESS", 
@@ -96,4 +65,72 @@ def query_rag() -> BibleResponse:
             session_id=bible_request.session_id)
     except Exception as e:
         LOG.error("Error processing RAG query: %s", str(e))
-        return BibleResponse.failure("error", "Failed to process Bible query")
\ No newline at end of file
+        return BibleResponse.failure("error", "Failed to process Bible query")
+
+
+@rag.route('/query/stream', methods=['POST'])
+def stream_query_rag() -> Response:
+    """Query the RAG system and stream the answer as Server-Sent Events.
+    Emits a 'references' event with the retrieved chunk metadata, then 'token' events, then 'done'.
+    """
+    from src.service.retrieval_service import prepare_query_context, stream_response_from_chunks, get_reference_metadata
+    from src.service.chat_service import record_chat_turn
+    from src.service.answer_cache_service import cache_answer
+
+    try:
+        bible_request = BibleRequest.from_request(request=request, qna=True)
+        LOG.info("Processing streaming RAG query for version: %s", bible_request.version)
+
+        is_new_session: bool = bible_request.session_id is None
+        query_context: QueryContext = prepare_query_context(bible_request=bible_request)
+        if is_new_session:
+            bible_request.session_id = str(uuid.uuid4())
+
+        if not query_context.cached_answer:
+            if not query_context.top_k_results:
+                return BibleResponse.not_found(
+                    status="FAILED",
+                    message=f"No relevant scripture found for {bible_request.query}"
+                )
+            LOG.info(f"Retrieval stage for bible version: {bible_request.version} COMPLETED")
+    except Exception as e:
+        LOG.error("Error processing streaming RAG query: %s", str(e))
+        return BibleResponse.failure("error", "Failed to process Bible query")
+
+    def generate_events() -> Iterator[str]:
+        if query_context.cached_answer:
+            LOG.info("Semantic answer cache hit for Bible version: %s", bible_request.version)
+            yield BibleResponse.event("references", {"session_id": bible_request.session_id, "references": []})
+            yield BibleResponse.event("token", {"text": query_context.cached_answer})
+            record_chat_turn(session_id=bible_request.session_id, query=bible_request.query, response=query_context.cached_answer, next_index=0)
+            yield BibleResponse.event("done", {"status": "SUCCESS", "session_id": bible_request.session_id})
+            return
+
+        yield BibleResponse.event("references", {
+            "session_id": bible_request.session_id,
+            "references": get_reference_metadata(query_result=query_context.top_k_results)
+        })
+        response_parts: List[str] = []
+        try:
+            for token in stream_response_from_chunks(
+                bible_request=bible_request,
+                chunks=query_context.top_k_results.nodes,
+                chat_history=query_context.chat_history,
+                prompts=query_context.prompts
+            ):
+                response_parts.append(token)
+                yield BibleResponse.event("token", {"text": token})
+        except Exception as e:
+            LOG.error("Error streaming RAG response: %s", str(e))
+            yield BibleResponse.event("error", {"status": "FAILURE", "message": "Failed to process Bible query"})
+            return
+
+        if not query_context.chat_history and response_parts:
+            cache_answer(bible_request=bible_request, query_embedding=query_context.query_embedding, answer="".join(response_parts))
+        yield BibleResponse.event("done", {"status": "SUCCESS", "session_id": bible_request.session_id})
+
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
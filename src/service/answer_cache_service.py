@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from src import config
+from src.models import BibleRequest
+from src.clients.mongo_client import get_mongo_prompt_stamp_collection
+from src.service.metrics_service import register_cache_stats
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+ANSWER_CACHE_ENABLED: bool = config.env_config.ANSWER_CACHE_ENABLED
+STAMP_CHECK_SECONDS: float = config.env_config.PROMPT_CACHE_STAMP_CHECK_SECONDS
+Generation = Tuple[int, int]
+Scope = Tuple[str, Generation, Tuple[Tuple[Any, ...], ...]]
+
+
+@dataclass
+class CachedAnswer:
+    """A previously generated answer and the normalized embedding of its question."""
+    question: str
+    answer: str
+    embedding: np.ndarray
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """Answer cache matched by cosine similarity of question embeddings.
+
+    Entries are partitioned by scope (version, generation and Bible reference filter) so an answer
+    is only reused for the same slice of scripture, prompts and ingested text. Entries expire after ttl_seconds and the
+    least recently used entry is evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: "OrderedDict[Tuple[Scope, int], CachedAnswer]" = OrderedDict()
+        self._scope_entry_ids: Dict[Scope, List[int]] = {}
+        self._scope_matrices: Dict[Scope, np.ndarray] = {}
+        self._next_entry_id: int = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, scope: Scope, query_embedding: Sequence[float]) -> Optional[CachedAnswer]:
+        """Return the most similar live answer in scope if it passes the similarity threshold."""
+        with self._lock:
+            self._expire(scope)
+            entry_ids: List[int] = self._scope_entry_ids.get(scope, [])
+            if not entry_ids:
+                self.misses += 1
+                return None
+
+            similarities: np.ndarray = self._scope_matrix(scope) @ normalize_embedding(query_embedding)
+            best_index: int = int(np.argmax(similarities))
+            if similarities[best_index] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_key: Tuple[Scope, int] = (scope, entry_ids[best_index])
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            LOG.debug(f"Semantic answer cache hit with similarity {similarities[best_index]:.4f}")
+            return self._entries[entry_key]
+
+    def store(self, scope: Scope, question: str, answer: str, query_embedding: Sequence[float]):
+        with self._lock:
+            entry_id: int = self._next_entry_id
+            self._next_entry_id += 1
+            self._entries[(scope, entry_id)] = CachedAnswer(
+                question=question,
+                answer=answer,
+                embedding=normalize_embedding(query_embedding),
+                expires_at=time.monotonic() + self.ttl_seconds
+            )
+            self._scope_entry_ids.setdefault(scope, []).append(entry_id)
+            self._scope_matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                (evicted_scope, evicted_id), _ = self._entries.popitem(last=False)
+                self._remove_from_scope(evicted_scope, evicted_id)
+
+    def clear(self, version: str):
+        """Drop every answer cached for a version."""
+        with self._lock:
+            for scope in [scope for scope in self._scope_entry_ids if scope[0] == version.casefold()]:
+                for entry_id in self._scope_entry_ids.pop(scope):
+                    del self._entries[(scope, entry_id)]
+                self._scope_matrices.pop(scope, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "name": "semantic_answer",
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _scope_matrix(self, scope: Scope) -> np.ndarray:
+        matrix: Optional[np.ndarray] = self._scope_matrices.get(scope)
+        if matrix is None:
+            matrix = np.stack([self._entries[(scope, entry_id)].embedding for entry_id in self._scope_entry_ids[scope]])
+            self._scope_matrices[scope] = matrix
+        return matrix
+
+    def _expire(self, scope: Scope):
+        now: float = time.monotonic()
+        for entry_id in list(self._scope_entry_ids.get(scope, [])):
+            if self._entries[(scope, entry_id)].expires_at < now:
+                del self._entries[(scope, entry_id)]
+                self._remove_from_scope(scope, entry_id)
+
+    def _remove_from_scope(self, scope: Scope, entry_id: int):
+        entry_ids: List[int] = self._scope_entry_ids[scope]
+        entry_ids.remove(entry_id)
+        self._scope_matrices.pop(scope, None)
+        if not entry_ids:
+            del self._scope_entry_ids[scope]
+
+
+def normalize_embedding(embedding: Sequence[float]) -> np.ndarray:
+    vector: np.ndarray = np.asarray(embedding, dtype=np.float32)
+    norm: float = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CachedGeneration:
+    """A version's prompt and ingest stamps as last read from the stamp collection."""
+    generation: Generation
+    checked_at: float
+
+
+_generations: Dict[str, CachedGeneration] = {}
+_generations_lock = threading.Lock()
+
+
+def get_answer_generation(version: str) -> Generation:
+    """Get the version's (prompt stamp, ingest stamp), re-read every PROMPT_CACHE_STAMP_CHECK_SECONDS.
+    Answers cached under an older generation are dropped once a prompt update or re-ingest made
+    through another worker is seen.
+    """
+    with _generations_lock:
+        cached_generation: Optional[CachedGeneration] = _generations.get(version)
+    now: float = time.monotonic()
+    if cached_generation and now - cached_generation.checked_at < STAMP_CHECK_SECONDS:
+        return cached_generation.generation
+
+    stamp_document: Dict = get_mongo_prompt_stamp_collection().find_one(
+        {"_id": version}, {"stamp": 1, "ingest_stamp": 1}
+    ) or {}
+    generation: Generation = (stamp_document.get("stamp", 0), stamp_document.get("ingest_stamp", 0))
+    if cached_generation and cached_generation.generation != generation:
+        LOG.info(f"Answer cache generation changed for Bible version {version}; dropping cached answers")
+        answer_cache.clear(version=version)
+    with _generations_lock:
+        _generations[version] = CachedGeneration(generation=generation, checked_at=now)
+    return generation
+
+
+def bump_ingest_stamp(version: str):
+    """Increment the version's ingest stamp so every worker drops answers built from the previous text."""
+    get_mongo_prompt_stamp_collection().update_one({"_id": version}, {"$inc": {"ingest_stamp": 1}}, upsert=True)
+
+
+def clear_cached_answers(version: str):
+    """Drop this process's answers for a version and re-read its generation on the next lookup."""
+    with _generations_lock:
+        _generations.pop(version, None)
+    answer_cache.clear(version=version)
+
+
+def get_answer_cache_scope(bible_request: BibleRequest) -> Scope:
+    """Scope answers by Bible version, its current generation and the exact reference filter of the request."""
+    references: Tuple[Tuple[Any, ...], ...] = tuple(sorted(
+        (reference.book.casefold(), reference.chapter, reference.verse, reference.end_verse)
+        for reference in bible_request.bible_references or []
+    ))
+    return bible_request.version.casefold(), get_answer_generation(version=bible_request.version), references
+
+
+def get_cached_answer(bible_request: BibleRequest, query_embedding: Sequence[float]) -> Optional[str]:
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    cached_answer: Optional[CachedAnswer] = answer_cache.lookup(
+        scope=get_answer_cache_scope(bible_request=bible_request), query_embedding=query_embedding
+    )
+    return cached_answer.answer if cached_answer else None
+
+
+def cache_answer(bible_request: BibleRequest, query_embedding: Optional[Sequence[float]], answer: str):
+    # Answers built from a direct verse lookup have no query embedding to match against
+    if not ANSWER_CACHE_ENABLED or query_embedding is None:
+        return
+    answer_cache.store(
+        scope=get_answer_cache_scope(bible_request=bible_request),
+        question=bible_request.query,
+        answer=answer,
+        query_embedding=query_embedding
+    )
+
+
+answer_cache: SemanticAnswerCache = SemanticAnswerCache(
+    max_entries=config.env_config.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.env_config.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=config.env_config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+)
+register_cache_stats(answer_cache.stats)
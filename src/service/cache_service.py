@@ -0,0 +1,76 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from src.service.metrics_service import register_cache_stats
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+class TTLCache:
+    """Thread-safe, bounded LRU cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        register_cache_stats(self.stats)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry: Optional[Tuple[float, Any]] = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user question so trivially different phrasings share a cache key."""
+    normalized_query: str = unicodedata.normalize("NFKC", query).casefold()
+    normalized_query = " ".join(normalized_query.split())
+    return TRAILING_PUNCTUATION.sub("", normalized_query)
@@ -1,32 +1,97 @@
 import logging
-from typing import Iterable, List
+import concurrent.futures
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 from llama_index.core.llms import ChatMessage, MessageRole
 from openai.types.chat import (
+    ChatCompletionAssistantMessageParam,
     ChatCompletionMessageParam,
     ChatCompletionSystemMessageParam,
     ChatCompletionUserMessageParam
 )
-from llama_index.storage.chat_store.mongo import MongoChatStore
-from src.clients.mongo_client import get_mongo_chat_store
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+from src import config
+from src.clients.mongo_client import get_mongo_chat_collection
+from src.service.metrics_service import span
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up service - {__name__}")
 
+CHAT_HISTORY_WRITE_BEHIND: bool = config.env_config.CHAT_HISTORY_WRITE_BEHIND
+MAX_APPEND_ATTEMPTS: int = 3
 
+# A single writer keeps write-behind appends in submission order
+history_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-history")
+
+
+@span("history_fetch")
 def get_chat_history(session_id: str) -> List[ChatMessage]:
-    mongo_chat_store: MongoChatStore = get_mongo_chat_store()
-    return mongo_chat_store.get_messages(key=session_id)
+    collection: Collection = get_mongo_chat_collection()
+    documents = collection.find({"session_id": session_id}, {"message": 1, "messages": 1, "_id": 0}).sort("index", 1)
+    chat_history: List[ChatMessage] = []
+    for document in documents:
+        # Turns are stored as one document; older history holds one message per document
+        for message in document.get("messages", [document.get("message")]):
+            chat_history.append(ChatMessage.model_validate(message))
+    return chat_history
+
+
+@span("history_write")
+def update_chat_history(session_id: str, chat_messages: List[ChatMessage], next_index: Optional[int] = None):
+    """Append messages to a session as a single document, so a turn is written whole or not at all.
+    The document's index is the position of its first message and count the number of messages it holds;
+    older MongoChatStore documents (one message each) stay readable alongside it.
+    """
+    collection: Collection = get_mongo_chat_collection()
+    messages: List[Dict] = [message.model_dump() for message in chat_messages]
+
+    for attempt in range(MAX_APPEND_ATTEMPTS):
+        if next_index is None or attempt > 0:
+            next_index = get_next_chat_index(collection=collection, session_id=session_id)
+        document: Dict = {
+            "session_id": session_id, "index": next_index, "count": len(messages), "messages": messages, "created_at": datetime.now()
+        }
+        try:
+            collection.insert_one(document)
+            return
+        except DuplicateKeyError:
+            # Another writer claimed this index and nothing of ours was written; retry the whole turn at the next free index
+            LOG.warning(f"Chat history index conflict for session {session_id}, retrying")
+
+    raise RuntimeError(f"Failed to append chat history for session {session_id} after {MAX_APPEND_ATTEMPTS} attempts")
+
+
+def get_next_chat_index(collection: Collection, session_id: str) -> int:
+    last_document: Optional[Dict] = collection.find_one({"session_id": session_id}, {"index": 1, "count": 1, "_id": 0}, sort=[("index", -1)])
+    return 0 if last_document is None else last_document["index"] + last_document.get("count", 1)
+
+
+def record_chat_turn(session_id: str, query: str, response: str, next_index: Optional[int] = None):
+    """Append a question and its answer to the session's chat history.
+    With CHAT_HISTORY_WRITE_BEHIND enabled the write is queued and the caller does not wait on it.
+    """
+    latest_query_and_response: List[ChatMessage] = [
+        ChatMessage(role=MessageRole.USER, content=query),
+        ChatMessage(role=MessageRole.ASSISTANT, content=response)]
+
+    if not CHAT_HISTORY_WRITE_BEHIND:
+        update_chat_history(session_id=session_id, chat_messages=latest_query_and_response, next_index=next_index)
+        return
+
+    future = history_writer.submit(update_chat_history, session_id, latest_query_and_response, next_index)
+    future.add_done_callback(lambda done: log_history_write_failure(done, session_id))
 
 
-def update_chat_history(session_id: str, chat_messages: List[ChatMessage]):
-    mongo_chat_store: MongoChatStore = get_mongo_chat_store()
-    for chat_message in chat_messages:
-        mongo_chat_store.add_message(key=session_id, message=chat_message)
+def log_history_write_failure(future: concurrent.futures.Future, session_id: str):
+    if future.exception() is not None:
+        LOG.error(f"Write-behind chat history update failed for session {session_id}: {future.exception()}")
 
 
-def clear_chat_history(session_id: str):
-    mongo_chat_store: MongoChatStore = get_mongo_chat_store()
-    return mongo_chat_store.delete_messages(key=session_id)
+def clear_chat_history(session_id: str) -> List[ChatMessage]:
+    chat_history: List[ChatMessage] = get_chat_history(session_id=session_id)
+    get_mongo_chat_collection().delete_many({"session_id": session_id})
+    return chat_history
 
 
 def map_chat_messages(chat_messages: List[ChatMessage]) -> Iterable[ChatCompletionMessageParam]:
@@ -36,6 +101,8 @@ def map_chat_messages(chat_messages: List[ChatMessage]) -> Iterable[ChatCompleti
             message_params.append(ChatCompletionSystemMessageParam(role=message.role, content=message.content))
         elif message.role == MessageRole.USER:
             message_params.append(ChatCompletionUserMessageParam(role=message.role, content=message.content))
+        elif message.role == MessageRole.ASSISTANT:
+            message_params.append(ChatCompletionAssistantMessageParam(role=message.role, content=message.content))
         else:
             raise ValueError(f"Unknown role: {message.role}")
     return message_params
@@ -0,0 +1,117 @@
+import logging
+import numpy as np
+from typing import List, Optional, Sequence, Set, Tuple
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import VectorStoreQueryResult
+from src import config
+from src.clients.local_vector_client import normalize_rows
+from src.service.token_service import count_tokens
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+CONTEXT_SEPARATOR: str = "\n---\n"
+CONTEXT_TOKEN_BUDGET: int = config.env_config.CONTEXT_TOKEN_BUDGET
+CONTEXT_MIN_CHUNKS: int = config.env_config.CONTEXT_MIN_CHUNKS
+CONTEXT_MAX_CHUNKS: int = config.env_config.CONTEXT_MAX_CHUNKS
+CONTEXT_RELATIVE_SCORE_FLOOR: float = config.env_config.CONTEXT_RELATIVE_SCORE_FLOOR
+CONTEXT_MMR_LAMBDA: float = config.env_config.CONTEXT_MMR_LAMBDA
+CONTEXT_DUPLICATE_SIMILARITY: float = config.env_config.CONTEXT_DUPLICATE_SIMILARITY
+
+
+def assemble_context(query_result: VectorStoreQueryResult, query_embedding: Optional[Sequence[float]]) -> VectorStoreQueryResult:
+    """Turn ranked retrieval results into the chunks sent to the LLM.
+    Duplicate or contained chunks are dropped, the number of chunks is chosen from the score distribution,
+    chunks are reordered with maximal marginal relevance when every chunk carries an embedding and the result is
+    packed into CONTEXT_TOKEN_BUDGET tokens. The first chunk chosen is kept even if it alone exceeds the budget.
+    """
+    nodes: List[BaseNode] = list(query_result.nodes or [])
+    if not nodes:
+        return query_result
+    scores: List[float] = list(query_result.similarities or [])
+    scores += [0.0] * (len(nodes) - len(scores))
+
+    candidates: List[Tuple[BaseNode, float]] = remove_overlapping_chunks(candidates=list(zip(nodes, scores)))
+    chunk_count: int = get_adaptive_chunk_count(scores=[score for _, score in candidates])
+    if query_embedding is not None and all(node.embedding is not None for node, _ in candidates):
+        candidates = rerank_with_mmr(candidates=candidates, query_embedding=query_embedding, chunk_count=chunk_count)
+    selected: List[Tuple[BaseNode, float]] = pack_token_budget(candidates=candidates[:chunk_count])
+
+    LOG.info(f"Assembled context from {len(selected)} of {len(nodes)} retrieved chunks")
+    return VectorStoreQueryResult(
+        nodes=[node for node, _ in selected],
+        similarities=[score for _, score in selected],
+        ids=[node.node_id for node, _ in selected]
+    )
+
+
+def remove_overlapping_chunks(candidates: List[Tuple[BaseNode, float]]) -> List[Tuple[BaseNode, float]]:
+    """Drop chunks whose text repeats a higher ranked chunk or whose verses it already covers."""
+    kept: List[Tuple[BaseNode, float]] = []
+    seen_texts: Set[str] = set()
+    for node, score in candidates:
+        text: str = " ".join(node.get_content().split())
+        if text in seen_texts or any(covers_verses(kept_node, node) for kept_node, _ in kept):
+            continue
+        seen_texts.add(text)
+        kept.append((node, score))
+    return kept
+
+
+def covers_verses(kept_node: BaseNode, node: BaseNode) -> bool:
+    """Whether kept_node spans every verse of node within the same book and chapter."""
+    kept_metadata, metadata = kept_node.metadata, node.metadata
+    if kept_metadata.get("verse_start") is None or metadata.get("verse_start") is None:
+        return False
+    return (
+        kept_metadata.get("book") == metadata.get("book")
+        and kept_metadata.get("chapter") == metadata.get("chapter")
+        and kept_metadata["verse_start"] <= metadata["verse_start"]
+        and metadata.get("verse_end", metadata["verse_start"]) <= kept_metadata.get("verse_end", kept_metadata["verse_start"])
+    )
+
+
+def get_adaptive_chunk_count(scores: List[float]) -> int:
+    """Keep the chunks scoring within CONTEXT_RELATIVE_SCORE_FLOOR of the best, bounded by the min and max chunk counts."""
+    if not scores:
+        return 0
+    top_score: float = max(scores)
+    if top_score <= 0:
+        return min(len(scores), CONTEXT_MAX_CHUNKS)
+    relevant: int = sum(1 for score in scores if score >= top_score * CONTEXT_RELATIVE_SCORE_FLOOR)
+    return min(len(scores), CONTEXT_MAX_CHUNKS, max(CONTEXT_MIN_CHUNKS, relevant))
+
+
+def rerank_with_mmr(candidates: List[Tuple[BaseNode, float]], query_embedding: Sequence[float], chunk_count: int) -> List[Tuple[BaseNode, float]]:
+    """Order chunks by maximal marginal relevance, skipping near-duplicates of chunks already chosen."""
+    embeddings: np.ndarray = normalize_rows(np.asarray([node.embedding for node, _ in candidates], dtype=np.float32))
+    query_vector: np.ndarray = normalize_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+    relevance: np.ndarray = embeddings @ query_vector
+    pairwise: np.ndarray = embeddings @ embeddings.T
+
+    chosen: List[int] = []
+    remaining: List[int] = list(range(len(candidates)))
+    while remaining and len(chosen) < chunk_count:
+        redundancy: np.ndarray = pairwise[remaining][:, chosen].max(axis=1) if chosen else np.zeros(len(remaining), dtype=np.float32)
+        mmr: np.ndarray = CONTEXT_MMR_LAMBDA * relevance[remaining] - (1 - CONTEXT_MMR_LAMBDA) * redundancy
+        best: int = remaining.pop(int(np.argmax(mmr)))
+        if chosen and pairwise[best, chosen].max() >= CONTEXT_DUPLICATE_SIMILARITY:
+            continue
+        chosen.append(best)
+    return [candidates[index] for index in chosen]
+
+
+def pack_token_budget(candidates: List[Tuple[BaseNode, float]]) -> List[Tuple[BaseNode, float]]:
+    """Take chunks in order while they fit in CONTEXT_TOKEN_BUDGET, skipping any that would overflow it."""
+    separator_tokens: int = count_tokens(CONTEXT_SEPARATOR)
+    packed: List[Tuple[BaseNode, float]] = []
+    used_tokens: int = 0
+    for node, score in candidates:
+        node_tokens: int = node.metadata.get("token_count") or count_tokens(node.get_content())
+        cost: int = node_tokens + (separator_tokens if packed else 0)
+        if packed and used_tokens + cost > CONTEXT_TOKEN_BUDGET:
+            continue
+        packed.append((node, score))
+        used_tokens += cost
+    return packed
+
@@ -1,159 +1,371 @@
 import logging
-import tempfile
+import concurrent.futures
 import pymupdf
-import os
-import time
+import queue
 import re
-from typing import List
+import threading
+from typing import Dict, Iterator, List, Optional, Set
 from werkzeug.datastructures import FileStorage
-from pathlib import Path
-from pymupdf import Document as pypdfDocument, Page as pypdfPage
-from pymongo import collection, database
+from pymongo import ReplaceOne, collection
+from pymongo.errors import OperationFailure
 from llama_index.core.schema import TextNode
-from src.models import RawDocument, BibleRequest, BibleMetadata
+from src.models import RawDocument, BibleRequest, BibleMetadata, VerseSegment
 from src import config
 from src.clients.mongo_client import get_bible_rag_db
+from src.service.extraction_service import iter_page_texts
+from src.service.verse_service import get_verse_collection
+from src.service.indexing_service import fingerprint_node
+from src.service.embedding_storage_service import encode_document_embedding
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up SERVICE - {__name__}")
 
 extensions: List[str] = ['.pdf']
 BIBLE_VERSION: str = config.env_config.BIBLE_VERSION
+FIRST_BOOK_PAGE_INDEX: int = config.env_config.PDF_FIRST_BOOK_PAGE_INDEX
+PDF_EXTRACTION_WORKERS: int = config.env_config.PDF_EXTRACTION_WORKERS
+DOCUMENT_BULK_WRITE_BATCH_SIZE: int = config.env_config.DOCUMENT_BULK_WRITE_BATCH_SIZE
+_indexed_versions: Set[str] = set()
+
+PAGE_FOOTER_PATTERN = re.compile(r'(\d+)\s+([A-Za-z\s]+)\s+(\d+)\s*$')
+# Chapter headings and verse numbers both start a word; the lookahead lets the scanner skip every other position cheaply.
+# Some PDFs extract a verse number glued to its first word ("1In the beginning"), so a letter may follow it directly.
+PAGE_MARKER_PATTERN = re.compile(r'(?<!\S)(?=[C\d])(?:Chapter\s+(?P<chapter>\d+)|(?P<verse>\d{1,3})(?:\s+(?=\S)|(?=[A-Za-z])))')
+FOOTER_SEARCH_WINDOW: int = 96  # the footer ("<page> <book> <chapter>") is always within the last few dozen characters
+MAX_VERSE_GAP: int = 2
 
 def process_documents(bible_request: BibleRequest) -> List[RawDocument]:
-    """Process the documents in the BibleRequest."""
+    """Process the documents in the BibleRequest, extracting files concurrently and keeping every file's pages."""
     file_names: List[str] = [file.filename for file in bible_request.files]
     total_files: int = len(file_names)
     LOG.info(f"document_service: Processing {total_files} files STARTED: {file_names}")
 
-    for file in bible_request.files:
-        extracted_bible_data: List[RawDocument] = extract_file(file=file)
+    workers: int = get_extraction_workers_per_file(total_files=total_files)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(total_files, 1)) as executor:
+        extracted_files: List[List[RawDocument]] = list(executor.map(
+            lambda file: extract_file(file=file, workers=workers, source_file=get_source_file(file=file, total_files=total_files)),
+            bible_request.files
+        ))
+
+    raw_bible: List[RawDocument] = []
+    for file, extracted_bible_data in zip(bible_request.files, extracted_files):
         LOG.info(f"document_service: Extracted {len(extracted_bible_data)} pages from {file.filename}")
-    
-    LOG.info(f"document_service: Processing COMPLETED for {file.filename}")
-    return extracted_bible_data
+        raw_bible.extend(extracted_bible_data)
+
+    LOG.info(f"document_service: Processing COMPLETED for {total_files} files, {len(raw_bible)} pages extracted")
+    return raw_bible
+
+
+def iter_pages_from_files(files: List[FileStorage]) -> Iterator[List[RawDocument]]:
+    """Extract every file concurrently and yield page batches as they become available.
+    Pages of one file stay in order; batches of different files interleave.
+    """
+    total_files: int = len(files)
+    if total_files == 1:
+        yield from iter_extracted_pages(file=files[0])
+        return
+
+    workers: int = get_extraction_workers_per_file(total_files=total_files)
+    batches: queue.Queue = queue.Queue(maxsize=total_files * 2)
+    stopped = threading.Event()
+    finished = object()
+
+    def put_until_stopped(item) -> bool:
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def extract_into_queue(file: FileStorage):
+        try:
+            for raw_pages in iter_extracted_pages(file=file, workers=workers, source_file=get_source_file(file=file, total_files=total_files)):
+                if not put_until_stopped(raw_pages):
+                    return
+            put_until_stopped(finished)
+        except Exception as e:
+            put_until_stopped(e)
 
+    threads: List[threading.Thread] = [
+        threading.Thread(target=extract_into_queue, args=(file,), name=f"extract-{file.filename}", daemon=True) for file in files
+    ]
+    for thread in threads:
+        thread.start()
 
-def extract_file(file: FileStorage) -> List[RawDocument]:
+    try:
+        remaining_files: int = total_files
+        while remaining_files:
+            item = batches.get()
+            if item is finished:
+                remaining_files -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        # Unblock extractors if the consumer stops early
+        stopped.set()
+
+
+def get_extraction_workers_per_file(total_files: int) -> int:
+    """Share the extraction process budget between files extracted at the same time."""
+    return max(PDF_EXTRACTION_WORKERS // max(total_files, 1), 1)
+
+
+def get_source_file(file: FileStorage, total_files: int) -> Optional[str]:
+    """Pages are only tagged with their file when several files share one version, to keep node ids distinct."""
+    return file.filename if total_files > 1 else None
+
+
+def extract_file(file: FileStorage, workers: int = PDF_EXTRACTION_WORKERS, source_file: Optional[str] = None) -> List[RawDocument]:
     """Extract data from a file and return a list of RawDocuments."""
+    return [raw_page for raw_pages in iter_extracted_pages(file=file, workers=workers, source_file=source_file) for raw_page in raw_pages]
+
+
+def iter_extracted_pages(file: FileStorage, workers: int = PDF_EXTRACTION_WORKERS, source_file: Optional[str] = None) -> Iterator[List[RawDocument]]:
+    """Extract a file and yield tagged RawDocuments in page order, one batch of pages at a time."""
     if not file.filename:
         LOG.error("No file provided for extraction")
         raise ValueError("No file provided for extraction")
     
     if file and any(file.filename.lower().endswith(ext) for ext in extensions):
         LOG.info(f"Extracting data from file: {file.filename}")
-        temp_path = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as temp_file:
-                temp_path = temp_file.name
-                temp_file.write(file.read())
-                temp_file.flush()
-                LOG.info(f"Temporary file created at: {temp_path}")
-
-                bible_document: pypdfDocument = pymupdf.open(temp_path)
-
-                if bible_document.page_count == 0:
-                    raise ValueError("The document is empty or has no pages.")
-                
-                raw_bible: List[RawDocument] = []
-                prev_book: str = "Genesis"
-                prev_chapter: int = 1
-                for page_number in range(74, bible_document.page_count): # Starting at index 74 as the first book starts here
+            pdf_bytes: bytes = file.read()
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as bible_document:
+                page_count: int = bible_document.page_count
+
+            if page_count == 0:
+                raise ValueError("The document is empty or has no pages.")
+
+            # Book, chapter and the last verse carry forward from the previous page, so tagging stays sequential
+            prev_book: str = "Genesis"
+            prev_chapter: int = 1
+            prev_verse: Optional[int] = None
+            page_number: int = FIRST_BOOK_PAGE_INDEX
+            for page_texts in iter_page_texts(
+                pdf_bytes=pdf_bytes, first_page=FIRST_BOOK_PAGE_INDEX, last_page=page_count, workers=workers
+            ):
+                raw_pages: List[RawDocument] = []
+                for text in page_texts:
                     pdf_page_number: int = page_number + 1  # Page numbers are 1-based in the PDF
-                    pdf_page: pypdfPage = bible_document.load_page(page_number)
-                    text: str = pdf_page.get_text("text").replace('\n', ' ')
                     raw_page: RawDocument = RawDocument(doc_id=pdf_page_number, doc_data=text)
-                    tag_raw_document_with_metadata(raw_bible_page=raw_page, prev_book=prev_book, prev_chapter=prev_chapter)
-                    raw_bible.append(raw_page)
-                    prev_book = raw_page.metadata['book']
-                    prev_chapter = raw_page.metadata['chapter']
-
-                bible_document.close()
-                return raw_bible
+                    tag_raw_document_with_metadata(
+                        raw_bible_page=raw_page, prev_book=prev_book, prev_chapter=prev_chapter, prev_verse=prev_verse
+                    )
+                    if source_file:
+                        raw_page.metadata['source_file'] = source_file
+                    raw_pages.append(raw_page)
+                    if raw_page.verse_segments:
+                        last_segment: VerseSegment = raw_page.verse_segments[-1]
+                        prev_book, prev_chapter, prev_verse = last_segment.book, last_segment.chapter, last_segment.verse
+                    else:
+                        prev_book, prev_chapter = raw_page.metadata.get('book'), raw_page.metadata.get('chapter')
+                    page_number += 1
+                yield raw_pages
         except Exception as e:
             LOG.error(f"Error extracting file {file.filename}: {str(e)}")
             raise RuntimeError(f"Failed to extract file {file.filename}: {str(e)}")
-        finally:
-            delete_temp_file(temp_path)
     else:
         LOG.error(f"Unsupported file type: {file.filename}")
         raise ValueError(f"Unsupported file type: {file.filename}")
 
 
-def delete_temp_file(temp_path):
-    """Delete the temporary file if it exists."""
-    LOG.debug(f"Attempting to delete temporary file: {temp_path}")
-    if temp_path and os.path.exists(temp_path):
-        max_attempts: int = 5
-        for attempt in range(max_attempts):
-            try:
-                Path(temp_path).unlink()
-                LOG.info(f"Temporary file {temp_path} deleted successfully")
-                break
-            except PermissionError as e:
-                LOG.error(f"PermissionError deleting {temp_path}: {str(e)}")
-                if attempt < max_attempts - 1:
-                    time.sleep(0.1)
-                    continue
-                LOG.error(f"Failed to delete temporary file {temp_path} after {max_attempts} attempts")
-            except Exception as e:
-                LOG.error(f"Error deleting temporary file {temp_path}: {str(e)}")
-                break
+def store_bible_nodes_in_document_db(processed_bible_nodes: List[TextNode], version: str):
+    """Store processed Bible nodes in a document database, replacing the version's full node set."""
+    upsert_bible_nodes_in_document_db(processed_bible_nodes=processed_bible_nodes, version=version)
+    stored_node_ids: Set[str] = set(get_stored_node_fingerprints(version=version))
+    delete_bible_nodes_in_document_db(node_ids=list(stored_node_ids - {node.node_id for node in processed_bible_nodes}), version=version)
 
 
-def store_bible_nodes_in_document_db(processed_bible_nodes: List[TextNode], version: str):
-    """Store processed Bible nodes in a document database."""
-    LOG.info(f"Storing {len(processed_bible_nodes)} processed Bible nodes for version: {version}")
-    db: database.Database = get_bible_rag_db()
-    bible_collection: collection.Collection = db[version]
+def get_bible_node_collection(version: str) -> collection.Collection:
+    """Get the node collection for a version, creating its node_id index on first use."""
+    bible_collection: collection.Collection = get_bible_rag_db()[version]
+    if version not in _indexed_versions:
+        try:
+            bible_collection.create_index("node_id", name="node_id", unique=True)
+        except OperationFailure as e:
+            LOG.warning(f"Unable to create unique node_id index for Bible version {version}, falling back to non-unique index: {e}")
+            bible_collection.create_index("node_id", name="node_id_non_unique")
+        _indexed_versions.add(version)
+    return bible_collection
+
+
+def get_stored_node_fingerprints(version: str) -> Dict[str, Optional[str]]:
+    """Map every stored node id for a version to its content fingerprint (None for nodes stored before fingerprinting).
+    The collection holds only this version's nodes, so nothing is filtered on metadata.version, which is tagged
+    from the configured BIBLE_VERSION rather than the request.
+    """
+    bible_collection: collection.Collection = get_bible_node_collection(version=version)
+    return {
+        document["node_id"]: document.get("fingerprint")
+        for document in bible_collection.find({}, {"node_id": 1, "fingerprint": 1, "_id": 0})
+    }
 
-    # Clear existing nodes for the version
-    LOG.info(f"Clearing existing nodes for Bible version: {version}")
-    bible_collection.delete_many({"metadata.version": version})
-    LOG.info(f"Older nodes cleared from collection: {version}")
 
-    for node in processed_bible_nodes:
-        bible_collection.insert_one({
-            "node_id": node.node_id,
-            "text": node.get_content(),
-            "metadata": node.metadata,
-            "embedding": node.get_embedding()
-        })
+def upsert_bible_nodes_in_document_db(processed_bible_nodes: List[TextNode], version: str):
+    """Insert or replace nodes by node_id using unordered bulk writes, storing embeddings in DOCUMENT_EMBEDDING_FORMAT."""
+    if not processed_bible_nodes:
+        return
+    LOG.info(f"Upserting {len(processed_bible_nodes)} processed Bible nodes for version: {version}")
+    bible_collection: collection.Collection = get_bible_node_collection(version=version)
 
-    LOG.info(f"Stored {len(processed_bible_nodes)} processed Bible nodes for version: {version}")
+    for start in range(0, len(processed_bible_nodes), DOCUMENT_BULK_WRITE_BATCH_SIZE):
+        batch: List[TextNode] = processed_bible_nodes[start:start + DOCUMENT_BULK_WRITE_BATCH_SIZE]
+        bible_collection.bulk_write([
+            ReplaceOne(
+                {"node_id": node.node_id},
+                {
+                    "node_id": node.node_id,
+                    "text": node.get_content(),
+                    "metadata": node.metadata,
+                    **encode_document_embedding(embedding=node.embedding),
+                    "fingerprint": fingerprint_node(node=node)
+                },
+                upsert=True
+            )
+            for node in batch
+        ], ordered=False)
 
+    LOG.info(f"Upserted {len(processed_bible_nodes)} processed Bible nodes for version: {version}")
 
-def tag_raw_document_with_metadata(raw_bible_page: RawDocument, prev_book: str = None, prev_chapter: int = None):
-    """Tag a raw bible page with metadata."""
+
+def delete_bible_nodes_in_document_db(node_ids: List[str], version: str):
+    """Delete nodes by node_id in bulk batches."""
+    if not node_ids:
+        return
+    LOG.info(f"Deleting {len(node_ids)} removed Bible nodes for version: {version}")
+    bible_collection: collection.Collection = get_bible_node_collection(version=version)
+    for start in range(0, len(node_ids), DOCUMENT_BULK_WRITE_BATCH_SIZE):
+        bible_collection.delete_many({"node_id": {"$in": node_ids[start:start + DOCUMENT_BULK_WRITE_BATCH_SIZE]}})
+
+
+def tag_raw_document_with_metadata(raw_bible_page: RawDocument, prev_book: str = None, prev_chapter: int = None, prev_verse: int = None):
+    """Tag a raw bible page with metadata and its verse segments in a single scan of the page text.
+    Book and chapter come from the page footer, falling back to the previous page, and the first chapter heading
+    labels the page. Text before the first verse marker continues prev_verse when it is in the same chapter.
+    """
+    text: str = raw_bible_page.doc_data
     bible_page_metadata: BibleMetadata = BibleMetadata()
-    bible_page_match = re.search(r'(\d+)\s+([A-Za-z\s]+)\s+(\d+)$', raw_bible_page.doc_data.strip())
-    
-    # Extracting Bible page number, book, and chapter from the text
-    if bible_page_match:
-        bible_page_metadata.bible_page_number = int(bible_page_match.group(1))
-        bible_page_metadata.book = bible_page_match.group(2).strip()
-        bible_page_metadata.chapter = int(bible_page_match.group(3))
+
+    # Extracting Bible page number, book, and chapter from the footer at the end of the page
+    footer_offset: int = max(len(text) - FOOTER_SEARCH_WINDOW, 0)
+    footer_match: Optional[re.Match] = PAGE_FOOTER_PATTERN.search(text, footer_offset)
+    text_end: int = footer_match.start() if footer_match else len(text)
+    if footer_match:
+        bible_page_metadata.bible_page_number = int(footer_match.group(1))
+        bible_page_metadata.book = footer_match.group(2).strip()
+        bible_page_metadata.chapter = int(footer_match.group(3))
     else:
         bible_page_metadata.book = prev_book
         bible_page_metadata.chapter = prev_chapter
+    book: Optional[str] = bible_page_metadata.book
 
-    # Extracting chapter start if present (e.g., "Chapter 1")
-    chapter_match = re.search(r'Chapter\s+(\d+)', raw_bible_page.doc_data.strip())
-    if chapter_match:
-        bible_page_metadata.chapter = int(chapter_match.group(1))
-
-    # Extracting verses in a page
-    verse_numbers = re.findall(r'(\d+)[A-Za-z\s]', raw_bible_page.doc_data.strip())
-    verse_numbers = [int(v) for v in verse_numbers]
-    if verse_numbers:
-        # Dropping the last verse number as it may be the bible page number
-        bible_page_metadata.verses = verse_numbers[:-1]
-    else:
-        bible_page_metadata.verses = []
+    # Chapter headings and verse markers come from one pass over the page body
+    markers: List[re.Match] = list(PAGE_MARKER_PATTERN.finditer(text, 0, text_end))
+    first_heading: Optional[re.Match] = next((marker for marker in markers if marker.lastgroup == 'chapter'), None)
+    chapter: Optional[int] = bible_page_metadata.chapter
+    if first_heading:
+        bible_page_metadata.chapter = int(first_heading.group('chapter'))
+        if text[:first_heading.start()].strip() and bible_page_metadata.chapter > 1:
+            # Text before the first heading closes the previous chapter
+            chapter = bible_page_metadata.chapter - 1
 
+    continued_verse: Optional[int] = prev_verse if book == prev_book and chapter == prev_chapter else None
+    segments: List[VerseSegment] = []
+    current: VerseSegment = VerseSegment(book=book, chapter=chapter, verse=continued_verse, text="", start=0, end=text_end)
+    at_heading: bool = False
+    previous_verse: int = 0
+    for marker in markers:
+        if marker.lastgroup == 'chapter':
+            close_verse_segment(segments=segments, segment=current, text=text, end=marker.start())
+            current = VerseSegment(book=book, chapter=int(marker.group('chapter')), verse=None, text="", start=marker.start(), end=text_end)
+            at_heading, previous_verse = True, 0
+            continue
+        verse: int = int(marker.group('verse'))
+        # Verse numbers only move forward within a chapter; a small gap tolerates a marker lost in extraction
+        if previous_verse and not previous_verse < verse <= previous_verse + MAX_VERSE_GAP:
+            continue
+        previous_verse = verse
+        if at_heading:
+            current.verse, at_heading = verse, False
+            continue
+        close_verse_segment(segments=segments, segment=current, text=text, end=marker.start())
+        current = VerseSegment(book=book, chapter=current.chapter, verse=verse, text="", start=marker.start(), end=text_end)
+    close_verse_segment(segments=segments, segment=current, text=text, end=text_end)
+
+    bible_page_metadata.verses = [segment.verse for segment in segments if segment.verse is not None]
     bible_page_metadata.version = BIBLE_VERSION
     bible_page_metadata.pdf_page_number = raw_bible_page.doc_id
 
     raw_bible_page.metadata = bible_page_metadata.to_dict()
+    raw_bible_page.verse_segments = segments
+
+    LOG.debug(f"Tagged metadata for page {bible_page_metadata.pdf_page_number} SUCCESSFULLY")
+
+
+def close_verse_segment(segments: List[VerseSegment], segment: VerseSegment, text: str, end: int):
+    """Finish a segment at end, keeping it only if it has any text."""
+    segment.end = end
+    segment.text = " ".join(text[segment.start:end].split())
+    if segment.text:
+        segments.append(segment)
+
+
+def build_verse_index_entries(raw_pages: List[RawDocument]) -> List[Dict]:
+    """Build (book, chapter, verse) -> page offset entries for every numbered verse segment in the pages.
+    A verse that runs onto the next page gets one entry per page, ordered by pdf_page_number.
+    """
+    entries: List[Dict] = []
+    for raw_page in raw_pages:
+        source_file: Optional[str] = raw_page.metadata.get('source_file')
+        for segment in raw_page.verse_segments:
+            if segment.verse is None or segment.book is None or segment.chapter is None:
+                continue
+            entry_id: str = f"{segment.book}-{segment.chapter}-{segment.verse}-{raw_page.doc_id}"
+            if source_file:
+                entry_id += f"-{source_file}"
+            entries.append({
+                "_id": entry_id,
+                "book": segment.book,
+                "chapter": segment.chapter,
+                "verse": segment.verse,
+                "pdf_page_number": raw_page.doc_id,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "source_file": source_file
+            })
+    return entries
+
+
+def upsert_verse_index_in_document_db(raw_pages: List[RawDocument], version: str) -> List[str]:
+    """Store the verse offset index for a batch of tagged pages and return the entry ids written."""
+    entries: List[Dict] = build_verse_index_entries(raw_pages=raw_pages)
+    if not entries:
+        return []
+    verse_collection: collection.Collection = get_verse_collection(version=version)
+    for start in range(0, len(entries), DOCUMENT_BULK_WRITE_BATCH_SIZE):
+        verse_collection.bulk_write([
+            ReplaceOne({"_id": entry["_id"]}, entry, upsert=True)
+            for entry in entries[start:start + DOCUMENT_BULK_WRITE_BATCH_SIZE]
+        ], ordered=False)
+    LOG.debug(f"Indexed {len(entries)} verse segments for Bible version: {version}")
+    return [entry["_id"] for entry in entries]
+
+
+def get_stored_verse_index_ids(version: str) -> Set[str]:
+    """Get the ids of every verse offset entry stored for a version."""
+    return {entry["_id"] for entry in get_verse_collection(version=version).find({}, {"_id": 1})}
+
 
-    LOG.debug(f"Tagged metadata for page {bible_page_metadata.pdf_page_number} SUCCESSFULLY")
\ No newline at end of file
+def delete_verse_index_entries_in_document_db(entry_ids: List[str], version: str):
+    """Delete verse offset entries by id in bulk batches."""
+    if not entry_ids:
+        return
+    LOG.info(f"Deleting {len(entry_ids)} removed verse index entries for version: {version}")
+    verse_collection: collection.Collection = get_verse_collection(version=version)
+    for start in range(0, len(entry_ids), DOCUMENT_BULK_WRITE_BATCH_SIZE):
+        verse_collection.delete_many({"_id": {"$in": entry_ids[start:start + DOCUMENT_BULK_WRITE_BATCH_SIZE]}})
@@ -1,62 +1,268 @@
 import logging
 import concurrent.futures
-from typing import List
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
 from time import sleep
 from llama_index.core.schema import BaseNode
-from llama_index.vector_stores.opensearch import OpensearchVectorStore
+from openai import BadRequestError
 from openai.types import CreateEmbeddingResponse
-from src.clients.llm_client import get_text_embedding
-from src.clients.vector_client import get_opensearch_vector_store
+from src import config
+from src.clients.llm_client import get_text_embedding, get_batch_text_embeddings, embedding_rate_limiter
+from src.clients.vector_client import VectorBackend, VectorBulkWriter, get_vector_store, get_vector_bulk_writer
+from src.clients.embedding_cache_client import EmbeddingCache, get_embedding_cache
+from src.clients.mongo_client import get_bible_rag_db
+from src.service.token_service import count_tokens
+from src.service.metrics_service import record_openai_usage, register_rate_limiter_stats
+from src.service.embedding_storage_service import decode_document_embedding
 
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up SERVICE - {__name__}")
 
+EMBEDDING_BATCH_MAX_INPUTS: int = config.env_config.EMBEDDING_BATCH_MAX_INPUTS
+EMBEDDING_BATCH_MAX_TOKENS: int = config.env_config.EMBEDDING_BATCH_MAX_TOKENS
+EMBEDDING_MAX_INPUT_TOKENS: int = config.env_config.EMBEDDING_MAX_INPUT_TOKENS
+EMBEDDING_BATCH_WORKERS: int = config.env_config.EMBEDDING_BATCH_WORKERS
+VECTOR_BULK_BATCH_SIZE: int = config.env_config.VECTOR_BULK_BATCH_SIZE
+VECTOR_BULK_WORKERS: int = config.env_config.VECTOR_BULK_WORKERS
+VECTOR_BULK_MAX_ATTEMPTS: int = config.env_config.VECTOR_BULK_MAX_ATTEMPTS
+register_rate_limiter_stats(embedding_rate_limiter.stats)
+
 def embed_bible_nodes(processed_bible_nodes: List[BaseNode], version: str):
-    """Embed Bible nodes for the specified version."""
+    """Embed Bible nodes for the specified version using batched embedding requests.
+    The pool holds EMBEDDING_BATCH_WORKERS threads; the embedding rate limiter decides how many requests are in flight.
+    """
     LOG.info(f"Embedding {len(processed_bible_nodes)} nodes for Bible version: {version}")
-    
-    def embed_node(node: BaseNode):
-        try:
-            embedding_response: CreateEmbeddingResponse = get_text_embedding(
-                text=node.get_content()
-            )
-            node.embedding = embedding_response.data[0].embedding
-        except Exception as e:
-            LOG.error(f"Error embedding node {node.node_id}: {str(e)}")
-            raise RuntimeError(f"Failed to embed node {node.node_id}: {str(e)}")
-        
-    try:
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=15)
-        futures = [executor.submit(embed_node, node) for node in processed_bible_nodes]
-        for future in concurrent.futures.as_completed(futures):
-            future.result()
+    uncached_nodes: List[BaseNode] = apply_cached_embeddings(nodes=processed_bible_nodes)
+    LOG.info(f"Embedding cache served {len(processed_bible_nodes) - len(uncached_nodes)} of {len(processed_bible_nodes)} nodes for Bible version: {version}")
+    if not uncached_nodes:
         LOG.info(f"Embedding completed for Bible version: {version}")
+        return
+
+    batches: List[List[BaseNode]] = pack_embedding_batches(nodes=uncached_nodes)
+    LOG.info(f"Packed {len(uncached_nodes)} nodes into {len(batches)} embedding requests for Bible version: {version}")
+
+    failed_nodes: List[BaseNode] = []
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=EMBEDDING_BATCH_WORKERS) as executor:
+            futures = [executor.submit(embed_node_batch, batch) for batch in batches]
+            for future in concurrent.futures.as_completed(futures):
+                failed_nodes.extend(future.result())
     except Exception as e:
         LOG.error(f"Error during embedding process for Bible version {version}: {str(e)}")
         raise RuntimeError(f"Failed to embed Bible nodes for version {version}: {str(e)}")
+    finally:
+        cache_node_embeddings(nodes=uncached_nodes)
+
+    if failed_nodes:
+        failed_ids: List[str] = [node.node_id for node in failed_nodes]
+        LOG.error(f"Failed to embed {len(failed_ids)} nodes for Bible version {version}: {failed_ids}")
+        raise RuntimeError(f"Failed to embed {len(failed_ids)} nodes for version {version}: {failed_ids}")
+    LOG.info(f"Embedding completed for Bible version: {version}")
+
+
+def get_cached_text_embedding(text: str) -> List[float]:
+    """Get the embedding for text, consulting the on-disk embedding cache before the API."""
+    cache: Optional[EmbeddingCache] = get_embedding_cache()
+    if cache is None:
+        return request_text_embedding(text=text)
+
+    key: str = cache.make_key(text)
+    cached_embedding: Optional[np.ndarray] = cache.get(key)
+    if cached_embedding is not None:
+        return cached_embedding.tolist()
+
+    embedding: List[float] = request_text_embedding(text=text)
+    cache.put(key, embedding)
+    return embedding
+
+
+def request_text_embedding(text: str) -> List[float]:
+    response: CreateEmbeddingResponse = get_text_embedding(text=text)
+    record_openai_usage(response=response)
+    return response.data[0].embedding
+
+
+def apply_cached_embeddings(nodes: List[BaseNode]) -> List[BaseNode]:
+    """Fill node embeddings from the embedding cache and return the nodes that missed."""
+    cache: Optional[EmbeddingCache] = get_embedding_cache()
+    if cache is None:
+        return list(nodes)
+
+    cached_embeddings: List[Optional[np.ndarray]] = cache.get_many([cache.make_key(node.get_content()) for node in nodes])
+    uncached_nodes: List[BaseNode] = []
+    for node, cached_embedding in zip(nodes, cached_embeddings):
+        if cached_embedding is None:
+            uncached_nodes.append(node)
+        else:
+            node.embedding = cached_embedding.tolist()
+    return uncached_nodes
+
+
+def attach_stored_embeddings(nodes: List[BaseNode], version: str):
+    """Fill missing node embeddings from the embedding cache, then from the nodes stored in the document database."""
+    missing_nodes: List[BaseNode] = apply_cached_embeddings(nodes=[node for node in nodes if node.embedding is None])
+    if not missing_nodes:
+        return
+    stored_embeddings: Dict[str, np.ndarray] = {
+        document["node_id"]: decode_document_embedding(document=document)
+        for document in get_bible_rag_db()[version].find(
+            {"node_id": {"$in": [node.node_id for node in missing_nodes]}, "embedding": {"$exists": True}},
+            {"_id": 0, "node_id": 1, "embedding": 1, "embedding_scale": 1}
+        )
+    }
+    for node in missing_nodes:
+        stored_embedding: Optional[np.ndarray] = stored_embeddings.get(node.node_id)
+        node.embedding = stored_embedding.tolist() if stored_embedding is not None else None
+
+
+def cache_node_embeddings(nodes: List[BaseNode]):
+    """Write the embeddings of freshly embedded nodes to the embedding cache."""
+    cache: Optional[EmbeddingCache] = get_embedding_cache()
+    if cache is None:
+        return
+
+    embeddings: Dict[str, List[float]] = {
+        cache.make_key(node.get_content()): node.embedding for node in nodes if node.embedding is not None
+    }
+    if embeddings:
+        cache.put_many(embeddings)
+        cache.flush()
+        LOG.info(f"Cached {len(embeddings)} new embeddings")
+
+
+def pack_embedding_batches(nodes: List[BaseNode]) -> List[List[BaseNode]]:
+    """Greedily pack nodes into batches that respect the per-request input-count and token limits."""
+    batches: List[List[BaseNode]] = []
+    current_batch: List[BaseNode] = []
+    current_tokens: int = 0
+
+    for node in nodes:
+        node_tokens: int = min(count_tokens(node.get_content()), EMBEDDING_MAX_INPUT_TOKENS)
+        if current_batch and (
+            len(current_batch) >= EMBEDDING_BATCH_MAX_INPUTS
+            or current_tokens + node_tokens > EMBEDDING_BATCH_MAX_TOKENS
+        ):
+            batches.append(current_batch)
+            current_batch, current_tokens = [], 0
+        current_batch.append(node)
+        current_tokens += node_tokens
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def embed_node_batch(batch: List[BaseNode]) -> List[BaseNode]:
+    """Embed a batch of nodes in one request and return the nodes that could not be embedded.
+    A batch rejected for its inputs is split in half and retried so a single bad input only costs itself.
+    Any other error (authentication, permissions, quota, connection) applies to every batch alike and is raised
+    unchanged; rate limits and transient failures have already been retried by get_batch_text_embeddings.
+    """
+    try:
+        embedding_response: CreateEmbeddingResponse = get_batch_text_embeddings(
+            texts=[node.get_content() for node in batch]
+        )
+    except BadRequestError as e:
+        if len(batch) == 1:
+            LOG.error(f"Error embedding node {batch[0].node_id}: {str(e)}")
+            return batch
+        LOG.warning(f"Embedding batch of {len(batch)} nodes failed, splitting batch: {str(e)}")
+        middle: int = len(batch) // 2
+        return embed_node_batch(batch[:middle]) + embed_node_batch(batch[middle:])
+
+    record_openai_usage(response=embedding_response)
+    embedded_indexes: Set[int] = set()
+    for embedding_data in embedding_response.data:
+        batch[embedding_data.index].embedding = embedding_data.embedding
+        embedded_indexes.add(embedding_data.index)
+    return [node for index, node in enumerate(batch) if index not in embedded_indexes]
     
 
 def store_embedded_bible_nodes_in_vector_db(processed_bible_nodes: List[BaseNode], version: str):
-    """Store embedded Bible nodes in a vector database."""
+    """Store embedded Bible nodes in a vector database.
+    Nodes are indexed by node id, so re-storing a node replaces it in place without a delete first.
+    Batches are written VECTOR_BULK_WORKERS at a time; nodes that fail inside a batch are retried one by one,
+    and any node that still cannot be stored fails the call with its id.
+    """
     LOG.info(f"Storing {len(processed_bible_nodes)} embedded nodes for Bible version: {version}")
-    vector_store: OpensearchVectorStore = get_opensearch_vector_store()
-    node_ids = [node.node_id for node in processed_bible_nodes]
+    writer: VectorBulkWriter = get_vector_bulk_writer()
+    batches: List[List[BaseNode]] = [
+        processed_bible_nodes[i:i+VECTOR_BULK_BATCH_SIZE] for i in range(0, len(processed_bible_nodes), VECTOR_BULK_BATCH_SIZE)
+    ]
+
+    failed_ids: List[str] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=VECTOR_BULK_WORKERS, thread_name_prefix="vector-bulk") as executor:
+        for batch_failed_ids in executor.map(lambda batch: write_vector_batch(writer=writer, batch=batch), batches):
+            failed_ids.extend(batch_failed_ids)
+
+    if failed_ids:
+        LOG.error(f"Failed to store {len(failed_ids)} nodes for Bible version {version}: {failed_ids}")
+        raise RuntimeError(f"Failed to store {len(failed_ids)} nodes in the vector index for version {version}: {failed_ids}")
+    LOG.info(f"Stored {len(processed_bible_nodes)} embedded nodes for Bible version: {version}")
+
+
+def write_vector_batch(writer: VectorBulkWriter, batch: List[BaseNode]) -> List[str]:
+    """Bulk-write a batch, then retry each failed node on its own; return the ids that never succeeded."""
+    failed_ids: Set[str] = set(writer.write(nodes=batch))
+    if not failed_ids:
+        return []
+    LOG.warning(f"{len(failed_ids)} of {len(batch)} nodes failed in a bulk write, retrying them individually")
+    still_failed: List[str] = []
+    for node in (node for node in batch if node.node_id in failed_ids):
+        for attempt in range(1, VECTOR_BULK_MAX_ATTEMPTS + 1):
+            sleep(min(2 ** attempt, 10) * 0.25)
+            if not writer.write(nodes=[node]):
+                break
+        else:
+            still_failed.append(node.node_id)
+    return still_failed
 
+
+def is_vector_index_empty() -> bool:
+    """Whether the vector index, shared by every Bible version, holds no documents at all."""
+    return get_vector_bulk_writer().count() == 0
+
+
+@contextmanager
+def bulk_loading_vector_index(version: str) -> Iterator[None]:
+    """Turn off index refresh and replicas for a full load, restoring them afterwards even when the load fails."""
+    writer: VectorBulkWriter = get_vector_bulk_writer()
+    writer.begin_bulk_load()
     try:
-        vector_store.delete_nodes(node_ids=node_ids)
-        LOG.info(f"Deleted existing nodes for Bible version: {version}")
-
-        batch_size = 100
-        for i in range(0, len(processed_bible_nodes), batch_size):
-            batch = processed_bible_nodes[i:i+batch_size]
-            try:
-                vector_store.add(nodes=batch)
-                LOG.info(f"Stored batch {i // batch_size + 1} ({len(batch)} nodes)")
-            except Exception as e:
-                LOG.error(f"Error storing batch {i // batch_size + 1}: {str(e)}")
-                sleep(2)  # gentle retry delay
-        LOG.info(f"Stored {len(processed_bible_nodes)} embedded nodes for Bible version: {version}")
-    except Exception as e:
-        LOG.error(f"Error storing embedded nodes for Bible version {version}: {str(e)}")
-        raise e
+        yield
+    finally:
+        try:
+            writer.end_bulk_load()
+        except Exception as e:
+            LOG.error(f"Could not restore vector index settings for Bible version {version}: {str(e)}")
+            raise
+
+
+def verify_vector_index(node_ids: Set[str], version: str):
+    """Check the vector index holds every expected node, raising with the ids of any that are missing.
+    Only this version's node ids are counted, since other versions share the index; ids are only
+    looked up one by one when the count falls short.
+    """
+    writer: VectorBulkWriter = get_vector_bulk_writer()
+    expected_ids: List[str] = sorted(node_ids)
+    count: int = writer.count(node_ids=expected_ids)
+    if count == len(expected_ids):
+        LOG.info(f"Vector index for Bible version {version} holds all {count} nodes")
+        return
+
+    missing_ids: List[str] = sorted(node_ids - writer.existing_ids(node_ids=expected_ids))
+    LOG.error(f"Vector index for Bible version {version} is missing {len(missing_ids)} of {len(node_ids)} nodes: {missing_ids}")
+    raise RuntimeError(f"Vector index for version {version} is missing {len(missing_ids)} nodes: {missing_ids}")
+
+
+def delete_embedded_bible_nodes_in_vector_db(node_ids: List[str], version: str):
+    """Delete nodes that no longer exist in a Bible version from the vector database."""
+    if not node_ids:
+        return
+    LOG.info(f"Deleting {len(node_ids)} removed nodes from the vector store for Bible version: {version}")
+    vector_store: VectorBackend = get_vector_store()
+    batch_size = 1000
+    for i in range(0, len(node_ids), batch_size):
+        vector_store.delete_nodes(node_ids=node_ids[i:i+batch_size])
@@ -0,0 +1,51 @@
+import logging
+import numpy as np
+from typing import Any, Dict, Optional, Sequence
+from bson.binary import Binary, BinaryVector, BinaryVectorDtype
+from src import config
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+DOCUMENT_EMBEDDING_FORMAT: str = config.env_config.DOCUMENT_EMBEDDING_FORMAT
+DOCUMENT_EMBEDDING_FORMATS = ("float32", "int8", "array", "none")
+INT8_MAX: int = 127
+
+
+def encode_document_embedding(embedding: Optional[Sequence[float]], embedding_format: str = DOCUMENT_EMBEDDING_FORMAT) -> Dict[str, Any]:
+    """Fields to store a node's embedding in its document: a packed float32 vector, an int8 vector plus the
+    scale that restores it, a plain array of doubles, or nothing at all.
+    """
+    if embedding_format not in DOCUMENT_EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown document embedding format: {embedding_format}")
+    if embedding is None or embedding_format == "none":
+        return {}
+    if embedding_format == "array":
+        return {"embedding": list(embedding)}
+
+    vector: np.ndarray = np.asarray(embedding, dtype="<f4")
+    if embedding_format == "float32":
+        return {"embedding": Binary.from_vector(vector, BinaryVectorDtype.FLOAT32)}
+
+    scale: float = float(np.abs(vector).max()) / INT8_MAX or 1.0
+    quantized: np.ndarray = np.clip(np.rint(vector / scale), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return {
+        "embedding": Binary.from_vector(quantized, BinaryVectorDtype.INT8),
+        "embedding_scale": scale
+    }
+
+
+def decode_document_embedding(document: Dict[str, Any]) -> Optional[np.ndarray]:
+    """Read a document's embedding in any stored format; float32 vectors are viewed in place without copying."""
+    stored: Any = document.get("embedding")
+    if stored is None:
+        return None
+    if not isinstance(stored, Binary):
+        return np.asarray(stored, dtype=np.float32)
+
+    vector: BinaryVector = stored.as_vector(return_numpy=True)
+    if vector.dtype == BinaryVectorDtype.FLOAT32:
+        return vector.data
+    if vector.dtype == BinaryVectorDtype.INT8:
+        return vector.data.astype(np.float32) * np.float32(document.get("embedding_scale", 1.0))
+    raise ValueError(f"Unsupported stored embedding vector type: {vector.dtype}")
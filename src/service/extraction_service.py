@@ -0,0 +1,79 @@
+import logging
+import concurrent.futures
+import multiprocessing
+import pymupdf
+from collections import deque
+from itertools import islice
+from typing import Deque, Iterator, List, Optional, Tuple
+from pymupdf import Document as pypdfDocument
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+PAGES_PER_TASK_TARGET: int = 4  # tasks per worker, so uneven pages still balance across the pool
+# Workers start from a clean interpreter rather than forking a parent that runs Flask and client threads
+POOL_START_METHOD: str = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Per-process document opened once by the pool initializer; only ever set inside pool workers
+_worker_document: Optional[pypdfDocument] = None
+
+
+def extract_page_texts(pdf_bytes: bytes, first_page: int, last_page: int, workers: int) -> List[str]:
+    """Extract the text of pages [first_page, last_page) from an in-memory PDF, in page order."""
+    return [text for page_texts in iter_page_texts(pdf_bytes=pdf_bytes, first_page=first_page, last_page=last_page, workers=workers) for text in page_texts]
+
+
+def iter_page_texts(pdf_bytes: bytes, first_page: int, last_page: int, workers: int) -> Iterator[List[str]]:
+    """Yield page texts for [first_page, last_page) in page order, one page range at a time.
+    Page ranges are split across a process pool whose workers each open the PDF from memory once.
+    At most two ranges per worker are in flight, so a slow consumer bounds memory. With a single
+    worker the pages are read in the calling thread from a document of its own, so files extracted
+    on concurrent threads never share one.
+    """
+    page_ranges: List[Tuple[int, int]] = split_page_range(first_page=first_page, last_page=last_page, parts=workers * PAGES_PER_TASK_TARGET)
+    if workers <= 1 or len(page_ranges) <= 1:
+        document: pypdfDocument = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            for start, end in page_ranges:
+                yield extract_page_range(start, end, document=document)
+        finally:
+            document.close()
+        return
+
+    LOG.info(f"Extracting pages {first_page}-{last_page} across {workers} processes in {len(page_ranges)} tasks")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+        initializer=init_extraction_worker, initargs=(pdf_bytes,)
+    ) as executor:
+        pending: Deque[concurrent.futures.Future] = deque()
+        remaining_ranges: Iterator[Tuple[int, int]] = iter(page_ranges)
+        try:
+            for start, end in islice(remaining_ranges, workers * 2):
+                pending.append(executor.submit(extract_page_range, start, end))
+            while pending:
+                page_texts: List[str] = pending.popleft().result()
+                for start, end in islice(remaining_ranges, 1):
+                    pending.append(executor.submit(extract_page_range, start, end))
+                yield page_texts
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def split_page_range(first_page: int, last_page: int, parts: int) -> List[Tuple[int, int]]:
+    total_pages: int = max(last_page - first_page, 0)
+    if total_pages == 0:
+        return []
+    pages_per_part: int = max(-(-total_pages // max(parts, 1)), 1)
+    return [(start, min(start + pages_per_part, last_page)) for start in range(first_page, last_page, pages_per_part)]
+
+
+def init_extraction_worker(pdf_bytes: bytes):
+    global _worker_document
+    _worker_document = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+
+
+def extract_page_range(start: int, end: int, document: Optional[pypdfDocument] = None) -> List[str]:
+    """Extract pages [start, end) from the given document, or from the pool worker's document."""
+    document = document if document is not None else _worker_document
+    return [document.load_page(page_number).get_text("text").replace('\n', ' ') for page_number in range(start, end)]
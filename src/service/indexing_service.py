@@ -1,25 +1,110 @@
 import logging
+import hashlib
+import json
 from typing import List
-from src.models import RawDocument
+from src import config
+from src.models import RawDocument, BibleMetadata, VerseSegment
+from src.service.token_service import count_tokens
+from src.clients.vector_client import get_lexical_index
 
 from llama_index.core.schema import BaseNode, TextNode
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up SERVICE - {__name__}")
 
+EMBEDDING_MODEL: str = config.env_config.OPEN_AI_EMBEDDING_MODEL
+EMBEDDING_DIMENSIONS: int = config.env_config.OPEN_AI_EMBEDDING_DIMENSIONS
+DOCUMENT_EMBEDDING_FORMAT: str = config.env_config.DOCUMENT_EMBEDDING_FORMAT
+CHUNK_MAX_TOKENS: int = config.env_config.CHUNK_MAX_TOKENS
+CHUNK_OVERLAP_VERSES: int = config.env_config.CHUNK_OVERLAP_VERSES
+
 
 def chunk_all_documents(raw_bible: List[RawDocument], version: str) -> List[BaseNode]:
-    """Chunk all documents into nodes."""
+    """Chunk all documents into nodes, packing whole verses of a chapter up to the token budget."""
     LOG.info(f"Chunking {len(raw_bible)} pages for Bible version: {version}")
     bible_nodes: List[TextNode] = []
     for raw_page in raw_bible:
-        page_identifier: str = f"{raw_page.metadata['book']}-{raw_page.metadata['chapter']}-{raw_page.doc_id}-{version}"
-        node: TextNode = TextNode(
-            node_id=page_identifier,
-            text=raw_page.doc_data,
-            metadata=raw_page.metadata
-        )
-        bible_nodes.append(node)
+        bible_nodes.extend(chunk_page(raw_page=raw_page, version=version))
 
     LOG.info(f"Chunking completed for Bible version: {version}, total nodes created: {len(bible_nodes)}")
-    return bible_nodes
\ No newline at end of file
+    return bible_nodes
+
+
+def chunk_page(raw_page: RawDocument, version: str) -> List[TextNode]:
+    """Pack a tagged page's verse segments into chunks that never cross a chapter boundary."""
+    segments: List[VerseSegment] = raw_page.verse_segments
+    segment_tokens: List[int] = [count_tokens(segment.text) for segment in segments]
+    chunks: List[List[VerseSegment]] = []
+    current: List[int] = []
+    current_tokens: int = 0
+    for position, segment in enumerate(segments):
+        starts_chapter: bool = bool(current) and segment.chapter != segments[current[-1]].chapter
+        if current and (starts_chapter or current_tokens + segment_tokens[position] > CHUNK_MAX_TOKENS):
+            chunks.append([segments[i] for i in current])
+            overlap: List[int] = [] if starts_chapter else current[-CHUNK_OVERLAP_VERSES:] if CHUNK_OVERLAP_VERSES else []
+            # Never carry the whole chunk forward, or a run of long verses would repeat forever
+            current = overlap if len(overlap) < len(current) else []
+            current_tokens = sum(segment_tokens[i] for i in current)
+        current.append(position)
+        current_tokens += segment_tokens[position]
+    if current:
+        chunks.append([segments[i] for i in current])
+
+    return [build_chunk_node(raw_page=raw_page, chunk=chunk, chunk_index=index, version=version) for index, chunk in enumerate(chunks)]
+
+
+def build_chunk_node(raw_page: RawDocument, chunk: List[VerseSegment], chunk_index: int, version: str) -> TextNode:
+    """Create a node for a chunk of verses with its chapter and verse range in the metadata."""
+    text: str = "\n".join(segment.text for segment in chunk)
+    verses: List[int] = [segment.verse for segment in chunk if segment.verse is not None]
+    chunk_metadata: BibleMetadata = BibleMetadata(**raw_page.metadata)
+    chunk_metadata.chapter = chunk[0].chapter
+    chunk_metadata.verses = verses
+    chunk_metadata.verse_start = verses[0] if verses else None
+    chunk_metadata.verse_end = verses[-1] if verses else None
+    chunk_metadata.token_count = count_tokens(text)
+
+    node_identifier: str = f"{chunk_metadata.book}-{chunk_metadata.chapter}-{raw_page.doc_id}-{chunk_index}-{version}"
+    if chunk_metadata.source_file:
+        node_identifier += f"-{chunk_metadata.source_file}"
+    return TextNode(
+        id_=node_identifier,
+        text=text,
+        metadata=chunk_metadata.to_dict()
+    )
+
+
+def fingerprint_node(node: BaseNode) -> str:
+    """Fingerprint a node's text, metadata and embedding settings so unchanged nodes can be skipped on re-ingest.
+    The stored embedding format is included, so changing DOCUMENT_EMBEDDING_FORMAT rewrites every document in it.
+    """
+    payload: str = json.dumps({
+        "text": node.get_content(),
+        "metadata": node.metadata,
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dimensions": EMBEDDING_DIMENSIONS,
+        "document_embedding_format": DOCUMENT_EMBEDDING_FORMAT
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def store_bible_nodes_in_lexical_index(processed_bible_nodes: List[BaseNode], version: str):
+    """Add chunked nodes to the local BM25 index, replacing any previous text for the same node ids."""
+    if not processed_bible_nodes:
+        return
+    get_lexical_index().add(nodes=processed_bible_nodes)
+    LOG.debug(f"Indexed {len(processed_bible_nodes)} nodes lexically for Bible version: {version}")
+
+
+def delete_bible_nodes_in_lexical_index(node_ids: List[str], version: str):
+    """Remove nodes that no longer exist in a Bible version from the local BM25 index."""
+    if not node_ids:
+        return
+    LOG.info(f"Deleting {len(node_ids)} removed nodes from the lexical index for Bible version: {version}")
+    get_lexical_index().delete_nodes(node_ids=node_ids)
+
+
+def persist_lexical_index(version: str):
+    """Write the BM25 index built during an ingest once, publishing it to every process."""
+    LOG.info(f"Persisting the lexical index for Bible version: {version}")
+    get_lexical_index().persist()
@@ -0,0 +1,225 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from llama_index.core.schema import BaseNode, TextNode
+from src import config
+from src.models import BibleRequest, RawDocument
+from src.service.document_service import (
+    iter_pages_from_files, get_stored_node_fingerprints, upsert_bible_nodes_in_document_db, delete_bible_nodes_in_document_db,
+    get_stored_verse_index_ids, upsert_verse_index_in_document_db, delete_verse_index_entries_in_document_db
+)
+from src.service.indexing_service import (
+    chunk_all_documents, fingerprint_node, store_bible_nodes_in_lexical_index, delete_bible_nodes_in_lexical_index,
+    persist_lexical_index
+)
+from src.service.verse_service import clear_verse_cache
+from src.service.answer_cache_service import bump_ingest_stamp, clear_cached_answers
+from src.service.postprocessing_service import identify_ceiling_exceeding_nodes, chunk_ceiling_exceeding_nodes
+from src.service.embedding_service import (
+    embed_bible_nodes, store_embedded_bible_nodes_in_vector_db, delete_embedded_bible_nodes_in_vector_db,
+    bulk_loading_vector_index, is_vector_index_empty, verify_vector_index
+)
+from src.service.metrics_service import observe_stage, record_stage_error
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+INGEST_BATCH_SIZE: int = config.env_config.INGEST_BATCH_SIZE
+INGEST_QUEUE_SIZE: int = config.env_config.INGEST_QUEUE_SIZE
+
+Stage = Tuple[str, Callable[[Any], Any]]
+StageObserver = Callable[[str, Any, float], None]
+_END_OF_STREAM = object()
+
+
+class StagePipeline:
+    """Runs a source and a chain of stages on their own threads, connected by bounded queues.
+
+    A full queue blocks the stage feeding it, so a slow stage throttles everything upstream and
+    at most queue_size batches wait between any two stages. Once a stage fails the source stops,
+    the remaining stages drain without processing, and run() re-raises the first error.
+    An optional observer is called with (stage name, input item, seconds spent) after each item.
+    """
+
+    def __init__(self, name: str, queue_size: int, observer: Optional[StageObserver] = None):
+        self.name = name
+        self.queue_size = queue_size
+        self.observer = observer
+        self.failed_stage: Optional[str] = None
+        self._error: Optional[BaseException] = None
+        self._failed = threading.Event()
+
+    def run(self, source: Iterable[Any], stages: List[Stage]):
+        queues: List[queue.Queue] = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        threads: List[threading.Thread] = [
+            threading.Thread(target=self._run_source, args=(source, queues[0]), name=f"{self.name}-source", daemon=True)
+        ]
+        for index, (stage_name, stage) in enumerate(stages):
+            output_queue: Optional[queue.Queue] = queues[index + 1] if index + 1 < len(queues) else None
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(stage_name, stage, queues[index], output_queue),
+                name=f"{self.name}-{stage_name}", daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run_source(self, source: Iterable[Any], output_queue: queue.Queue):
+        try:
+            source_iterator: Iterator[Any] = iter(source)
+            while not self._failed.is_set():
+                started: float = time.perf_counter()
+                item = next(source_iterator, _END_OF_STREAM)
+                if item is _END_OF_STREAM:
+                    break
+                self._observe("source", item, time.perf_counter() - started)
+                output_queue.put(item)
+        except BaseException as e:
+            self._fail("source", e)
+        finally:
+            output_queue.put(_END_OF_STREAM)
+
+    def _run_stage(self, stage_name: str, stage: Callable[[Any], Any], input_queue: queue.Queue, output_queue: Optional[queue.Queue]):
+        while True:
+            item = input_queue.get()
+            if item is _END_OF_STREAM:
+                break
+            if self._failed.is_set():
+                continue  # keep draining so upstream stages are never blocked on a full queue
+            try:
+                started: float = time.perf_counter()
+                result = stage(item)
+                self._observe(stage_name, item, time.perf_counter() - started)
+                if output_queue is not None:
+                    output_queue.put(result)
+            except BaseException as e:
+                self._fail(stage_name, e)
+        if output_queue is not None:
+            output_queue.put(_END_OF_STREAM)
+
+    def _observe(self, stage_name: str, item: Any, seconds: float):
+        if self.observer is not None:
+            try:
+                self.observer(stage_name, item, seconds)
+            except Exception as e:
+                LOG.warning(f"{self.name} pipeline observer failed for stage '{stage_name}': {str(e)}")
+
+    def _fail(self, stage_name: str, error: BaseException):
+        LOG.error(f"{self.name} pipeline stage '{stage_name}' failed: {str(error)}")
+        if not self._failed.is_set():
+            self.failed_stage = stage_name
+            self._error = error
+            self._failed.set()
+
+
+def run_ingestion_pipeline(bible_request: BibleRequest, observer: Optional[StageObserver] = None):
+    """Ingest the uploaded Bible files, streaming page batches through extract -> index verses -> chunk -> lexical index -> diff -> embed -> store.
+    Only nodes whose fingerprint differs from the stored one are embedded and upserted; nodes that are
+    no longer produced are deleted once every batch has been stored, so the index is never emptied.
+    The observer sees the source as the 'extract' stage. Stage timings are also recorded as ingest_<stage> metrics.
+    The run ends by checking the vector index holds every node produced, naming any that are missing.
+    """
+    version: str = bible_request.version
+    stored_fingerprints: Dict[str, Optional[str]] = get_stored_node_fingerprints(version=version)
+    seen_node_ids: Set[str] = set()
+    stored_verse_ids: Set[str] = get_stored_verse_index_ids(version=version)
+    seen_verse_ids: Set[str] = set()
+    LOG.info(f"Found {len(stored_fingerprints)} stored nodes for Bible version: {version}")
+
+    stages: List[Stage] = [
+        ("index_verses", lambda raw_pages: index_verses_for_version(raw_pages=raw_pages, version=version, seen_verse_ids=seen_verse_ids)),
+        ("chunk", lambda raw_pages: chunk_page_batch(raw_pages=raw_pages, version=version)),
+        ("index_lexical", lambda nodes: index_lexical_for_version(nodes=nodes, version=version)),
+        ("diff", lambda nodes: select_changed_nodes(nodes=nodes, stored_fingerprints=stored_fingerprints, seen_node_ids=seen_node_ids)),
+        ("embed", lambda nodes: embed_node_batch_for_version(nodes=nodes, version=version)),
+        ("store_vectors", lambda nodes: store_vectors_for_version(nodes=nodes, version=version)),
+        ("store_documents", lambda nodes: upsert_bible_nodes_in_document_db(processed_bible_nodes=nodes, version=version)),
+    ]
+
+    def observe(stage_name: str, item: Any, seconds: float):
+        stage_name = "extract" if stage_name == "source" else stage_name
+        observe_stage(stage=f"ingest_{stage_name}", seconds=seconds)
+        if observer is not None:
+            observer(stage_name, item, seconds)
+
+    pipeline: StagePipeline = StagePipeline(name=f"ingest-{version}", queue_size=INGEST_QUEUE_SIZE, observer=observe)
+    # Only an index holding no version at all is bulk loaded without refreshes or replicas; otherwise it is serving queries
+    bulk_load: bool = not stored_fingerprints and is_vector_index_empty()
+    with bulk_loading_vector_index(version=version) if bulk_load else nullcontext():
+        try:
+            pipeline.run(source=iter_page_batches(bible_request=bible_request), stages=stages)
+        except Exception as e:
+            record_stage_error(stage=f"ingest_{'extract' if pipeline.failed_stage == 'source' else pipeline.failed_stage}")
+            raise RuntimeError(f"Ingestion stage '{pipeline.failed_stage}' failed: {str(e)}") from e
+
+    removed_node_ids: List[str] = sorted(set(stored_fingerprints) - seen_node_ids)
+    delete_embedded_bible_nodes_in_vector_db(node_ids=removed_node_ids, version=version)
+    verify_vector_index(node_ids=seen_node_ids, version=version)
+    delete_bible_nodes_in_lexical_index(node_ids=removed_node_ids, version=version)
+    persist_lexical_index(version=version)
+    delete_bible_nodes_in_document_db(node_ids=removed_node_ids, version=version)
+    delete_verse_index_entries_in_document_db(entry_ids=sorted(stored_verse_ids - seen_verse_ids), version=version)
+    clear_verse_cache()
+    bump_ingest_stamp(version=version)
+    clear_cached_answers(version=version)
+    LOG.info(f"Re-index for Bible version {version}: {len(seen_node_ids)} nodes, {len(removed_node_ids)} removed")
+
+
+def select_changed_nodes(nodes: List[BaseNode], stored_fingerprints: Dict[str, Optional[str]], seen_node_ids: Set[str]) -> List[BaseNode]:
+    """Keep only nodes that are new or whose fingerprint changed, recording every node id seen."""
+    changed_nodes: List[BaseNode] = []
+    for node in nodes:
+        seen_node_ids.add(node.node_id)
+        if stored_fingerprints.get(node.node_id) != fingerprint_node(node=node):
+            changed_nodes.append(node)
+    LOG.info(f"{len(changed_nodes)} of {len(nodes)} nodes changed in batch")
+    return changed_nodes
+
+
+def iter_page_batches(bible_request: BibleRequest) -> Iterator[List[RawDocument]]:
+    """Re-batch extracted pages from every uploaded file into INGEST_BATCH_SIZE page batches."""
+    batch: List[RawDocument] = []
+    for raw_pages in iter_pages_from_files(files=bible_request.files):
+        batch.extend(raw_pages)
+        while len(batch) >= INGEST_BATCH_SIZE:
+            yield batch[:INGEST_BATCH_SIZE]
+            batch = batch[INGEST_BATCH_SIZE:]
+    if batch:
+        yield batch
+
+
+def index_verses_for_version(raw_pages: List[RawDocument], version: str, seen_verse_ids: Set[str]) -> List[RawDocument]:
+    seen_verse_ids.update(upsert_verse_index_in_document_db(raw_pages=raw_pages, version=version))
+    return raw_pages
+
+
+def chunk_page_batch(raw_pages: List[RawDocument], version: str) -> List[BaseNode]:
+    chunked_bible_nodes: List[TextNode] = chunk_all_documents(raw_bible=raw_pages, version=version)
+    ceiling_exceeding_nodes, chunked_bible_nodes = identify_ceiling_exceeding_nodes(nodes=chunked_bible_nodes, version=version)
+    if ceiling_exceeding_nodes:
+        chunked_bible_nodes.extend(chunk_ceiling_exceeding_nodes(nodes=ceiling_exceeding_nodes, version=version))
+    return chunked_bible_nodes
+
+
+def index_lexical_for_version(nodes: List[BaseNode], version: str) -> List[BaseNode]:
+    # Every chunked node is indexed, not just changed ones, so a new or rebuilt lexical index is complete after one run
+    store_bible_nodes_in_lexical_index(processed_bible_nodes=nodes, version=version)
+    return nodes
+
+
+def embed_node_batch_for_version(nodes: List[BaseNode], version: str) -> List[BaseNode]:
+    embed_bible_nodes(processed_bible_nodes=nodes, version=version)
+    return nodes
+
+
+def store_vectors_for_version(nodes: List[BaseNode], version: str) -> List[BaseNode]:
+    store_embedded_bible_nodes_in_vector_db(processed_bible_nodes=nodes, version=version)
+    return nodes
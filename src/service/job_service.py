@@ -0,0 +1,114 @@
+import logging
+import concurrent.futures
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from werkzeug.datastructures import FileStorage
+from src import config
+from src.models import BibleRequest, IngestionJob, StageProgress
+from src.clients.mongo_client import get_mongo_job_collection
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+INGEST_JOB_HISTORY: int = config.env_config.INGEST_JOB_HISTORY
+INGEST_JOB_PERSIST_SECONDS: float = config.env_config.INGEST_JOB_PERSIST_SECONDS
+
+ingestion_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=config.env_config.INGEST_JOB_WORKERS, thread_name_prefix="ingest-job"
+)
+_jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+_last_persisted: Dict[str, float] = {}
+_jobs_lock = threading.Lock()
+
+
+def submit_ingestion_job(bible_request: BibleRequest) -> IngestionJob:
+    """Queue an ingestion job for the request's files and return it immediately.
+    Uploads are copied into memory first because Flask closes them when the request ends.
+    """
+    buffered_files: List[FileStorage] = [
+        FileStorage(stream=io.BytesIO(file.read()), filename=file.filename, content_type=file.content_type)
+        for file in bible_request.files
+    ]
+    job: IngestionJob = IngestionJob(
+        job_id=str(uuid.uuid4()),
+        version=bible_request.version,
+        files=[file.filename for file in buffered_files],
+        created_at=time.time()
+    )
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    persist_job(job=job, force=True)
+
+    job_request: BibleRequest = BibleRequest(version=bible_request.version, files=buffered_files)
+    ingestion_executor.submit(run_ingestion_job, job, job_request)
+    LOG.info(f"Submitted ingestion job {job.job_id} for Bible version: {job.version} with files: {job.files}")
+    return job
+
+
+def run_ingestion_job(job: IngestionJob, bible_request: BibleRequest):
+    job.status = "RUNNING"
+    job.started_at = time.time()
+    persist_job(job=job, force=True)
+    LOG.info(f"Ingestion job {job.job_id} for Bible version: {job.version} STARTED")
+
+    try:
+        # Imported on first use so job status lookups never load the PDF and llama_index stack
+        from src.service.ingestion_service import run_ingestion_pipeline
+        run_ingestion_pipeline(
+            bible_request=bible_request,
+            observer=lambda stage_name, item, seconds: record_stage_progress(job=job, stage_name=stage_name, item=item, seconds=seconds)
+        )
+        job.status = "SUCCEEDED"
+        LOG.info(f"Ingestion job {job.job_id} for Bible version: {job.version} COMPLETED")
+    except Exception as e:
+        job.status = "FAILED"
+        job.errors.append(str(e))
+        LOG.error(f"Ingestion job {job.job_id} for Bible version: {job.version} FAILED: {str(e)}")
+    finally:
+        job.finished_at = time.time()
+        persist_job(job=job, force=True)
+        prune_finished_jobs()
+
+
+def record_stage_progress(job: IngestionJob, stage_name: str, item: Any, seconds: float):
+    with _jobs_lock:
+        progress: StageProgress = job.stages.setdefault(stage_name, StageProgress())
+        progress.items += len(item) if isinstance(item, list) else 1
+        progress.batches += 1
+        progress.seconds += seconds
+    persist_job(job=job)
+
+
+def get_ingestion_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a job's status from this process, or from Mongo when another worker ran it."""
+    with _jobs_lock:
+        job: Optional[IngestionJob] = _jobs.get(job_id)
+        if job is not None:
+            return job.to_dict(now=time.time())
+    return get_mongo_job_collection().find_one({"job_id": job_id}, {"_id": 0})
+
+
+def persist_job(job: IngestionJob, force: bool = False):
+    """Write a job snapshot to Mongo, at most every INGEST_JOB_PERSIST_SECONDS unless forced."""
+    now: float = time.time()
+    with _jobs_lock:
+        if not force and now - _last_persisted.get(job.job_id, 0.0) < INGEST_JOB_PERSIST_SECONDS:
+            return
+        _last_persisted[job.job_id] = now
+        snapshot: Dict[str, Any] = job.to_dict(now=now)
+    try:
+        get_mongo_job_collection().replace_one({"job_id": job.job_id}, snapshot, upsert=True)
+    except Exception as e:
+        LOG.warning(f"Unable to persist ingestion job {job.job_id}: {str(e)}")
+
+
+def prune_finished_jobs():
+    with _jobs_lock:
+        finished_ids: List[str] = [job_id for job_id, job in _jobs.items() if job.finished_at is not None]
+        for job_id in finished_ids[:max(len(finished_ids) - INGEST_JOB_HISTORY, 0)]:
+            del _jobs[job_id]
+            _last_persisted.pop(job_id, None)
@@ -0,0 +1,301 @@
+import bisect
+import concurrent.futures
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """A named metric family whose samples are keyed by label values, in Prometheus exposition terms."""
+
+    kind: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names: Tuple[str, ...] = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, label_values: LabelValues, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs: List[Tuple[str, str]] = list(zip(self.label_names, label_values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._render_samples()
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key: LabelValues = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            values: List[Tuple[LabelValues, float]] = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any):
+        key: LabelValues = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class CounterSnapshot(Gauge):
+    """A counter whose values are copied at scrape time from state owned elsewhere."""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observe() is a bisect and two additions under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key: LabelValues = self._label_values(labels)
+        bucket: int = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts: Optional[List[int]] = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[bucket] += 1
+            self._sums[key] += value
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            snapshot: List[Tuple[LabelValues, List[int], float]] = [
+                (key, list(counts), self._sums[key]) for key, counts in sorted(self._counts.items())
+            ]
+        lines: List[str] = []
+        for key, counts, total in snapshot:
+            cumulative: int = 0
+            for upper_bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', format_value(upper_bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the process's metrics plus collectors that report state owned elsewhere (e.g. cache statistics) at scrape time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], List[Metric]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[Metric]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics: List[Metric] = list(self._metrics.values())
+            collectors: List[Callable[[], List[Metric]]] = list(self._collectors)
+        for collector in collectors:
+            try:
+                metrics.extend(collector())
+            except Exception as e:
+                LOG.warning(f"Metrics collector failed: {str(e)}")
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+class RequestTimings:
+    """Per-request totals of span durations, reported in the Server-Timing header."""
+
+    def __init__(self):
+        self.started: float = time.perf_counter()
+        self._durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._durations[stage] = self._durations.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        with self._lock:
+            durations: List[Tuple[str, float]] = list(self._durations.items())
+        durations.append(("total", time.perf_counter() - self.started))
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics_registry: MetricsRegistry = MetricsRegistry()
+stage_duration_seconds: Histogram = metrics_registry.register(Histogram(
+    "bible_rag_stage_duration_seconds", "Time spent in each query and ingestion stage.", ("stage",)
+))
+stage_errors_total: Counter = metrics_registry.register(Counter(
+    "bible_rag_stage_errors_total", "Stages that raised an error.", ("stage",)
+))
+http_request_duration_seconds: Histogram = metrics_registry.register(Histogram(
+    "bible_rag_http_request_duration_seconds", "HTTP request latency by endpoint and status.", ("endpoint", "method", "status")
+))
+http_requests_in_flight: Gauge = metrics_registry.register(Gauge(
+    "bible_rag_http_requests_in_flight", "HTTP requests currently being served.", ("endpoint",)
+))
+openai_tokens_total: Counter = metrics_registry.register(Counter(
+    "bible_rag_openai_tokens_total", "Tokens reported in OpenAI response usage.", ("model", "kind")
+))
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+_cache_stats: List[Callable[[], Dict[str, Any]]] = []
+_rate_limiter_stats: List[Callable[[], Dict[str, Any]]] = []
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block (or, as a decorator, a function) into the stage histogram and the current request's timings."""
+    started: float = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_stage_error(stage=stage)
+        raise
+    finally:
+        observe_stage(stage=stage, seconds=time.perf_counter() - started)
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_duration_seconds.observe(seconds, stage=stage)
+    timings: Optional[RequestTimings] = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def record_stage_error(stage: str):
+    stage_errors_total.inc(stage=stage)
+
+
+def record_openai_usage(response: Any):
+    """Count prompt and completion tokens from an OpenAI response (or stream chunk) whose usage may be missing."""
+    usage: Any = getattr(response, "usage", None)
+    if usage is None:
+        return
+    model: str = getattr(response, "model", None) or "unknown"
+    for kind in ("prompt", "completion"):
+        tokens: Optional[int] = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            openai_tokens_total.inc(tokens, model=model, kind=kind)
+
+
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set(RequestTimings())
+
+
+def get_request_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+
+def end_request_timings(token: contextvars.Token):
+    try:
+        _request_timings.reset(token)
+    except (ValueError, RuntimeError):
+        # A streamed response finishes in a different context from the one that started it
+        _request_timings.set(None)
+
+
+def submit_with_context(executor: concurrent.futures.Executor, function: Callable, *args: Any) -> concurrent.futures.Future:
+    """Submit work to a thread pool so its spans still count towards the submitting request's timings."""
+    return executor.submit(contextvars.copy_context().run, function, *args)
+
+
+def register_cache_stats(stats: Callable[[], Dict[str, Any]]):
+    """Expose a cache's stats() (name, size, hits, misses) on /metrics."""
+    _cache_stats.append(stats)
+
+
+def collect_cache_metrics() -> List[Metric]:
+    hits: CounterSnapshot = CounterSnapshot("bible_rag_cache_hits_total", "Cache lookups served from the cache.", ("cache",))
+    misses: CounterSnapshot = CounterSnapshot("bible_rag_cache_misses_total", "Cache lookups that missed.", ("cache",))
+    entries: Gauge = Gauge("bible_rag_cache_entries", "Entries currently held by the cache.", ("cache",))
+    for stats in _cache_stats:
+        cache_stats: Dict[str, Any] = stats()
+        hits.set(cache_stats["hits"], cache=cache_stats["name"])
+        misses.set(cache_stats["misses"], cache=cache_stats["name"])
+        entries.set(cache_stats["size"], cache=cache_stats["name"])
+    return [hits, misses, entries]
+
+
+def register_rate_limiter_stats(stats: Callable[[], Dict[str, Any]]):
+    """Expose a rate limiter's stats() (name, limit, in_flight, throttled, waited_seconds) on /metrics."""
+    _rate_limiter_stats.append(stats)
+
+
+def collect_rate_limiter_metrics() -> List[Metric]:
+    limit: Gauge = Gauge("bible_rag_openai_concurrency_limit", "Adaptive concurrency limit for OpenAI calls.", ("api",))
+    in_flight: Gauge = Gauge("bible_rag_openai_requests_in_flight", "OpenAI calls currently holding a rate-limit permit.", ("api",))
+    throttled: CounterSnapshot = CounterSnapshot("bible_rag_openai_rate_limited_total", "OpenAI calls rejected with 429.", ("api",))
+    waited: CounterSnapshot = CounterSnapshot("bible_rag_openai_rate_limit_wait_seconds_total", "Time calls waited for rate-limit budget.", ("api",))
+    for stats in _rate_limiter_stats:
+        limiter_stats: Dict[str, Any] = stats()
+        limit.set(limiter_stats["limit"], api=limiter_stats["name"])
+        in_flight.set(limiter_stats["in_flight"], api=limiter_stats["name"])
+        throttled.set(limiter_stats["throttled"], api=limiter_stats["name"])
+        waited.set(limiter_stats["waited_seconds"], api=limiter_stats["name"])
+    return [limit, in_flight, throttled, waited]
+
+
+def render_metrics() -> str:
+    return metrics_registry.render()
+
+
+metrics_registry.add_collector(collect_cache_metrics)
+metrics_registry.add_collector(collect_rate_limiter_metrics)
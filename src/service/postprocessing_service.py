@@ -1,22 +1,49 @@
 import logging
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.schema import BaseNode, TextNode
+from src import config
+from src.service.token_service import count_tokens, get_encoding
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up SERVICE - {__name__}")
 
+EMBEDDING_MODEL: str = config.env_config.OPEN_AI_EMBEDDING_MODEL
+CHUNK_TOKEN_CEILING: int = config.env_config.CHUNK_TOKEN_CEILING
+
 
 def identify_ceiling_exceeding_nodes(nodes: List[TextNode], version: str) -> Tuple[List[TextNode], List[TextNode]]:
-    """Identify nodes that exceed the token ceiling."""
+    """Identify nodes that exceed the token ceiling, using the token count stored at chunking when the node has one."""
     LOG.info(f"postprocessing_service: Identifying ceiling exceeding nodes for Bible version: {version}")
-    # Current chunking logic has potential for 0 ceiling exceeding nodes, so we return empty list for ceiling exceeding nodes
-    # This is a placeholder for the actual logic to identify nodes that exceed the token ceiling if future requirements change
-    return [], nodes
+    ceiling_exceeding_nodes: List[TextNode] = []
+    within_ceiling_nodes: List[TextNode] = []
+    for node in nodes:
+        token_count: Optional[int] = node.metadata.get("token_count")
+        if token_count is None:
+            token_count = count_tokens(node.get_content())
+        if token_count > CHUNK_TOKEN_CEILING:
+            ceiling_exceeding_nodes.append(node)
+        else:
+            within_ceiling_nodes.append(node)
+    if ceiling_exceeding_nodes:
+        LOG.info(f"postprocessing_service: {len(ceiling_exceeding_nodes)} nodes exceed the {CHUNK_TOKEN_CEILING} token ceiling for Bible version: {version}")
+    return ceiling_exceeding_nodes, within_ceiling_nodes
+
 
 def chunk_ceiling_exceeding_nodes(nodes: List[BaseNode], version: str) -> List[BaseNode]:
-    """Chunk nodes that exceed the token ceiling into smaller nodes."""
+    """Chunk nodes that exceed the token ceiling into smaller nodes, splitting on sentence boundaries where possible."""
     LOG.info(f"postprocessing_service: Chunking {len(nodes)} ceiling exceeding nodes for Bible version: {version}")
-    return []
-
-    
-    
\ No newline at end of file
+    splitter: SentenceSplitter = SentenceSplitter(
+        chunk_size=CHUNK_TOKEN_CEILING,
+        chunk_overlap=0,
+        tokenizer=get_encoding(EMBEDDING_MODEL).encode
+    )
+    chunked_nodes: List[BaseNode] = []
+    for node in nodes:
+        for part, text in enumerate(splitter.split_text(node.get_content())):
+            chunked_nodes.append(TextNode(
+                id_=f"{node.node_id}-part{part}",
+                text=text,
+                metadata={**node.metadata, "token_count": count_tokens(text)}
+            ))
+    return chunked_nodes
@@ -1,13 +1,33 @@
 import logging 
-from typing import Dict, Iterable, List
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from src import config
 from src.models import Prompt
-from src.clients.mongo_client import get_mongo_prompt_collection
+from src.clients.mongo_client import get_mongo_prompt_collection, get_mongo_prompt_stamp_collection
+from src.service.metrics_service import span
+from src.service.answer_cache_service import clear_cached_answers
 from pymongo.collection import Collection
 
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Setting up SERVICE - {__name__}")
 
+PROMPT_CACHE_STAMP_CHECK_SECONDS: float = config.env_config.PROMPT_CACHE_STAMP_CHECK_SECONDS
+
+
+@dataclass
+class CachedPrompts:
+    """Prompts for a Bible version along with the version stamp they were read under."""
+    prompts: Dict[str, Dict]
+    stamp: int
+    checked_at: float
+
+
+_prompt_cache: Dict[str, CachedPrompts] = {}
+_prompt_cache_lock = threading.Lock()
+
 
 def store_prompts(prompts: List[Prompt]):
     if not prompts:
@@ -25,6 +45,11 @@ def store_prompts(prompts: List[Prompt]):
         )
 
     LOG.info(f"Insert/Updated {len(prompts)} prompts for Bible version: {prompt.version}")
+
+    for version in {prompt.version for prompt in prompts}:
+        bump_prompt_stamp(version=version)
+        invalidate_prompt_cache(version=version)
+        clear_cached_answers(version=version)
     
 
 def get_prompts(version: str) -> Dict[str, Dict]:
@@ -43,6 +68,47 @@ def get_prompts(version: str) -> Dict[str, Dict]:
     return results
 
 
+@span("prompts")
+def get_cached_prompts(version: str) -> Dict[str, Dict]:
+    """Get prompts for a version from the in-process cache.
+    The stored version stamp is re-checked every PROMPT_CACHE_STAMP_CHECK_SECONDS so prompt
+    updates made through another worker are picked up.
+    """
+    with _prompt_cache_lock:
+        cached_prompts: Optional[CachedPrompts] = _prompt_cache.get(version)
+    now: float = time.monotonic()
+    if cached_prompts and now - cached_prompts.checked_at < PROMPT_CACHE_STAMP_CHECK_SECONDS:
+        return cached_prompts.prompts
+
+    # Read the stamp before the prompts so a concurrent update is caught on the next check
+    stamp: int = get_prompt_stamp(version=version)
+    if cached_prompts and cached_prompts.stamp == stamp:
+        cached_prompts.checked_at = now
+        return cached_prompts.prompts
+
+    LOG.info(f"Loading prompts into cache for Bible version: {version}")
+    prompts: Dict[str, Dict] = get_prompts(version=version)
+    with _prompt_cache_lock:
+        _prompt_cache[version] = CachedPrompts(prompts=prompts, stamp=stamp, checked_at=now)
+    return prompts
+
+
+def invalidate_prompt_cache(version: str):
+    with _prompt_cache_lock:
+        _prompt_cache.pop(version, None)
+
+
+def get_prompt_stamp(version: str) -> int:
+    stamp_document: Optional[Dict] = get_mongo_prompt_stamp_collection().find_one({"_id": version}, {"stamp": 1})
+    # Re-ingesting a version creates its stamp document with only an ingest_stamp
+    return stamp_document.get("stamp", 0) if stamp_document else 0
+
+
+def bump_prompt_stamp(version: str):
+    """Increment the version stamp so every worker reloads its cached prompts."""
+    get_mongo_prompt_stamp_collection().update_one({"_id": version}, {"$inc": {"stamp": 1}}, upsert=True)
+
+
 def get_user_query_prompt(system_context: str, question_context: str, query: str) -> str:
     user_prompt: str = f"SYSTEM_CONTEXT: {system_context}"
     user_prompt += f"\nQUESTION_CONTEXT(CHUNKS, SCRIPTURE): {question_context}"
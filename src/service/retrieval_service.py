@@ -1,57 +1,270 @@
 import logging
-from typing import Dict, Iterable, List
-from llama_index.vector_stores.opensearch import OpensearchVectorStore
+import concurrent.futures
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
 from llama_index.core.vector_stores.types import (
     MetadataFilter, MetadataFilters, FilterCondition, FilterOperator, 
     VectorStoreQuery, VectorStoreQueryResult
 )
-from llama_index.core.schema import BaseNode
+from llama_index.core.schema import BaseNode, TextNode
 from llama_index.core.llms import ChatMessage, MessageRole
 from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
-from src.models import BibleRequest, BibleReference
-from src.clients.vector_client import get_opensearch_vector_store
-from src.clients.llm_client import get_chat_response
-from src.service.embedding_service import get_text_embedding
-from src.service.chat_service import get_chat_history, update_chat_history, map_chat_messages
-from src.service.prompting_service import get_prompts, get_user_query_prompt
+from src import config
+from src.models import BibleRequest, BibleReference, BibleMetadata, QueryContext
+from src.clients.vector_client import VectorBackend, get_vector_store, get_lexical_index
+from src.clients.llm_client import get_chat_response, stream_chat_response, chat_rate_limiter
+from src.service.embedding_service import get_cached_text_embedding, attach_stored_embeddings
+from src.service.chat_service import get_chat_history, record_chat_turn, map_chat_messages
+from src.service.prompting_service import get_cached_prompts, get_user_query_prompt
+from src.service.cache_service import TTLCache, normalize_query
+from src.service.answer_cache_service import get_cached_answer
+from src.service.verse_service import get_chapter_verses, select_verses
+from src.service.context_service import CONTEXT_SEPARATOR, assemble_context
+from src.service.metrics_service import span, observe_stage, submit_with_context, record_openai_usage, register_rate_limiter_stats
 
 
 LOG = logging.getLogger(__name__)
 LOG.info(f"Settup up SERVICE - {__name__}")
 
+QUERY_STEP_TIMEOUT_SECONDS: Dict[str, float] = config.env_config.QUERY_STEP_TIMEOUT_SECONDS
+DIRECT_LOOKUP_ENABLED: bool = config.env_config.DIRECT_LOOKUP_ENABLED
+DIRECT_LOOKUP_MAX_VERSES: int = config.env_config.DIRECT_LOOKUP_MAX_VERSES
+RETRIEVAL_MODE: str = config.env_config.RETRIEVAL_MODE
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+RETRIEVAL_RRF_K: int = config.env_config.RETRIEVAL_RRF_K
+LEXICAL_FALLBACK_ENABLED: bool = config.env_config.LEXICAL_FALLBACK_ENABLED
+MAX_TOP_K: int = 20 # candidates retrieved; assemble_context picks how many reach the prompt
+query_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=config.env_config.QUERY_EXECUTOR_WORKERS, thread_name_prefix="query"
+)
+register_rate_limiter_stats(chat_rate_limiter.stats)
+query_embedding_cache: TTLCache = TTLCache(
+    name="query_embedding",
+    max_size=config.env_config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=config.env_config.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+
+
+def prepare_query_context(bible_request: BibleRequest) -> QueryContext:
+    """Gather chat history, prompts and retrieval results concurrently on the shared query executor.
+    Requests that name exact chapters or verses are answered from the verse index without embedding
+    the query, and every passage is passed on whole. Otherwise retrieval follows the request's retrieval mode: 'vector' embeds the query
+    while history and prompts load, then submits k-NN; 'lexical' searches the local BM25 index only;
+    'hybrid' does both and fuses the rankings. Each step is bounded by its QUERY_STEP_TIMEOUT_SECONDS
+    entry, and if embedding or k-NN fails BM25 results are served instead when LEXICAL_FALLBACK_ENABLED.
+    First-turn vector questions are checked against the semantic answer cache; on a hit the
+    in-flight retrieval is abandoned.
+    """
+    history_future = submit_with_context(query_executor, get_chat_history, bible_request.session_id) if bible_request.session_id else None
+    prompts_future = submit_with_context(query_executor, get_cached_prompts, bible_request.version)
+
+    context: QueryContext = QueryContext(chat_history=[])
+    context.top_k_results = lookup_referenced_passages(bible_request=bible_request)
+    retrieval_mode: str = get_retrieval_mode(bible_request=bible_request)
+    retrieval_future: Optional[concurrent.futures.Future] = None
+    lexical_results: Optional[VectorStoreQueryResult] = None
+    if context.top_k_results is None:
+        if retrieval_mode in ("lexical", "hybrid"):
+            lexical_results = retrieve_lexical_query_results(bible_request=bible_request)
+        if retrieval_mode in ("vector", "hybrid"):
+            context.query_embedding = run_step_with_lexical_fallback(
+                step="embedding", future=submit_with_context(query_executor, get_query_embedding, bible_request.query)
+            )
+            if context.query_embedding is not None:
+                retrieval_future = submit_with_context(query_executor, retrieve_top_k_query_results, bible_request, context.query_embedding)
+
+    if history_future is not None:
+        context.chat_history = wait_for_step(step="chat_history", future=history_future)
+
+    # Answers are only shared between sessions when no prior conversation shapes the response
+    if retrieval_future is not None and not context.chat_history:
+        with span("answer_cache"):
+            context.cached_answer = get_cached_answer(bible_request=bible_request, query_embedding=context.query_embedding)
+        if context.cached_answer:
+            retrieval_future.cancel()
+            prompts_future.cancel()
+            return context
+
+    if context.top_k_results is None:
+        vector_results: Optional[VectorStoreQueryResult] = run_step_with_lexical_fallback(
+            step="retrieval", future=retrieval_future
+        ) if retrieval_future is not None else None
+        if vector_results is None and lexical_results is None:
+            LOG.info("Vector retrieval unavailable, serving lexical results")
+            lexical_results = retrieve_lexical_query_results(bible_request=bible_request)
+        # Only retrieved candidates are trimmed to the context budget; looked-up passages are what was asked for
+        with span("context_assembly"):
+            query_result: VectorStoreQueryResult = fuse_query_results(results=[vector_results, lexical_results])
+            query_embedding: Optional[List[float]] = context.query_embedding
+            if query_embedding is not None and not attach_candidate_embeddings(query_result=query_result, version=bible_request.version):
+                query_embedding = None
+            context.top_k_results = assemble_context(query_result=query_result, query_embedding=query_embedding)
+    context.prompts = wait_for_step(step="prompts", future=prompts_future)
+    return context
+
+
+def get_retrieval_mode(bible_request: BibleRequest) -> str:
+    retrieval_mode: str = bible_request.retrieval_mode or RETRIEVAL_MODE
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+    return retrieval_mode
+
+
+def run_step_with_lexical_fallback(step: str, future: concurrent.futures.Future):
+    """Wait for a step whose failure can be covered by lexical retrieval, returning None when it fails."""
+    try:
+        return wait_for_step(step=step, future=future)
+    except Exception as e:
+        if not LEXICAL_FALLBACK_ENABLED:
+            raise
+        LOG.warning(f"Query step '{step}' failed, falling back to lexical retrieval: {str(e)}")
+        return None
+
+
+def attach_candidate_embeddings(query_result: VectorStoreQueryResult, version: str) -> bool:
+    """Load the stored embeddings MMR needs within the 'stored_embeddings' step timeout.
+    Returns False when they could not be loaded in time, in which case chunks keep their retrieval order.
+    """
+    nodes: List[BaseNode] = list(query_result.nodes or [])
+    if all(node.embedding is not None for node in nodes):
+        return True
+    try:
+        wait_for_step(step="stored_embeddings", future=submit_with_context(query_executor, attach_stored_embeddings, nodes, version))
+        return True
+    except Exception as e:
+        LOG.warning(f"Skipping MMR reranking, stored embeddings unavailable: {str(e)}")
+        return False
+
+
+def fuse_query_results(results: List[Optional[VectorStoreQueryResult]]) -> VectorStoreQueryResult:
+    """Merge ranked result lists with reciprocal rank fusion; a single list is returned unchanged."""
+    ranked_results: List[VectorStoreQueryResult] = [result for result in results if result is not None]
+    if len(ranked_results) == 1:
+        return ranked_results[0]
+
+    scores: Dict[str, float] = {}
+    nodes: Dict[str, BaseNode] = {}
+    for result in ranked_results:
+        for rank, node in enumerate(result.nodes or []):
+            scores[node.node_id] = scores.get(node.node_id, 0.0) + 1.0 / (RETRIEVAL_RRF_K + rank + 1)
+            # Prefer the vector store's copy of a node, which carries its embedding
+            nodes.setdefault(node.node_id, node)
+    fused_ids: List[str] = sorted(scores, key=scores.get, reverse=True)[:MAX_TOP_K]
+    return VectorStoreQueryResult(
+        nodes=[nodes[node_id] for node_id in fused_ids],
+        similarities=[scores[node_id] for node_id in fused_ids],
+        ids=fused_ids
+    )
+
+
+@span("direct_lookup")
+def lookup_referenced_passages(bible_request: BibleRequest) -> Optional[VectorStoreQueryResult]:
+    """Resolve references that name a chapter (and optionally a verse range) straight from the verse index.
+    Returns one node per reference, or None when any reference is open-ended, is missing from the index
+    or the passages exceed DIRECT_LOOKUP_MAX_VERSES, so the caller falls back to semantic retrieval.
+    """
+    bible_references: List[BibleReference] = bible_request.bible_references or []
+    if not DIRECT_LOOKUP_ENABLED or not bible_references or any(reference.chapter is None for reference in bible_references):
+        return None
+
+    passage_nodes: List[TextNode] = []
+    verse_count: int = 0
+    for reference in bible_references:
+        verses: List[Dict] = select_verses(
+            verses=get_chapter_verses(version=bible_request.version, book=reference.book, chapter=reference.chapter),
+            start_verse=reference.verse,
+            end_verse=reference.end_verse
+        )
+        verse_count += len(verses)
+        if not verses or verse_count > DIRECT_LOOKUP_MAX_VERSES:
+            LOG.info(f"Direct lookup unavailable for {reference.book} {reference.chapter}, using semantic retrieval")
+            return None
+        passage_nodes.append(build_passage_node(verses=verses, version=bible_request.version))
+
+    LOG.info(f"Resolved {len(passage_nodes)} references ({verse_count} verses) from the verse index")
+    return VectorStoreQueryResult(
+        nodes=passage_nodes,
+        similarities=[1.0] * len(passage_nodes),
+        ids=[node.node_id for node in passage_nodes]
+    )
+
+
+def build_passage_node(verses: List[Dict], version: str) -> TextNode:
+    """Create a node holding a contiguous passage of verses from one chapter."""
+    first_verse: Dict = verses[0]
+    passage_metadata: BibleMetadata = BibleMetadata(
+        book=first_verse["book"],
+        chapter=first_verse["chapter"],
+        verses=[verse["verse"] for verse in verses],
+        verse_start=first_verse["verse"],
+        verse_end=verses[-1]["verse"],
+        version=version,
+        pdf_page_number=first_verse["pdf_page_numbers"][0] if first_verse["pdf_page_numbers"] else None
+    )
+    return TextNode(
+        id_=f"{passage_metadata.book}-{passage_metadata.chapter}-{passage_metadata.verse_start}-{passage_metadata.verse_end}-{version}",
+        text="\n".join(verse["text"] for verse in verses),
+        metadata=passage_metadata.to_dict()
+    )
+
+
+def wait_for_step(step: str, future: concurrent.futures.Future):
+    try:
+        return future.result(timeout=QUERY_STEP_TIMEOUT_SECONDS.get(step))
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        LOG.error(f"Query step '{step}' timed out after {QUERY_STEP_TIMEOUT_SECONDS.get(step)}s")
+        raise TimeoutError(f"Query step '{step}' timed out")
+
 
-def retrieve_top_k_query_results(bible_request: BibleRequest) -> VectorStoreQueryResult:
+def retrieve_top_k_query_results(bible_request: BibleRequest, query_embedding: Optional[List[float]] = None) -> VectorStoreQueryResult:
     if not bible_request.query and not bible_request.version:
         raise ValueError("Query and version must be provided.")
     
     # embed the query
-    query_embedding = get_text_embedding(text=bible_request.query).data[0].embedding
+    if query_embedding is None:
+        query_embedding = get_query_embedding(query=bible_request.query)
 
-    # get the opensearch vector store
-    os_vector_store: OpensearchVectorStore = get_opensearch_vector_store()
-
-    max_top_k: int = 20 # can be logic based in future enhancement
+    # get the configured vector store
+    vector_store: VectorBackend = get_vector_store()
 
     # perform the search
     vector_store_query: VectorStoreQuery = VectorStoreQuery(
-        query_embedding=query_embedding, similarity_top_k=max_top_k, filters=get_open_search_metadata_filters(bible_references=bible_request.bible_references)
+        query_embedding=query_embedding, similarity_top_k=MAX_TOP_K, filters=get_open_search_metadata_filters(bible_references=bible_request.bible_references)
+    )
+
+    with span("knn"):
+        return vector_store.query(vector_store_query)
+
+
+@span("bm25")
+def retrieve_lexical_query_results(bible_request: BibleRequest) -> VectorStoreQueryResult:
+    """Search the local BM25 index; no embedding or network call is involved."""
+    if not bible_request.query and not bible_request.version:
+        raise ValueError("Query and version must be provided.")
+    return get_lexical_index().query(
+        query_str=bible_request.query,
+        similarity_top_k=MAX_TOP_K,
+        filters=get_open_search_metadata_filters(bible_references=bible_request.bible_references)
     )
 
-    return os_vector_store.query(vector_store_query)
+
+@span("query_embedding")
+def get_query_embedding(query: str) -> List[float]:
+    """Get the embedding for a user question, served from the in-process cache when repeated."""
+    cache_key: str = normalize_query(query)
+    query_embedding: Optional[List[float]] = query_embedding_cache.get(cache_key)
+    if query_embedding is None:
+        query_embedding = get_cached_text_embedding(text=query)
+        query_embedding_cache.set(cache_key, query_embedding)
+    return query_embedding
 
 
 def get_open_search_metadata_filters(bible_references: List[BibleReference]) -> MetadataFilters:
     if not bible_references:
         raise ValueError("Bible references must be provided.")
 
-    filters = [
-        MetadataFilter(
-            key="book",
-            value=bible_reference.book,
-            operator=FilterOperator.EQ
-        )
-        for bible_reference in bible_references
-    ]
+    filters = [get_reference_metadata_filter(bible_reference=bible_reference) for bible_reference in bible_references]
 
     if len(filters) > 1:
         return MetadataFilters(filters=filters, condition=FilterCondition.OR)
@@ -59,15 +272,65 @@ def get_open_search_metadata_filters(bible_references: List[BibleReference]) ->
     return MetadataFilters(filters=filters)
 
 
-def generate_response_from_chunks(bible_request: BibleRequest, chunks: List[BaseNode]) -> str:
-    prompts: Dict[str, Dict] = get_prompts(version=bible_request.version)
+def get_reference_metadata_filter(bible_reference: BibleReference):
+    """Filter on the reference's book, and on its chapter when one is given."""
+    book_filter: MetadataFilter = MetadataFilter(key="book", value=bible_reference.book, operator=FilterOperator.EQ)
+    if bible_reference.chapter is None:
+        return book_filter
+    return MetadataFilters(
+        filters=[book_filter, MetadataFilter(key="chapter", value=bible_reference.chapter, operator=FilterOperator.EQ)],
+        condition=FilterCondition.AND
+    )
+
+
+def generate_response_from_chunks(bible_request: BibleRequest, chunks: List[BaseNode], chat_history: Optional[List[ChatMessage]] = None, prompts: Optional[Dict[str, Dict]] = None) -> str:
+    if chat_history is None:
+        chat_history = get_chat_history(session_id=bible_request.session_id)
+    chat_messages_param: Iterable[ChatCompletionMessageParam] = build_chat_messages(
+        bible_request=bible_request, chunks=chunks, chat_history=chat_history, prompts=prompts
+    )
+    
+    with span("llm"):
+        response: ChatCompletion = get_chat_response(chat_messages=chat_messages_param)
+    record_openai_usage(response=response)
+    content: str = response.choices[0].message.content
+
+    record_chat_turn(session_id=bible_request.session_id, query=bible_request.query, response=content, next_index=len(chat_history))
+
+    return content
+
+
+def stream_response_from_chunks(bible_request: BibleRequest, chunks: List[BaseNode], chat_history: List[ChatMessage], prompts: Optional[Dict[str, Dict]] = None) -> Iterator[str]:
+    """Yield the answer as it is generated and record the full answer in chat history once the stream completes."""
+    chat_messages_param: Iterable[ChatCompletionMessageParam] = build_chat_messages(
+        bible_request=bible_request, chunks=chunks, chat_history=chat_history, prompts=prompts
+    )
+
+    content_parts: List[str] = []
+    started: float = time.perf_counter()
+    with span("llm_stream"):
+        for chunk in stream_chat_response(chat_messages=chat_messages_param):
+            if not chunk.choices:
+                record_openai_usage(response=chunk)  # the trailing usage chunk has no choices
+                continue
+            delta: Optional[str] = chunk.choices[0].delta.content
+            if delta:
+                if not content_parts:
+                    observe_stage(stage="llm_first_token", seconds=time.perf_counter() - started)
+                content_parts.append(delta)
+                yield delta
+
+    record_chat_turn(session_id=bible_request.session_id, query=bible_request.query, response="".join(content_parts), next_index=len(chat_history))
+
+
+def build_chat_messages(bible_request: BibleRequest, chunks: List[BaseNode], chat_history: List[ChatMessage], prompts: Optional[Dict[str, Dict]] = None) -> Iterable[ChatCompletionMessageParam]:
+    if prompts is None:
+        prompts = get_cached_prompts(version=bible_request.version)
     role_context: str = prompts.get("ROLE_PROMPT", None)["value"] if prompts else None
     system_context: str = prompts.get("SYSTEM_PROMPT", None)["value"] if prompts else None
-    query_context = "/n---/n".join([chunk.get_content() for chunk in chunks])
+    query_context = CONTEXT_SEPARATOR.join([chunk.get_content() for chunk in chunks])
 
     chat_messages: List[ChatMessage] = []
-    chat_history: List[ChatMessage] = get_chat_history(session_id=bible_request.session_id)
-
     user_prompt: str = get_user_query_prompt(
         system_context=system_context,
         question_context=query_context,
@@ -78,16 +341,16 @@ def generate_response_from_chunks(bible_request: BibleRequest, chunks: List[Base
     if chat_history and len(chat_history) > 0:
         chat_messages.extend(chat_history)
     chat_messages.append(ChatMessage(role=MessageRole.USER, content=user_prompt))
-    chat_messages_param: Iterable[ChatCompletionMessageParam] = map_chat_messages(chat_messages=chat_messages)
-    
-    response: ChatCompletion = get_chat_response(chat_messages=chat_messages_param)
-    content: str = response.choices[0].message.content
+    return map_chat_messages(chat_messages=chat_messages)
 
-    latest_query_and_response: List[ChatMessage] = [
-        ChatMessage(role=MessageRole.USER, content=bible_request.query),
-        ChatMessage(role=MessageRole.USER, content=content)]
-    
-    update_chat_history(session_id=bible_request.session_id, chat_messages=latest_query_and_response)
-
-    return content
 
+def get_reference_metadata(query_result: VectorStoreQueryResult) -> List[Dict]:
+    """Describe retrieved chunks for clients: node id, similarity score and Bible metadata."""
+    similarities: List[float] = query_result.similarities or []
+    references: List[Dict] = []
+    for position, node in enumerate(query_result.nodes or []):
+        reference: Dict = {"node_id": node.node_id, **node.metadata}
+        if position < len(similarities):
+            reference["score"] = similarities[position]
+        references.append(reference)
+    return references
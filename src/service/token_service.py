@@ -0,0 +1,25 @@
+import logging
+import tiktoken
+from functools import lru_cache
+from src import config
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+EMBEDDING_MODEL: str = config.env_config.OPEN_AI_EMBEDDING_MODEL
+DEFAULT_ENCODING: str = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the tokenizer for a model, falling back to cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        LOG.debug(f"No tokenizer registered for model '{model}', using {DEFAULT_ENCODING}")
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str = EMBEDDING_MODEL) -> int:
+    """Count the tokens in text as the given model would see them."""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
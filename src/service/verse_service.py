@@ -0,0 +1,68 @@
+import logging
+from typing import Dict, List, Optional, Set
+from pymongo import collection
+from src import config
+from src.clients.mongo_client import get_bible_rag_db
+from src.service.cache_service import TTLCache
+
+LOG = logging.getLogger(__name__)
+LOG.info(f"Setting up SERVICE - {__name__}")
+
+_indexed_collections: Set[str] = set()
+chapter_verse_cache: TTLCache = TTLCache(
+    name="chapter_verses",
+    max_size=config.env_config.VERSE_CACHE_SIZE,
+    ttl_seconds=config.env_config.VERSE_CACHE_TTL_SECONDS
+)
+
+
+def get_verse_collection(version: str) -> collection.Collection:
+    """Get the verse offset index collection for a version, creating its lookup index on first use."""
+    verse_collection: collection.Collection = get_bible_rag_db()[f"{version}_verses"]
+    if verse_collection.name not in _indexed_collections:
+        verse_collection.create_index([("book", 1), ("chapter", 1), ("verse", 1), ("pdf_page_number", 1)], name="book_chapter_verse")
+        _indexed_collections.add(verse_collection.name)
+    return verse_collection
+
+
+def get_verses(version: str, book: str, chapter: int, start_verse: Optional[int] = None, end_verse: Optional[int] = None) -> List[Dict]:
+    """Look up verses of a chapter through the offset index, joining verses that run across pages.
+    Returns one {book, chapter, verse, text, pdf_page_numbers} dict per verse in verse order.
+    """
+    verse_filter: Dict = {"book": book, "chapter": chapter}
+    if start_verse is not None:
+        verse_filter["verse"] = {"$gte": start_verse, "$lte": end_verse if end_verse is not None else start_verse}
+    verses: Dict[int, Dict] = {}
+    for entry in get_verse_collection(version=version).find(verse_filter, {"_id": 0}).sort([("verse", 1), ("pdf_page_number", 1)]):
+        verse: Dict = verses.setdefault(entry["verse"], {
+            "book": entry["book"], "chapter": entry["chapter"], "verse": entry["verse"], "text": "", "pdf_page_numbers": []
+        })
+        if entry["pdf_page_number"] in verse["pdf_page_numbers"]:
+            # The same page ingested from several files; keep the first copy
+            continue
+        verse["text"] = f"{verse['text']} {entry['text']}".strip()
+        verse["pdf_page_numbers"].append(entry["pdf_page_number"])
+    return list(verses.values())
+
+
+def get_chapter_verses(version: str, book: str, chapter: int) -> List[Dict]:
+    """Get every verse of a chapter, served from memory after the first read."""
+    cache_key = (version, book, chapter)
+    verses: Optional[List[Dict]] = chapter_verse_cache.get(cache_key)
+    if verses is None:
+        verses = get_verses(version=version, book=book, chapter=chapter)
+        chapter_verse_cache.set(cache_key, verses)
+    return verses
+
+
+def select_verses(verses: List[Dict], start_verse: Optional[int] = None, end_verse: Optional[int] = None) -> List[Dict]:
+    """Slice a chapter's verses to an inclusive verse range; no start verse selects the whole chapter."""
+    if start_verse is None:
+        return verses
+    last_verse: int = end_verse if end_verse is not None else start_verse
+    return [verse for verse in verses if start_verse <= verse["verse"] <= last_verse]
+
+
+def clear_verse_cache():
+    """Drop cached chapters, e.g. after a version has been re-ingested."""
+    chapter_verse_cache.clear()